@@ -0,0 +1,191 @@
+import hashlib
+import json
+import os
+import shutil
+import time
+from collections import OrderedDict
+from pathlib import Path
+from typing import Dict, Optional, Union
+
+
+def content_key(*parts) -> str:
+    """生成パラメータからキー（SHA-256）を作成"""
+    payload = json.dumps(parts, sort_keys=True, ensure_ascii=False, default=str)
+    return hashlib.sha256(payload.encode("utf-8")).hexdigest()
+
+
+class DiskLRUCache:
+    """内容アドレス型のディスクキャッシュ
+
+    キー（生成パラメータ一式）のSHA-256をファイル名にして保存し、合計サイズが
+    max_bytes を超えたら最後に使われたのが古い順に削除する。ttl_seconds を指定すると
+    書き込みから一定時間経ったものは期限切れとして扱う。
+    最終利用時刻は atime、書き込み時刻は mtime に保持するため再起動後も順序を再現できる。
+    同じディレクトリを複数プロセスで共有しても、書き込みは一時ファイル＋rename で原子的に行う。
+    他プロセスが書き込んだ分も上限に含めるため、rescan_interval 秒ごとと削除の前にディレクトリを
+    読み直して合計サイズを数え直す。
+    max_bytes が0以下の場合はキャッシュ無効。
+    """
+
+    def __init__(
+        self,
+        directory: Union[str, Path],
+        max_bytes: int,
+        suffix: str = "",
+        ttl_seconds: Optional[float] = None,
+        rescan_interval: float = 60
+    ):
+        self.directory = Path(directory)
+        self.max_bytes = max_bytes
+        self.suffix = suffix
+        self.ttl_seconds = ttl_seconds
+        self.rescan_interval = rescan_interval
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+        # ミス時に元データの取得にかかった時間（ヒット時の節約時間の推定に使う）
+        self._fill_seconds = 0.0
+        self._fills = 0
+        # digest -> ファイルサイズ（先頭が最も古い）
+        self._index: "OrderedDict[str, int]" = OrderedDict()
+        self._total_bytes = 0
+        self._scanned_at = 0.0
+        if self.enabled:
+            self.directory.mkdir(parents=True, exist_ok=True)
+            self._load_index()
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_bytes > 0
+
+    make_key = staticmethod(content_key)
+
+    def _load_index(self) -> None:
+        """ディレクトリ内のファイル（他プロセスの書き込み分を含む）を最終利用時刻順に読み込む"""
+        self._scanned_at = time.monotonic()
+        entries = []
+        for path in self.directory.glob(f"*{self.suffix}"):
+            if path.name.startswith("."):
+                continue  # 書き込み途中の一時ファイル
+            try:
+                stat = path.stat()
+            except OSError:
+                continue
+            digest = path.name[:-len(self.suffix)] if self.suffix else path.name
+            entries.append((stat.st_atime, digest, stat.st_size))
+        self._index.clear()
+        self._total_bytes = 0
+        for _, digest, size in sorted(entries):
+            self._index[digest] = size
+            self._total_bytes += size
+
+    def path_for(self, key: str) -> Path:
+        return self.directory / f"{key}{self.suffix}"
+
+    def get(self, key: str) -> Optional[Path]:
+        """キャッシュ済みファイルのパスを返す（なければ None）"""
+        if not self.enabled:
+            return None
+        path = self._lookup(key)
+        if path is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return path
+
+    def _lookup(self, key: str) -> Optional[Path]:
+        """ヒットならパスを返して最終利用時刻を更新（期限切れは削除）。ヒット・ミスは数えない"""
+        path = self.path_for(key)
+        if key in self._index or path.exists():
+            try:
+                stat = path.stat()
+                if self.ttl_seconds is not None and time.time() - stat.st_mtime > self.ttl_seconds:
+                    self._forget(key)
+                    path.unlink()
+                    self.expirations += 1
+                    return None
+                # 最終利用時刻を更新（書き込み時刻 mtime は TTL 判定用にそのまま残す）
+                os.utime(path, (time.time(), stat.st_mtime))
+                size = stat.st_size
+            except OSError:
+                self._forget(key)
+                return None
+            if key not in self._index:
+                # 別プロセスが書き込んだファイル
+                self._index[key] = size
+                self._total_bytes += size
+            self._index.move_to_end(key)
+            return path
+        return None
+
+    def put(self, key: str, data: bytes, cost_seconds: Optional[float] = None) -> Optional[Path]:
+        """データを保存し、サイズ上限を超えていれば古いものから削除
+
+        cost_seconds にはデータの取得（API呼び出しなど）にかかった時間を渡す。
+        """
+        if cost_seconds is not None:
+            self._fill_seconds += cost_seconds
+            self._fills += 1
+        if not self.enabled or len(data) > self.max_bytes:
+            return None
+        path = self.path_for(key)
+        tmp_path = path.with_name(f".{path.name}.{os.getpid()}.{time.monotonic_ns()}.tmp")
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+
+        self._forget(key)
+        self._index[key] = len(data)
+        self._total_bytes += len(data)
+        self._evict()
+        return path
+
+    def copy_to(self, key: str, destination: Union[str, Path]) -> bool:
+        """キャッシュヒットならファイルを destination にコピーして True を返す（コピーできた場合のみヒット）"""
+        path = self._lookup(key) if self.enabled else None
+        if path is not None:
+            try:
+                shutil.copyfile(path, destination)
+                self.hits += 1
+                return True
+            except OSError:
+                # コピーできなかった（他プロセスが削除した等）
+                self._forget(key)
+        if self.enabled:
+            self.misses += 1
+        return False
+
+    def _forget(self, key: str) -> None:
+        size = self._index.pop(key, None)
+        if size is not None:
+            self._total_bytes -= size
+
+    def _evict(self) -> None:
+        """合計サイズが上限を超えていれば古い順に削除（判定の前にディレクトリを読み直す）"""
+        if self._total_bytes > self.max_bytes or time.monotonic() - self._scanned_at > self.rescan_interval:
+            self._load_index()
+        while self._total_bytes > self.max_bytes and self._index:
+            digest, size = self._index.popitem(last=False)
+            self._total_bytes -= size
+            try:
+                self.path_for(digest).unlink()
+            except FileNotFoundError:
+                pass
+            self.evictions += 1
+
+    def stats(self) -> Dict[str, Union[int, float]]:
+        lookups = self.hits + self.misses
+        average_fill_seconds = self._fill_seconds / self._fills if self._fills else 0.0
+        return {
+            "entries": len(self._index),
+            "bytes": self._total_bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "evictions": self.evictions,
+            "expirations": self.expirations,
+            "hit_rate": round(self.hits / lookups, 4) if lookups else 0.0,
+            "average_fill_seconds": round(average_fill_seconds, 3),
+            "estimated_seconds_saved": round(self.hits * average_fill_seconds, 3),
+        }
@@ -0,0 +1,145 @@
+import asyncio
+import random
+import time
+import uuid
+from contextlib import asynccontextmanager, contextmanager
+from contextvars import ContextVar
+from typing import Dict, Optional
+
+import redis.asyncio as aioredis
+
+from metrics import observe_stage
+
+# 期限切れの保持者を除いてから、空きがあれば期限付きで枠を確保する（時刻はRedisサーバー基準）
+_ACQUIRE_SCRIPT = """
+local now = redis.call("time")
+local now_ms = tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000)
+redis.call("zremrangebyscore", KEYS[1], "-inf", now_ms)
+if redis.call("zcard", KEYS[1]) < tonumber(ARGV[1]) then
+    redis.call("zadd", KEYS[1], now_ms + tonumber(ARGV[2]), ARGV[3])
+    redis.call("pexpire", KEYS[1], ARGV[2])
+    return 1
+end
+return 0
+"""
+
+# 保持中の枠の期限を延長（既に期限切れで外されていれば延長しない）
+_RENEW_SCRIPT = """
+local now = redis.call("time")
+local now_ms = tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000)
+if redis.call("zscore", KEYS[1], ARGV[2]) then
+    redis.call("zadd", KEYS[1], now_ms + tonumber(ARGV[1]), ARGV[2])
+    redis.call("pexpire", KEYS[1], ARGV[1])
+    return 1
+end
+return 0
+"""
+
+# バッチ処理中ジョブの共有枠（asyncio のタスクに引き継がれるので、並列の画像・音声生成からも参照できる）
+_current_budget: ContextVar[Optional["BatchBudget"]] = ContextVar("batch_budget", default=None)
+
+
+class RedisSemaphore:
+    """複数ワーカーで共有する分散セマフォ（Redisのソート済みセットで保持者と期限を管理）
+
+    保持中は lease_seconds の1/3ごとに期限を延長し、ワーカーが停止した場合は期限切れで枠が戻る。
+    空きがなければジッター付きの間隔で再確認する。
+    """
+
+    def __init__(
+        self,
+        redis_client: aioredis.Redis,
+        key: str,
+        limit: int,
+        lease_seconds: float = 60,
+        poll_interval: float = 0.1,
+        max_poll_interval: float = 1.0
+    ):
+        self.redis = redis_client
+        self.key = key
+        self.limit = max(1, limit)
+        self.lease_ms = int(lease_seconds * 1000)
+        self.poll_interval = poll_interval
+        self.max_poll_interval = max_poll_interval
+        self._acquire = redis_client.register_script(_ACQUIRE_SCRIPT)
+        self._renew = redis_client.register_script(_RENEW_SCRIPT)
+
+    async def acquire(self) -> str:
+        """枠を確保してトークンを返す（確保できるまで待つ）"""
+        token = uuid.uuid4().hex
+        interval = self.poll_interval
+        while not await self._acquire(keys=[self.key], args=[self.limit, self.lease_ms, token]):
+            await asyncio.sleep(random.uniform(interval / 2, interval))
+            interval = min(self.max_poll_interval, interval * 2)
+        return token
+
+    async def release(self, token: str) -> None:
+        await self.redis.zrem(self.key, token)
+
+    async def _keep_alive(self, token: str) -> None:
+        while True:
+            await asyncio.sleep(self.lease_ms / 3000)
+            try:
+                await self._renew(keys=[self.key], args=[self.lease_ms, token])
+            except aioredis.RedisError as e:
+                print(f"⚠️ バッチ枠の期限延長に失敗: {self.key} ({e})")
+
+    @asynccontextmanager
+    async def slot(self):
+        token = await self.acquire()
+        keep_alive = asyncio.create_task(self._keep_alive(token))
+        try:
+            yield
+        finally:
+            keep_alive.cancel()
+            await self.release(token)
+
+
+class BatchBudget:
+    """バッチ内の全ジョブで共有するステージ別の同時実行数（llm / image / tts / encode）
+
+    同じバッチのジョブが複数ワーカーに分散しても、ステージごとの同時実行数は limits を超えない。
+    一斉に投入した大量のジョブが外部APIやffmpegに同時に殺到せず、一定のペースで流れる。
+    上限が0以下のステージは制限しない。
+    """
+
+    STAGES = ("llm", "image", "tts", "encode")
+
+    def __init__(self, redis_client: aioredis.Redis, batch_id: str, limits: Dict[str, int], lease_seconds: float = 60):
+        self.batch_id = batch_id
+        self._semaphores = {
+            stage: RedisSemaphore(redis_client, f"batch:{batch_id}:budget:{stage}", limit, lease_seconds)
+            for stage, limit in limits.items()
+            if stage in self.STAGES and limit > 0
+        }
+
+    @asynccontextmanager
+    async def slot(self, stage: str):
+        semaphore = self._semaphores.get(stage)
+        if semaphore is None:
+            yield
+            return
+        queued_at = time.perf_counter()
+        async with semaphore.slot():
+            observe_stage(f"batch_wait_{stage}", time.perf_counter() - queued_at)
+            yield
+
+    @contextmanager
+    def activate(self):
+        """このジョブの処理中、batch_slot() がこの枠を使うようにする"""
+        token = _current_budget.set(self)
+        try:
+            yield self
+        finally:
+            _current_budget.reset(token)
+
+
+@asynccontextmanager
+async def batch_slot(stage: str):
+    """バッチ処理中ジョブならステージの共有枠を確保して実行（バッチ外なら何もしない）"""
+    budget = _current_budget.get()
+    if budget is None:
+        yield
+        return
+    async with budget.slot(stage):
+        yield
@@ -0,0 +1,600 @@
+"""動画生成パイプラインのオフラインベンチマーク
+
+OpenAI（chat / images）とVOICEVOX（audio_query / synthesis）のスタブサーバーをローカルに起動し、
+外部APIを呼ばずに生成パイプラインを実行する。スタブの応答遅延とエラー率は引数で変えられる。
+同時実行数ごとに、ステージ別レイテンシのパーセンタイル・スループット・ピークRSSを表示する。
+
+    # generate_improved_video を直接実行
+    python benchmark.py --jobs 8 --concurrency 1,2,4
+
+    # FastAPIのエンドポイント経由（ジョブキュー＋ワーカーをプロセス内で起動。Redisが必要）
+    python benchmark.py --target api --jobs 8 --concurrency 2
+
+    # 結果を保存して前回と比較
+    python benchmark.py --json after.json --baseline before.json
+
+ffmpegはPATH上のものを使う。作業ファイル（動画・キャッシュ）は一時ディレクトリに作成して最後に削除する。
+"""
+import argparse
+import asyncio
+import contextlib
+import io
+import json
+import math
+import os
+import random
+import re
+import resource
+import sys
+import tempfile
+import time
+import wave
+from collections import defaultdict
+from dataclasses import asdict, dataclass
+from pathlib import Path
+from typing import Dict, List, Optional
+
+from aiohttp import web
+
+BACKEND_DIR = Path(__file__).resolve().parent
+
+# 計測対象のステージ（生成クラスのメソッド名: 表示名）
+STAGE_METHODS = {
+    "generate_script": "script",
+    "create_title_image_async": "title_image",
+    "generate_title_audio": "title_audio",
+    "generate_consistent_image": "image",
+    "generate_audio": "audio",
+    "_run_ffmpeg": "ffmpeg",
+}
+
+
+@dataclass
+class StubConfig:
+    """スタブサーバーの応答設定（遅延は秒、jitter は遅延に対する±割合）"""
+    chat_latency: float = 0.8
+    image_latency: float = 3.0
+    tts_latency: float = 0.3
+    jitter: float = 0.2
+    error_rate: float = 0.0
+    scenes: int = 3
+    seconds_per_char: float = 0.12  # 合成音声の長さ（1文字あたり）
+
+
+class StubServer:
+    """OpenAIとVOICEVOXのスタンドイン
+
+    chat は台本・お題提案の定型JSON、images はスタブ上のPNGのURL、
+    audio_query / synthesis はテキスト長に比例した長さの無音WAVを返す。
+    error_rate の割合で、OpenAIは429（Retry-After付き）または500、VOICEVOXは503を返す。
+    """
+
+    def __init__(self, config: StubConfig):
+        self.config = config
+        self.requests: Dict[str, int] = defaultdict(int)
+        self.errors: Dict[str, int] = defaultdict(int)
+        self._png = self._make_png()
+        self._runner: Optional[web.AppRunner] = None
+        self.base_url = ""
+
+    @property
+    def openai_base_url(self) -> str:
+        return f"{self.base_url}/v1"
+
+    @property
+    def voicevox_url(self) -> str:
+        return self.base_url
+
+    async def start(self, host: str = "127.0.0.1", port: int = 0) -> None:
+        app = web.Application()
+        app.router.add_post("/v1/chat/completions", self._chat)
+        app.router.add_post("/v1/images/generations", self._images)
+        app.router.add_get("/files/image.png", self._image_file)
+        app.router.add_post("/audio_query", self._audio_query)
+        app.router.add_post("/synthesis", self._synthesis)
+        app.router.add_get("/version", self._version)
+        self._runner = web.AppRunner(app, access_log=None)
+        await self._runner.setup()
+        site = web.TCPSite(self._runner, host, port)
+        await site.start()
+        bound_port = site._server.sockets[0].getsockname()[1]
+        self.base_url = f"http://{host}:{bound_port}"
+
+    async def close(self) -> None:
+        if self._runner is not None:
+            await self._runner.cleanup()
+
+    @staticmethod
+    def _make_png() -> bytes:
+        try:
+            from PIL import Image
+        except ImportError:
+            # Pillowがなければ1x1のPNG
+            return bytes.fromhex(
+                "89504e470d0a1a0a0000000d4948445200000001000000010806000000"
+                "1f15c4890000000d49444154789c6360f8cf00000301010018dd8db00000000049454e44ae426082"
+            )
+        buffer = io.BytesIO()
+        Image.new("RGB", (1024, 1024), color="#7FB069").save(buffer, format="PNG")
+        return buffer.getvalue()
+
+    def _make_wav(self, text: str) -> bytes:
+        seconds = min(8.0, max(1.0, len(text) * self.config.seconds_per_char))
+        frames = int(24000 * seconds)
+        buffer = io.BytesIO()
+        with wave.open(buffer, "wb") as w:
+            w.setnchannels(1)
+            w.setsampwidth(2)
+            w.setframerate(24000)
+            w.writeframes(b"\0\0" * frames)
+        return buffer.getvalue()
+
+    async def _simulate(self, endpoint: str, latency: float, error: Optional[web.Response]) -> Optional[web.Response]:
+        """遅延を入れ、error_rate に従ってエラー応答を返す"""
+        self.requests[endpoint] += 1
+        jitter = self.config.jitter
+        await asyncio.sleep(max(0.0, latency * random.uniform(1 - jitter, 1 + jitter)))
+        if random.random() < self.config.error_rate:
+            self.errors[endpoint] += 1
+            return error
+        return None
+
+    @staticmethod
+    def _openai_error() -> web.Response:
+        if random.random() < 0.5:
+            return web.json_response(
+                {"error": {"message": "Rate limit reached (stub)", "type": "requests"}},
+                status=429, headers={"Retry-After": "0.5"}
+            )
+        return web.json_response({"error": {"message": "Internal error (stub)"}}, status=500)
+
+    async def _chat(self, request: web.Request) -> web.Response:
+        error = await self._simulate("chat", self.config.chat_latency, self._openai_error())
+        if error is not None:
+            return error
+        body = await request.json()
+        prompt = body["messages"][-1]["content"]
+        theme = re.search(r"テーマ: (.+)", prompt)
+        if theme:
+            content = {
+                "theme": theme.group(1).strip(),
+                "suggestions": [
+                    {"title": f"{theme.group(1).strip()} 3選 その{n}", "description": "stub", "estimated_views": "10万回"}
+                    for n in range(1, 6)
+                ]
+            }
+        else:
+            topic_match = re.search(r"お題: (.+)", prompt)
+            style_match = re.search(r'"style": "(\w+)"', prompt)
+            topic = topic_match.group(1).strip() if topic_match else "ベンチマーク"
+            content = {
+                "title": topic,
+                "style": style_match.group(1) if style_match else "anime",
+                "scenes": [
+                    {
+                        "text": f"第{n}位は{topic}の項目{n}です。理由は、ベンチマーク用の説明文がここに入るからです。",
+                        "visual_concept": f"{topic} item {n}",
+                        "duration": 5
+                    }
+                    for n in range(self.config.scenes, 0, -1)
+                ]
+            }
+        return web.json_response({
+            "choices": [{"message": {"role": "assistant", "content": json.dumps(content, ensure_ascii=False)}}]
+        })
+
+    async def _images(self, request: web.Request) -> web.Response:
+        error = await self._simulate("images", self.config.image_latency, self._openai_error())
+        if error is not None:
+            return error
+        return web.json_response({"data": [{"url": f"{self.base_url}/files/image.png"}]})
+
+    async def _image_file(self, request: web.Request) -> web.Response:
+        self.requests["image_file"] += 1
+        return web.Response(body=self._png, content_type="image/png")
+
+    async def _audio_query(self, request: web.Request) -> web.Response:
+        error = await self._simulate("audio_query", self.config.tts_latency / 3, web.Response(status=503))
+        if error is not None:
+            return error
+        return web.json_response({"speedScale": 1.0, "text": request.query.get("text", "")})
+
+    async def _synthesis(self, request: web.Request) -> web.Response:
+        error = await self._simulate("synthesis", self.config.tts_latency, web.Response(status=503))
+        if error is not None:
+            return error
+        query = await request.json()
+        return web.Response(body=self._make_wav(query.get("text", "")), content_type="audio/wav")
+
+    async def _version(self, request: web.Request) -> web.Response:
+        return web.json_response("0.0.0-stub")
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        return {"requests": dict(self.requests), "errors": dict(self.errors)}
+
+
+def percentile(values: List[float], q: float) -> float:
+    """最近順位法によるパーセンタイル"""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    index = max(0, min(len(ordered) - 1, math.ceil(q / 100 * len(ordered)) - 1))
+    return ordered[index]
+
+
+def summarize(values: List[float]) -> Dict[str, float]:
+    return {
+        "count": len(values),
+        "p50": round(percentile(values, 50), 3),
+        "p95": round(percentile(values, 95), 3),
+        "p99": round(percentile(values, 99), 3),
+        "max": round(max(values), 3) if values else 0.0,
+    }
+
+
+class StageTimer:
+    """生成クラスのメソッドを包んでステージごとの所要時間を記録"""
+
+    def __init__(self):
+        self.samples: Dict[str, List[float]] = defaultdict(list)
+
+    def instrument(self, generator) -> None:
+        for method_name, stage in STAGE_METHODS.items():
+            original = getattr(generator, method_name)
+            setattr(generator, method_name, self._timed(stage, original))
+
+    def _timed(self, stage: str, fn):
+        async def wrapper(*args, **kwargs):
+            started = time.perf_counter()
+            try:
+                return await fn(*args, **kwargs)
+            finally:
+                self.samples[stage].append(time.perf_counter() - started)
+        return wrapper
+
+    def reset(self) -> None:
+        self.samples.clear()
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        return {stage: summarize(values) for stage, values in self.samples.items()}
+
+
+class RSSSampler:
+    """実行中のRSSを定期的に読み取り、ピークを記録（Linux以外は getrusage の生涯ピーク）"""
+
+    def __init__(self, interval: float = 0.05):
+        self.interval = interval
+        self.peak_bytes = 0
+        self._task: Optional[asyncio.Task] = None
+
+    @staticmethod
+    def current_bytes() -> int:
+        try:
+            with open("/proc/self/statm") as f:
+                return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+        except (OSError, ValueError, IndexError):
+            return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+    async def _run(self) -> None:
+        while True:
+            self.peak_bytes = max(self.peak_bytes, self.current_bytes())
+            await asyncio.sleep(self.interval)
+
+    def start(self) -> None:
+        self.peak_bytes = self.current_bytes()
+        self._task = asyncio.create_task(self._run())
+
+    async def stop(self) -> int:
+        if self._task is not None:
+            self._task.cancel()
+            with contextlib.suppress(asyncio.CancelledError):
+                await self._task
+        self.peak_bytes = max(self.peak_bytes, self.current_bytes())
+        return self.peak_bytes
+
+
+def _child_peak_rss_mb() -> float:
+    """子プロセス（ffmpeg）のうち最大のピークRSS"""
+    return round(resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024, 1)
+
+
+@contextlib.contextmanager
+def _quiet(verbose: bool):
+    """パイプラインの進捗表示を抑止"""
+    if verbose:
+        yield
+    else:
+        with contextlib.redirect_stdout(io.StringIO()):
+            yield
+
+
+async def _run_level(label: str, concurrency: int, jobs: int, run_job, timer: StageTimer, verbose: bool) -> Dict:
+    """同時実行数 concurrency で jobs 件を実行して集計"""
+    timer.reset()
+    sampler = RSSSampler()
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies: List[float] = []
+    failures = 0
+
+    async def one(index: int) -> None:
+        nonlocal failures
+        async with semaphore:
+            started = time.perf_counter()
+            try:
+                ok = await run_job(f"ベンチマーク {label}-{concurrency}-{index}")
+            except Exception:
+                ok = False
+            if ok:
+                latencies.append(time.perf_counter() - started)
+            else:
+                failures += 1
+
+    sampler.start()
+    started = time.perf_counter()
+    with _quiet(verbose):
+        await asyncio.gather(*(one(i) for i in range(jobs)))
+    wall = time.perf_counter() - started
+    peak = await sampler.stop()
+
+    return {
+        "concurrency": concurrency,
+        "jobs": jobs,
+        "succeeded": len(latencies),
+        "failed": failures,
+        "wall_seconds": round(wall, 3),
+        "throughput_per_minute": round(len(latencies) / wall * 60, 2) if wall else 0.0,
+        "job_latency": summarize(latencies),
+        "stages": timer.report(),
+        "peak_rss_mb": round(peak / 1024 / 1024, 1),
+        "child_peak_rss_mb": _child_peak_rss_mb(),
+    }
+
+
+def _build_generator(args, stub: StubServer, workdir: Path):
+    from asset_cache import DiskLRUCache
+    from improved_styled_video_generator import ImprovedStyledVideoGenerator
+    from process_budget import ProcessBudget
+    from rate_limiter import AdaptiveRateLimiter
+
+    cache_bytes = 0 if args.no_cache else 512 * 1024 * 1024
+    return ImprovedStyledVideoGenerator(
+        "sk-benchmark",
+        stub.voicevox_url,
+        openai_base_url=stub.openai_base_url,
+        render_mode=args.render_mode,
+        streaming_pipeline=args.streaming,
+        process_budget=ProcessBudget(args.ffmpeg_processes or os.cpu_count() or 2),
+        audio_cache=DiskLRUCache(workdir / "cache" / "audio", cache_bytes, suffix=".wav"),
+        image_cache=DiskLRUCache(workdir / "cache" / "images", cache_bytes, suffix=".png"),
+        title_cache=DiskLRUCache(workdir / "cache" / "titles", cache_bytes, suffix=".png"),
+        image_rate_limiter=AdaptiveRateLimiter("images", args.image_rpm, base_delay=0.2),
+        chat_rate_limiter=AdaptiveRateLimiter("chat", args.chat_rpm, base_delay=0.2),
+    )
+
+
+async def bench_generator(args, stub: StubServer, workdir: Path) -> List[Dict]:
+    """generate_improved_video を直接呼び出す"""
+    generator = _build_generator(args, stub, workdir)
+    timer = StageTimer()
+    timer.instrument(generator)
+
+    async def run_job(topic: str) -> bool:
+        path = await generator.generate_improved_video(
+            topic, args.style, render_profile=args.profile
+        )
+        if path:
+            Path(path).unlink(missing_ok=True)
+        return bool(path)
+
+    results = []
+    async with generator:
+        for concurrency in args.concurrency:
+            results.append(await _run_level("gen", concurrency, args.jobs, run_job, timer, args.verbose))
+            _print_level(results[-1])
+    return results
+
+
+async def bench_api(args, stub: StubServer, workdir: Path) -> List[Dict]:
+    """FastAPIのエンドポイント経由（生成開始→ステータス確認）で実行
+
+    ジョブキューとワーカーはこのプロセス内で起動する。キュー名はベンチマーク専用にする。
+    同時実行数はワーカーの同時実行数として扱い、ステータスAPIの応答時間も計測する。
+    """
+    try:
+        import httpx
+    except ImportError:
+        raise SystemExit("--target api には httpx が必要です（pip install httpx）")
+
+    os.environ.update({
+        "OPENAI_API_KEY": "sk-benchmark",
+        "OPENAI_BASE_URL": stub.openai_base_url,
+        "VOICEVOX_URL": stub.voicevox_url,
+        "VOICEVOX_URLS": stub.voicevox_url,
+        "OPENAI_IMAGE_RPM": str(args.image_rpm),
+        "OPENAI_CHAT_RPM": str(args.chat_rpm),
+        "RENDER_MODE": args.render_mode,
+        "STREAMING_PIPELINE": "true" if args.streaming else "false",
+        "JOB_QUEUE_NAME": f"benchmark_{os.getpid()}",
+        "WORKER_POLL_BLOCK_MS": "200",
+        "AUDIO_CACHE_MAX_MB": "0" if args.no_cache else "512",
+        "IMAGE_CACHE_MAX_MB": "0" if args.no_cache else "512",
+        "TITLE_CACHE_MAX_MB": "0" if args.no_cache else "512",
+    })
+    os.environ.setdefault("DATABASE_URL", f"sqlite:///{workdir / 'benchmark.db'}")
+    if args.ffmpeg_processes:
+        os.environ["FFMPEG_MAX_PROCESSES"] = str(args.ffmpeg_processes)
+
+    import main
+    import worker
+
+    timer = StageTimer()
+    timer.instrument(main.generator)
+    status_latencies: List[float] = []
+
+    await main.init_db()
+    await main.job_queue.ensure_group()
+    await main.prefetch_queue.ensure_group()
+    await main.generator.start()
+    transport = httpx.ASGITransport(app=main.app)
+    results = []
+    try:
+        async with httpx.AsyncClient(transport=transport, base_url="http://benchmark", timeout=30) as client:
+            async def run_job(topic: str) -> bool:
+                response = await client.post("/api/video/generate", json={
+                    "topic": topic, "style": args.style, "render_profile": args.profile
+                })
+                response.raise_for_status()
+                generation_id = response.json()["generation_id"]
+                while True:
+                    await asyncio.sleep(args.poll_interval)
+                    started = time.perf_counter()
+                    status = (await client.get(f"/api/video/status/{generation_id}")).json()
+                    status_latencies.append(time.perf_counter() - started)
+                    if status["status"] == "completed":
+                        if status.get("video_url"):
+                            Path(status["video_url"]).unlink(missing_ok=True)
+                        return True
+                    if status["status"] == "failed":
+                        return False
+
+            for concurrency in args.concurrency:
+                stop = asyncio.Event()
+                consumers = [asyncio.create_task(worker.consume(i, stop)) for i in range(concurrency)]
+                status_latencies.clear()
+                # 投入側はワーカーより多めに並べ、キューが空にならないようにする
+                result = await _run_level("api", concurrency * 2, args.jobs, run_job, timer, args.verbose)
+                result["concurrency"] = concurrency
+                result["status_endpoint_latency"] = summarize(status_latencies)
+                stop.set()
+                with _quiet(args.verbose):
+                    await asyncio.gather(*consumers)
+                results.append(result)
+                _print_level(result)
+    finally:
+        await main.generator.close()
+        # ベンチマーク専用キュー（通常・先行生成）のストリーム・デッドレター・遅延キューを削除
+        await main.redis_client.delete(*(
+            key
+            for queue in (main.job_queue, main.prefetch_queue)
+            for key in (queue.stream, queue.dead_letter_stream, queue.delayed)
+        ))
+        await main.redis_client.close(close_connection_pool=True)
+        await main.pubsub_redis_client.close(close_connection_pool=True)
+        await main.engine.dispose()
+    return results
+
+
+def _print_level(result: Dict) -> None:
+    latency = result["job_latency"]
+    print(
+        f"\n▶ 同時実行数 {result['concurrency']}: {result['succeeded']}/{result['jobs']}件成功, "
+        f"{result['wall_seconds']}秒, {result['throughput_per_minute']}件/分"
+    )
+    print(f"  ジョブ所要時間  p50 {latency['p50']}s  p95 {latency['p95']}s  p99 {latency['p99']}s  max {latency['max']}s")
+    print(f"  ピークRSS {result['peak_rss_mb']}MB（ffmpeg最大 {result['child_peak_rss_mb']}MB）")
+    print(f"  {'ステージ':<12}{'件数':>6}{'p50':>9}{'p95':>9}{'p99':>9}{'max':>9}")
+    for stage, stats in result["stages"].items():
+        print(f"  {stage:<12}{stats['count']:>6}{stats['p50']:>9.3f}{stats['p95']:>9.3f}{stats['p99']:>9.3f}{stats['max']:>9.3f}")
+    if "status_endpoint_latency" in result:
+        status = result["status_endpoint_latency"]
+        print(f"  /api/video/status  p50 {status['p50'] * 1000:.1f}ms  p95 {status['p95'] * 1000:.1f}ms  max {status['max'] * 1000:.1f}ms")
+
+
+def _print_comparison(results: List[Dict], baseline_path: str) -> None:
+    """同じ同時実行数の結果どうしで、前回からの変化率を表示"""
+    with open(baseline_path, encoding="utf-8") as f:
+        baseline = {r["concurrency"]: r for r in json.load(f)["results"]}
+
+    def change(after: float, before: float) -> str:
+        return f"{(after - before) / before * 100:+.1f}%" if before else "n/a"
+
+    print(f"\n📊 比較（基準: {baseline_path}）")
+    for result in results:
+        before = baseline.get(result["concurrency"])
+        if before is None:
+            continue
+        print(
+            f"  同時実行数 {result['concurrency']}: "
+            f"スループット {change(result['throughput_per_minute'], before['throughput_per_minute'])}, "
+            f"ジョブp95 {change(result['job_latency']['p95'], before['job_latency']['p95'])}, "
+            f"ピークRSS {change(result['peak_rss_mb'], before['peak_rss_mb'])}"
+        )
+        for stage, stats in result["stages"].items():
+            if stage in before["stages"]:
+                print(f"    {stage:<12} p95 {change(stats['p95'], before['stages'][stage]['p95'])}")
+
+
+def parse_args(argv=None):
+    parser = argparse.ArgumentParser(description="動画生成パイプラインのオフラインベンチマーク")
+    parser.add_argument("--target", choices=("generator", "api"), default="generator",
+                        help="generator: generate_improved_video を直接実行 / api: FastAPI経由（Redisが必要）")
+    parser.add_argument("--jobs", type=int, default=4, help="同時実行数ごとのジョブ数")
+    parser.add_argument("--concurrency", default="1,2,4",
+                        type=lambda value: [int(v) for v in value.split(",")], help="カンマ区切りの同時実行数")
+    parser.add_argument("--style", default="anime")
+    parser.add_argument("--profile", default="final", choices=("final", "draft"), help="エンコード設定")
+    parser.add_argument("--render-mode", default="clips", choices=("clips", "single_pass"))
+    parser.add_argument("--streaming", action="store_true", help="ストリーミングパイプラインを有効化")
+    parser.add_argument("--ffmpeg-processes", type=int, default=0, help="ffmpegの同時起動数（0ならCPUコア数）")
+    parser.add_argument("--scenes", type=int, default=3, help="台本のシーン数")
+    parser.add_argument("--chat-latency", type=float, default=0.8, help="chatの応答遅延（秒）")
+    parser.add_argument("--image-latency", type=float, default=3.0, help="画像生成の応答遅延（秒）")
+    parser.add_argument("--tts-latency", type=float, default=0.3, help="音声合成の応答遅延（秒）")
+    parser.add_argument("--jitter", type=float, default=0.2, help="遅延のばらつき（±割合）")
+    parser.add_argument("--error-rate", type=float, default=0.0, help="スタブがエラーを返す割合（0-1）")
+    parser.add_argument("--image-rpm", type=float, default=100000, help="画像生成のレート制限（1分あたり）")
+    parser.add_argument("--chat-rpm", type=float, default=100000, help="chatのレート制限（1分あたり）")
+    parser.add_argument("--no-cache", action="store_true", help="画像・音声キャッシュを無効化")
+    parser.add_argument("--poll-interval", type=float, default=0.5, help="api: ステータス確認の間隔（秒）")
+    parser.add_argument("--seed", type=int, default=None, help="遅延・エラーの乱数シード")
+    parser.add_argument("--json", dest="json_path", help="結果をJSONで保存")
+    parser.add_argument("--baseline", help="比較対象の結果JSON")
+    parser.add_argument("--verbose", action="store_true", help="パイプラインの進捗表示を抑止しない")
+    return parser.parse_args(argv)
+
+
+async def run(args) -> Dict:
+    if args.seed is not None:
+        random.seed(args.seed)
+    stub = StubServer(StubConfig(
+        chat_latency=args.chat_latency,
+        image_latency=args.image_latency,
+        tts_latency=args.tts_latency,
+        jitter=args.jitter,
+        error_rate=args.error_rate,
+        scenes=args.scenes,
+    ))
+    await stub.start()
+    print(f"🧪 スタブサーバー起動: {stub.base_url}（対象: {args.target}）")
+
+    original_cwd = Path.cwd()
+    with tempfile.TemporaryDirectory(prefix="video-benchmark-") as tmp:
+        workdir = Path(tmp)
+        # generated_videos などの作業ファイルを一時ディレクトリに作成する
+        os.chdir(workdir)
+        try:
+            if args.target == "api":
+                results = await bench_api(args, stub, workdir)
+            else:
+                results = await bench_generator(args, stub, workdir)
+        finally:
+            os.chdir(original_cwd)
+            await stub.close()
+
+    report = {
+        "config": {key: value for key, value in vars(args).items() if key not in ("json_path", "baseline", "verbose")},
+        "stub": {**asdict(stub.config), **stub.stats()},
+        "results": results,
+    }
+    if args.json_path:
+        with open(args.json_path, "w", encoding="utf-8") as f:
+            json.dump(report, f, ensure_ascii=False, indent=2)
+        print(f"\n💾 結果を保存: {args.json_path}")
+    if args.baseline:
+        _print_comparison(results, args.baseline)
+    return report
+
+
+if __name__ == "__main__":
+    sys.path.insert(0, str(BACKEND_DIR))
+    asyncio.run(run(parse_args()))
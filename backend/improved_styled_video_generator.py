@@ -1,12 +1,29 @@
 import os
+import re
 import json
 import asyncio
 import aiohttp
+import shutil
 import subprocess
+import time
+import uuid
 from pathlib import Path
-from typing import Dict, List, Optional
+from typing import Awaitable, Callable, Dict, List, Optional
+from contextlib import nullcontext
 from dataclasses import dataclass
 
+from asset_cache import DiskLRUCache, content_key
+from batch_budget import batch_slot
+from media_probe import read_wav_info
+from metrics import observe_stage, record_cache_lookup, record_fallback, record_retry, stage_timer
+from process_budget import ProcessBudget
+from profiling import record_process
+from progress import JobProgress, ProgressCallback, current_progress, report_progress
+from rate_limiter import AdaptiveRateLimiter
+from single_flight import SingleFlight
+from title_renderer import TitleCardRenderer
+from voicevox_pool import VoicevoxPool
+
 @dataclass
 class ImageStyle:
     """画像スタイル設定"""
@@ -16,13 +33,141 @@ class ImageStyle:
     base_settings: dict
     consistency_keywords: List[str]  # スタイル統一のためのキーワード
 
+@dataclass(frozen=True)
+class EncodingProfile:
+    """動画エンコード設定"""
+    name: str
+    width: int
+    height: int
+    fps: int
+    preset: str
+    tune: Optional[str] = None  # 静止画主体なら stillimage
+    crf: Optional[int] = None  # None なら libx264 の既定値
+    audio_bitrate: str = "128k"
+    filename_suffix: str = ""
+
+    @property
+    def scale_filter(self) -> str:
+        """縦型の出力サイズに収まるよう縮小し、余白をパディング"""
+        w, h = self.width, self.height
+        return f"scale={w}:{h}:force_original_aspect_ratio=decrease,pad={w}:{h}:(ow-iw)/2:(oh-ih)/2"
+
+    def video_args(self) -> List[str]:
+        args = ["-c:v", "libx264", "-preset", self.preset]
+        if self.tune:
+            args += ["-tune", self.tune]
+        if self.crf is not None:
+            args += ["-crf", str(self.crf)]
+        return args + ["-pix_fmt", "yuv420p"]
+
+    def audio_args(self) -> List[str]:
+        return ["-c:a", "aac", "-b:a", self.audio_bitrate]
+
 class ImprovedStyledVideoGenerator:
-    def __init__(self, openai_api_key: str, voicevox_url: str = "http://localhost:50021"):
+    RENDER_MODES = ("clips", "single_pass")
+    
+    # エンコード設定
+    #   final: 公開用の高画質（1080x1920, 25fps, preset medium）
+    #   draft: タイミングと絵柄の確認用（540x960, 10fps, ultrafast＋静止画向けチューニング）
+    ENCODING_PROFILES = {
+        "final": EncodingProfile("final", 1080, 1920, 25, "medium"),
+        "draft": EncodingProfile(
+            "draft", 540, 960, 10, "ultrafast",
+            tune="stillimage", crf=30, audio_bitrate="64k", filename_suffix="_draft"
+        ),
+    }
+    
+    # DALL·E 3（1024x1024）の1枚あたりの料金（キャッシュによる節約額の推定用）
+    IMAGE_PRICES_USD = {"standard": 0.04, "hd": 0.08}
+
+    def __init__(
+        self,
+        openai_api_key: str,
+        voicevox_url: str = "http://localhost:50021",
+        ffmpeg_timeout: float = 600,
+        ffprobe_timeout: float = 30,
+        process_budget: Optional[ProcessBudget] = None,
+        render_mode: str = "clips",
+        http_timeout: float = 120,
+        http_connect_timeout: float = 10,
+        http_pool_size: int = 100,
+        http_pool_size_per_host: int = 20,
+        http_keepalive_timeout: float = 60,
+        audio_cache: Optional[DiskLRUCache] = None,
+        image_cache: Optional[DiskLRUCache] = None,
+        title_cache: Optional[DiskLRUCache] = None,
+        single_flight: Optional[SingleFlight] = None,
+        asset_flight: Optional[SingleFlight] = None,
+        streaming_pipeline: bool = False,
+        image_rate_limiter: Optional[AdaptiveRateLimiter] = None,
+        chat_rate_limiter: Optional[AdaptiveRateLimiter] = None,
+        voicevox_pool: Optional[VoicevoxPool] = None,
+        openai_base_url: str = "https://api.openai.com/v1"
+    ):
         self.openai_api_key = openai_api_key
+        # OpenAI互換APIのベースURL（プロキシやベンチマーク用のスタブサーバーに向けられる）
+        self.openai_base_url = openai_base_url.rstrip("/")
         self.voicevox_url = voicevox_url
+        
+        # VOICEVOXエンジンの振り分け先（未指定なら voicevox_url の1台のみ）
+        self.voicevox_pool = voicevox_pool or VoicevoxPool([voicevox_url])
         self.output_dir = Path("generated_videos")
         self.output_dir.mkdir(exist_ok=True)
         
+        # 外部プロセス（ffmpeg/ffprobe）のタイムアウト秒数
+        self.ffmpeg_timeout = ffmpeg_timeout
+        self.ffprobe_timeout = ffprobe_timeout
+        
+        # ffmpegの同時起動数（全ジョブで共有）。未指定ならCPUコア数まで
+        self.process_budget = process_budget or ProcessBudget(os.cpu_count() or 2)
+        
+        # 動画の組み立て方法
+        #   clips: シーンごとの一時クリップを並列エンコードしてから concat で結合
+        #   single_pass: concat フィルタグラフで全素材を1回のffmpegでエンコード
+        if render_mode not in self.RENDER_MODES:
+            raise ValueError(f"render_mode '{render_mode}' は無効です。利用可能: {list(self.RENDER_MODES)}")
+        self.render_mode = render_mode
+        
+        # clipsモード時、素材が揃ったシーンから順にエンコードを開始する（全素材の完成を待たない）
+        self.streaming_pipeline = streaming_pipeline
+        
+        # OpenAI/VOICEVOX共通のHTTPクライアント（接続プール・Keep-Alive）。最初の利用時に作成
+        self.http_timeout = aiohttp.ClientTimeout(total=http_timeout, connect=http_connect_timeout)
+        self.http_pool_size = http_pool_size
+        self.http_pool_size_per_host = http_pool_size_per_host
+        self.http_keepalive_timeout = http_keepalive_timeout
+        self._http_session: Optional[aiohttp.ClientSession] = None
+        
+        # VOICEVOX音声キャッシュ（テキスト・話者・クエリ調整値をキーにした内容アドレス型）
+        self.audio_cache = audio_cache or DiskLRUCache(
+            self.output_dir / ".cache" / "audio", 512 * 1024 * 1024, suffix=".wav"
+        )
+        
+        # 生成画像キャッシュ（プロンプト全文・サイズ・品質・スタイルをキーにした内容アドレス型）
+        self.image_cache = image_cache or DiskLRUCache(
+            self.output_dir / ".cache" / "images", 2 * 1024 * 1024 * 1024, suffix=".png",
+            ttl_seconds=7 * 24 * 3600
+        )
+        self.image_cost_saved = 0.0
+        
+        # タイトル画面キャッシュ（タイトル・スタイルがキー）。生成画像の統計・容量と混ざらないよう別にする
+        self.title_cache = title_cache or DiskLRUCache(
+            self.output_dir / ".cache" / "titles", 256 * 1024 * 1024, suffix=".png"
+        )
+        
+        # タイトル画面・ダミー画像のレンダラー（スタイル別の背景レイヤーとフォントをキャッシュ）
+        self.title_renderer = TitleCardRenderer()
+        
+        # OpenAI呼び出しのレート制限（全ジョブで共有）。上限は応答ヘッダーの値に追従する
+        self.image_rate_limiter = image_rate_limiter or AdaptiveRateLimiter("images", rate_per_minute=7)
+        self.chat_rate_limiter = chat_rate_limiter or AdaptiveRateLimiter("chat", rate_per_minute=500)
+        
+        # 台本・お題提案の同時リクエストをまとめる（Redisを渡せばプロセス間でも共有）
+        self.single_flight = single_flight or SingleFlight()
+        
+        # 同じ音声・タイトル画面の同時作成をまとめる（プレビュー中の先行生成と動画生成が重なった場合など）
+        self.asset_flight = asset_flight or SingleFlight(namespace="asset")
+        
         # MulmoCastの手法を参考にしたスタイル定義
         self.image_styles = {
             "ghibli": ImageStyle(
@@ -64,6 +209,47 @@ class ImprovedStyledVideoGenerator:
             )
         }
 
+    async def http_session(self) -> aiohttp.ClientSession:
+        """接続プール付きの共有HTTPセッションを取得（未作成・クローズ済みなら作成）"""
+        if self._http_session is None or self._http_session.closed:
+            connector = aiohttp.TCPConnector(
+                limit=self.http_pool_size,
+                limit_per_host=self.http_pool_size_per_host,
+                keepalive_timeout=self.http_keepalive_timeout,
+                ttl_dns_cache=300
+            )
+            self._http_session = aiohttp.ClientSession(connector=connector, timeout=self.http_timeout)
+        return self._http_session
+
+    def cache_stats(self) -> Dict[str, dict]:
+        """素材キャッシュの統計（このプロセス分）"""
+        image_stats = self.image_cache.stats()
+        image_stats["estimated_cost_saved_usd"] = round(self.image_cost_saved, 2)
+        return {
+            "audio": self.audio_cache.stats(),
+            "image": image_stats,
+            "title": self.title_cache.stats()
+        }
+
+    async def start(self) -> None:
+        """HTTPセッションを事前に作成し、VOICEVOXのヘルスチェックを開始（アプリ起動時に呼び出す）"""
+        await self.http_session()
+        self.voicevox_pool.start(self.http_session)
+
+    async def close(self) -> None:
+        """ヘルスチェックを止めてHTTPセッションをクローズ（アプリ終了時に呼び出す）"""
+        await self.voicevox_pool.close()
+        if self._http_session is not None and not self._http_session.closed:
+            await self._http_session.close()
+        self._http_session = None
+
+    async def __aenter__(self):
+        await self.start()
+        return self
+
+    async def __aexit__(self, exc_type, exc, tb):
+        await self.close()
+
     def list_available_styles(self) -> None:
         """利用可能なスタイル一覧を表示"""
         print("🎨 利用可能な画像スタイル:")
@@ -73,7 +259,15 @@ class ImprovedStyledVideoGenerator:
         print("=" * 50)
 
     async def suggest_topics_from_theme(self, theme: str) -> List[str]:
-        """テーマから具体的なお題を提案"""
+        """テーマから具体的なお題を提案（同じテーマの同時リクエストは1回のAPI呼び出しにまとめる）"""
+        return await self.single_flight.do(
+            content_key("topics", theme),
+            lambda: self._suggest_topics_from_theme(theme),
+            should_cache=bool  # 失敗時の空リストはキャッシュしない
+        )
+
+    async def _suggest_topics_from_theme(self, theme: str) -> List[str]:
+        """テーマから具体的なお題を提案（OpenAI呼び出し本体）"""
         prompt = f"""
         以下のテーマに基づいて、ショート動画に適した魅力的なお題を5つ提案してください。
         テーマ: {theme}
@@ -110,11 +304,6 @@ class ImprovedStyledVideoGenerator:
         - リバウンドしやすい人の特徴 3選
         """
         
-        headers = {
-            "Authorization": f"Bearer {self.openai_api_key}",
-            "Content-Type": "application/json"
-        }
-        
         data = {
             "model": "gpt-4o",
             "messages": [{"role": "user", "content": prompt}],
@@ -122,38 +311,35 @@ class ImprovedStyledVideoGenerator:
         }
         
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    "https://api.openai.com/v1/chat/completions",
-                    headers=headers,
-                    json=data
-                ) as response:
-                    result = await response.json()
-                    
-                    if "error" in result:
-                        print(f"OpenAI APIエラー: {result['error']}")
-                        return []
-                    
-                    suggestion_text = result["choices"][0]["message"]["content"]
-                    
-                    try:
-                        if "```json" in suggestion_text:
-                            json_start = suggestion_text.find("```json") + 7
-                            json_end = suggestion_text.find("```", json_start)
-                            json_text = suggestion_text[json_start:json_end].strip()
-                        else:
-                            json_start = suggestion_text.find("{")
-                            json_end = suggestion_text.rfind("}") + 1
-                            json_text = suggestion_text[json_start:json_end]
-                        
-                        suggestions_data = json.loads(json_text)
-                        return suggestions_data["suggestions"]
-                        
-                    except json.JSONDecodeError as e:
-                        print(f"JSON解析エラー: {e}")
-                        print(f"取得したテキスト: {suggestion_text}")
-                        return []
-                        
+            with stage_timer("topic_suggest") as span:
+                result = await self._post_openai(f"{self.openai_base_url}/chat/completions", data, self.chat_rate_limiter)
+                if "error" in result:
+                    span.fail()
+            
+            if "error" in result:
+                print(f"OpenAI APIエラー: {result['error']}")
+                return []
+            
+            suggestion_text = result["choices"][0]["message"]["content"]
+            
+            try:
+                if "```json" in suggestion_text:
+                    json_start = suggestion_text.find("```json") + 7
+                    json_end = suggestion_text.find("```", json_start)
+                    json_text = suggestion_text[json_start:json_end].strip()
+                else:
+                    json_start = suggestion_text.find("{")
+                    json_end = suggestion_text.rfind("}") + 1
+                    json_text = suggestion_text[json_start:json_end]
+                
+                suggestions_data = json.loads(json_text)
+                return suggestions_data["suggestions"]
+                
+            except json.JSONDecodeError as e:
+                print(f"JSON解析エラー: {e}")
+                print(f"取得したテキスト: {suggestion_text}")
+                return []
+                
         except Exception as e:
             print(f"お題提案生成中にエラー: {e}")
             return []
@@ -232,11 +418,22 @@ class ImprovedStyledVideoGenerator:
             else:
                 print("❌ 1 または 2 を入力してください。")
 
-    async def generate_script(self, topic: str, style_name: str) -> Dict:
-        """改良版台本生成（絵の説明を除去、順位のみフォーカス）"""
-        style = self.image_styles.get(style_name)
-        if not style:
+    async def generate_script(self, topic: str, style_name: str, regenerate: bool = False) -> Dict:
+        """改良版台本生成（同じお題・スタイルの同時リクエストは1回のAPI呼び出しにまとめる）
+
+        regenerate=True（台本の再生成）は直前の結果キャッシュを使わず、新しく台本を作る。
+        """
+        if style_name not in self.image_styles:
             raise ValueError(f"スタイル '{style_name}' が見つかりません")
+        return await self.single_flight.do(
+            content_key("script", topic, style_name),
+            lambda: self._generate_script(topic, style_name),
+            use_cache=not regenerate
+        )
+
+    async def _generate_script(self, topic: str, style_name: str) -> Dict:
+        """改良版台本生成（絵の説明を除去、順位のみフォーカス）"""
+        style = self.image_styles[style_name]
 
         prompt = f"""
         以下のお題で{style.name}スタイルのショート動画（15-30秒）の台本を作成してください。
@@ -276,50 +473,44 @@ class ImprovedStyledVideoGenerator:
         - 悪い例: "第3位は夜遅くに食事をすることです。この画像では時計が深夜を指している様子が描かれています。"
         """
         
-        headers = {
-            "Authorization": f"Bearer {self.openai_api_key}",
-            "Content-Type": "application/json"
-        }
-        
         data = {
             "model": "gpt-4o",  # より高品質なモデルを使用
             "messages": [{"role": "user", "content": prompt}],
             "temperature": 0.5  # より一貫性を重視
         }
         
-        async with aiohttp.ClientSession() as session:
-            async with session.post(
-                "https://api.openai.com/v1/chat/completions",
-                headers=headers,
-                json=data
-            ) as response:
-                result = await response.json()
-                
+        async with batch_slot("llm"):
+            with stage_timer("script") as span:
+                result = await self._post_openai(f"{self.openai_base_url}/chat/completions", data, self.chat_rate_limiter)
                 if "error" in result:
-                    print(f"OpenAI APIエラー: {result['error']}")
-                    raise Exception(f"API Error: {result['error']['message']}")
-                
-                script_text = result["choices"][0]["message"]["content"]
-                
-                try:
-                    if "```json" in script_text:
-                        json_start = script_text.find("```json") + 7
-                        json_end = script_text.find("```", json_start)
-                        json_text = script_text[json_start:json_end].strip()
-                    else:
-                        json_start = script_text.find("{")
-                        json_end = script_text.rfind("}") + 1
-                        json_text = script_text[json_start:json_end]
-                    
-                    script = json.loads(json_text)
-                    return script
-                except json.JSONDecodeError as e:
-                    print(f"JSON解析エラー: {e}")
-                    print(f"取得したテキスト: {script_text}")
-                    raise
+                    span.fail()
+        
+        if "error" in result:
+            print(f"OpenAI APIエラー: {result['error']}")
+            raise Exception(f"API Error: {result['error']['message']}")
+        
+        script_text = result["choices"][0]["message"]["content"]
+        
+        try:
+            if "```json" in script_text:
+                json_start = script_text.find("```json") + 7
+                json_end = script_text.find("```", json_start)
+                json_text = script_text[json_start:json_end].strip()
+            else:
+                json_start = script_text.find("{")
+                json_end = script_text.rfind("}") + 1
+                json_text = script_text[json_start:json_end]
+            
+            script = json.loads(json_text)
+            return script
+        except json.JSONDecodeError as e:
+            print(f"JSON解析エラー: {e}")
+            print(f"取得したテキスト: {script_text}")
+            raise
 
-    async def generate_consistent_image(self, visual_concept: str, style_name: str, scene_num: int, character_reference: str = "") -> str:
+    async def generate_consistent_image(self, visual_concept: str, style_name: str, scene_num: int, character_reference: str = "", workspace: Optional[Path] = None) -> str:
         """スタイル統一性を重視した画像生成"""
+        work_dir = workspace or self.output_dir
         style = self.image_styles[style_name]
         
         # 統一性のためのベースプロンプト構築
@@ -339,11 +530,6 @@ class ImprovedStyledVideoGenerator:
         if len(full_prompt) > 1000:
             full_prompt = f"{visual_concept[:300]}, {base_consistency}, {style.style_prompt[:400]}"
         
-        headers = {
-            "Authorization": f"Bearer {self.openai_api_key}",
-            "Content-Type": "application/json"
-        }
-        
         # MulmoCastが使用するgpt-image-1相当の設定
         data = {
             "model": "dall-e-3",
@@ -354,411 +540,443 @@ class ImprovedStyledVideoGenerator:
             "n": 1
         }
         
+        # 同じプロンプト・設定の画像は生成済みのものを再利用
+        image_path = work_dir / f"{style_name}_consistent_scene_{scene_num}.png"
+        cache_key = DiskLRUCache.make_key(data["model"], full_prompt, data["size"], data["quality"], data["style"])
+        if self._copy_from_cache(self.image_cache, "image", cache_key, image_path):
+            self.image_cost_saved += self.IMAGE_PRICES_USD.get(data["quality"], 0.0)
+            print(f"♻️ {style.name}スタイル画像キャッシュ利用: シーン{scene_num + 1}")
+            return str(image_path)
+        
+        started_at = time.monotonic()
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    "https://api.openai.com/v1/images/generations",
-                    headers=headers,
-                    json=data
-                ) as response:
-                    result = await response.json()
-                    
+            async with batch_slot("image"):
+                with stage_timer("image_request") as span:
+                    result = await self._post_openai(f"{self.openai_base_url}/images/generations", data, self.image_rate_limiter)
                     if "error" in result:
-                        print(f"画像生成エラー: {result['error']['message']}")
-                        return self.create_styled_dummy_image(scene_num, visual_concept, style_name)
-                    
-                    image_url = result["data"][0]["url"]
-                    
-                    # 画像をダウンロード
-                    async with session.get(image_url) as img_response:
-                        image_path = self.output_dir / f"{style_name}_consistent_scene_{scene_num}.png"
-                        with open(image_path, "wb") as f:
-                            f.write(await img_response.read())
-                        
-                        print(f"✅ {style.name}スタイル画像生成完了: シーン{scene_num + 1}")
-                        return str(image_path)
-                        
+                        span.fail()
+            
+            if "error" in result:
+                print(f"画像生成エラー: {result['error']['message']}")
+                record_fallback("dummy_image")
+                return await self.create_styled_dummy_image_async(scene_num, visual_concept, style_name, workspace)
+            
+            image_url = result["data"][0]["url"]
+            
+            # 画像をダウンロード
+            session = await self.http_session()
+            with stage_timer("image_download") as span:
+                async with session.get(image_url) as img_response:
+                    image_data = await img_response.read()
+                    if img_response.status != 200:
+                        span.fail()
+            with open(image_path, "wb") as f:
+                f.write(image_data)
+            if img_response.status == 200:
+                self.image_cache.put(cache_key, image_data, cost_seconds=time.monotonic() - started_at)
+            
+            print(f"✅ {style.name}スタイル画像生成完了: シーン{scene_num + 1}")
+            return str(image_path)
+                
         except Exception as e:
             print(f"画像生成中にエラー: {e}")
-            return self.create_styled_dummy_image(scene_num, visual_concept, style_name)
+            record_fallback("dummy_image")
+            return await self.create_styled_dummy_image_async(scene_num, visual_concept, style_name, workspace)
+
+    async def create_styled_dummy_image_async(self, scene_num: int, concept: str, style_name: str, workspace: Optional[Path] = None) -> str:
+        """ダミー画像の作成をスレッドで実行（イベントループを止めない）"""
+        with stage_timer("dummy_render"):
+            return await asyncio.to_thread(self.create_styled_dummy_image, scene_num, concept, style_name, workspace)
 
-    def create_styled_dummy_image(self, scene_num: int, concept: str, style_name: str) -> str:
+    def create_styled_dummy_image(self, scene_num: int, concept: str, style_name: str, workspace: Optional[Path] = None) -> str:
         """スタイル統一されたダミー画像を作成"""
+        work_dir = workspace or self.output_dir
         try:
-            from PIL import Image, ImageDraw, ImageFont
-            
             style = self.image_styles[style_name]
-            
-            # スタイル別カラーパレット
-            color_schemes = {
-                "ghibli": {"bg": "#E8F4FD", "text": "#2E4F3D", "accent": "#7FB069"},
-                "anime": {"bg": "#FFF0F8", "text": "#2D3748", "accent": "#FF6B9D"},
-                "realistic": {"bg": "#F7FAFC", "text": "#1A202C", "accent": "#4A5568"},
-                "watercolor": {"bg": "#F0F8F8", "text": "#2C5F5F", "accent": "#4A90A4"}
-            }
-            
-            colors = color_schemes.get(style_name, {"bg": "#F5F5F5", "text": "#333333", "accent": "#666666"})
-            
-            img = Image.new('RGB', (1080, 1920), color=colors["bg"])
-            draw = ImageDraw.Draw(img)
-            
-            # スタイル名とシーン情報
-            title_text = f"【{style.name}】"
-            scene_text = f"シーン {scene_num + 1}"
-            concept_text = concept[:100] + "..." if len(concept) > 100 else concept
-            
-            try:
-                title_font = ImageFont.truetype("msgothic.ttc", 64)
-                scene_font = ImageFont.truetype("msgothic.ttc", 48)
-                concept_font = ImageFont.truetype("msgothic.ttc", 36)
-            except:
-                title_font = ImageFont.load_default()
-                scene_font = ImageFont.load_default()
-                concept_font = ImageFont.load_default()
-            
-            # タイトル描画
-            title_bbox = draw.textbbox((0, 0), title_text, font=title_font)
-            title_x = (1080 - (title_bbox[2] - title_bbox[0])) // 2
-            draw.text((title_x, 300), title_text, fill=colors["accent"], font=title_font)
-            
-            # シーン番号描画
-            scene_bbox = draw.textbbox((0, 0), scene_text, font=scene_font)
-            scene_x = (1080 - (scene_bbox[2] - scene_bbox[0])) // 2
-            draw.text((scene_x, 500), scene_text, fill=colors["text"], font=scene_font)
-            
-            # コンセプト描画
-            concept_bbox = draw.textbbox((0, 0), concept_text, font=concept_font)
-            concept_x = (1080 - (concept_bbox[2] - concept_bbox[0])) // 2
-            draw.text((concept_x, 700), concept_text, fill=colors["text"], font=concept_font)
-            
-            image_path = self.output_dir / f"{style_name}_consistent_scene_{scene_num}.png"
-            img.save(image_path)
+            image_path = work_dir / f"{style_name}_consistent_scene_{scene_num}.png"
+            self.title_renderer.render_dummy(scene_num, concept, style_name, style.name, image_path)
             print(f"📸 {style.name}スタイルダミー画像作成: {image_path}")
             return str(image_path)
             
         except ImportError:
             print("PILがインストールされていません。基本ダミーファイルを作成します。")
-            image_path = self.output_dir / f"{style_name}_consistent_scene_{scene_num}.txt"
+            image_path = work_dir / f"{style_name}_consistent_scene_{scene_num}.txt"
             with open(image_path, "w", encoding="utf-8") as f:
                 f.write(f"スタイル: {style_name}\nシーン: {scene_num + 1}\nコンセプト: {concept}")
             return str(image_path)
 
-    async def generate_audio(self, text: str, scene_num: int, speaker_id: int = 1) -> str:
-        """VOICEVOXで音声を生成"""
+    async def generate_audio(self, text: str, scene_num: int, speaker_id: int = 1, workspace: Optional[Path] = None) -> str:
+        """VOICEVOXで音声を生成（同じテキスト・話者ならキャッシュを利用）"""
+        audio_path = (workspace or self.output_dir) / f"consistent_scene_{scene_num}.wav"
+        cache_key = DiskLRUCache.make_key("voicevox", text, speaker_id, {})
+        if self._copy_from_cache(self.audio_cache, "audio", cache_key, audio_path):
+            return str(audio_path)
+        
+        async def synthesize() -> bytes:
+            session = await self.http_session()
+            async with batch_slot("tts"):
+                return await self.voicevox_pool.synthesize(session, text, speaker_id)
+        
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.voicevox_url}/audio_query",
-                    params={"text": text, "speaker": speaker_id}
-                ) as response:
-                    if response.status != 200:
-                        print(f"音声クエリ取得失敗: {response.status}")
-                        return ""
-                    audio_query = await response.json()
+            await self._produce_asset(self.audio_cache, cache_key, audio_path, synthesize)
+            return str(audio_path)
                 
-                async with session.post(
-                    f"{self.voicevox_url}/synthesis",
-                    params={"speaker": speaker_id},
-                    json=audio_query
-                ) as response:
-                    if response.status != 200:
-                        print(f"音声合成失敗: {response.status}")
-                        return ""
-                    
-                    audio_data = await response.read()
-                    audio_path = self.output_dir / f"consistent_scene_{scene_num}.wav"
-                    with open(audio_path, "wb") as f:
-                        f.write(audio_data)
-                    return str(audio_path)
-                    
         except Exception as e:
             print(f"音声生成エラー: {e}")
             return ""
 
-    def create_title_image(self, title: str, style_name: str) -> str:
-        """タイトル画面の画像を作成"""
+    def create_title_image(self, title: str, style_name: str, workspace: Optional[Path] = None) -> str:
+        """タイトル画面の画像を作成（背景・装飾はスタイルごとにキャッシュ済みのものを利用）"""
+        work_dir = workspace or self.output_dir
         try:
-            from PIL import Image, ImageDraw, ImageFont
-            
             style = self.image_styles[style_name]
-            
-            # スタイル別デザイン設定
-            design_schemes = {
-                "ghibli": {
-                    "bg_color": "#2E4F3D",
-                    "text_color": "#F0F8F0", 
-                    "accent_color": "#7FB069",
-                    "gradient": True
-                },
-                "anime": {
-                    "bg_color": "#1A1A2E",
-                    "text_color": "#FFFFFF",
-                    "accent_color": "#FF6B9D",
-                    "gradient": True
-                },
-                "realistic": {
-                    "bg_color": "#000000",
-                    "text_color": "#FFFFFF",
-                    "accent_color": "#4A90A4",
-                    "gradient": False
-                },
-                "watercolor": {
-                    "bg_color": "#2C3E50",
-                    "text_color": "#ECF0F1",
-                    "accent_color": "#3498DB",
-                    "gradient": True
-                }
-            }
-            
-            design = design_schemes.get(style_name, design_schemes["realistic"])
-            
-            # 1080x1920の縦型画像を作成
-            img = Image.new('RGB', (1080, 1920), color=design["bg_color"])
-            draw = ImageDraw.Draw(img)
-            
-            # グラデーション効果（簡易版）
-            if design["gradient"]:
-                for y in range(1920):
-                    alpha = y / 1920
-                    # 上から下に向かって少し明るくなるグラデーション
-                    r = int(int(design["bg_color"][1:3], 16) * (1 + alpha * 0.2))
-                    g = int(int(design["bg_color"][3:5], 16) * (1 + alpha * 0.2))
-                    b = int(int(design["bg_color"][5:7], 16) * (1 + alpha * 0.2))
-                    r, g, b = min(255, r), min(255, g), min(255, b)
-                    color = f"#{r:02x}{g:02x}{b:02x}"
-                    draw.line([(0, y), (1080, y)], fill=color)
-            
-            # フォント設定
-            try:
-                # 日本語フォントを試す
-                title_font = ImageFont.truetype("msgothic.ttc", 72)
-                subtitle_font = ImageFont.truetype("msgothic.ttc", 48)
-            except:
-                try:
-                    # 英語フォントを試す
-                    title_font = ImageFont.truetype("arial.ttf", 72)
-                    subtitle_font = ImageFont.truetype("arial.ttf", 48)
-                except:
-                    # デフォルトフォント
-                    title_font = ImageFont.load_default()
-                    subtitle_font = ImageFont.load_default()
-            
-            # タイトルテキストの処理
-            title_text = title
-            
-            # アクセントライン描画
-            accent_y = 800
-            draw.rectangle([(200, accent_y), (880, accent_y + 8)], fill=design["accent_color"])
-            
-            # タイトルテキストの描画
-            title_bbox = draw.textbbox((0, 0), title_text, font=title_font)
-            title_width = title_bbox[2] - title_bbox[0]
-            title_height = title_bbox[3] - title_bbox[1]
-            
-            # 長いタイトルの場合は改行
-            if title_width > 900:
-                # 簡易的な改行処理
-                words = title_text.split()
-                if len(words) > 1:
-                    mid = len(words) // 2
-                    line1 = " ".join(words[:mid])
-                    line2 = " ".join(words[mid:])
-                    
-                    # 1行目
-                    line1_bbox = draw.textbbox((0, 0), line1, font=title_font)
-                    line1_width = line1_bbox[2] - line1_bbox[0]
-                    line1_x = (1080 - line1_width) // 2
-                    draw.text((line1_x, 900), line1, fill=design["text_color"], font=title_font)
-                    
-                    # 2行目
-                    line2_bbox = draw.textbbox((0, 0), line2, font=title_font)
-                    line2_width = line2_bbox[2] - line2_bbox[0]
-                    line2_x = (1080 - line2_width) // 2
-                    draw.text((line2_x, 1000), line2, fill=design["text_color"], font=title_font)
-                else:
-                    # 1つの単語の場合はそのまま
-                    title_x = (1080 - title_width) // 2
-                    draw.text((title_x, 950), title_text, fill=design["text_color"], font=title_font)
-            else:
-                # 1行で収まる場合
-                title_x = (1080 - title_width) // 2
-                draw.text((title_x, 950), title_text, fill=design["text_color"], font=title_font)
-            
-            # スタイル表示
-            style_text = f"Style: {style.name}"
-            style_bbox = draw.textbbox((0, 0), style_text, font=subtitle_font)
-            style_width = style_bbox[2] - style_bbox[0]
-            style_x = (1080 - style_width) // 2
-            draw.text((style_x, 1200), style_text, fill=design["accent_color"], font=subtitle_font)
-            
-            # 装飾要素
-            # 上部の装飾線
-            draw.rectangle([(340, 600), (740, 608)], fill=design["accent_color"])
-            # 下部の装飾線  
-            draw.rectangle([(340, 1400), (740, 1408)], fill=design["accent_color"])
-            
-            # 角の装飾
-            corner_size = 50
-            # 左上
-            draw.rectangle([(100, 100), (100 + corner_size, 108)], fill=design["accent_color"])
-            draw.rectangle([(100, 100), (108, 100 + corner_size)], fill=design["accent_color"])
-            # 右上
-            draw.rectangle([(980 - corner_size, 100), (980, 108)], fill=design["accent_color"])
-            draw.rectangle([(972, 100), (980, 100 + corner_size)], fill=design["accent_color"])
-            # 左下
-            draw.rectangle([(100, 1812), (100 + corner_size, 1820)], fill=design["accent_color"])
-            draw.rectangle([(100, 1820 - corner_size), (108, 1820)], fill=design["accent_color"])
-            # 右下
-            draw.rectangle([(980 - corner_size, 1812), (980, 1820)], fill=design["accent_color"])
-            draw.rectangle([(972, 1820 - corner_size), (980, 1820)], fill=design["accent_color"])
-            
-            title_image_path = self.output_dir / f"title_{style_name}.png"
-            img.save(title_image_path)
+            title_image_path = work_dir / f"title_{style_name}.png"
+            self.title_renderer.render_title(title, style_name, style.name, title_image_path)
             print(f"📺 タイトル画面作成完了: {title_image_path}")
             return str(title_image_path)
             
         except ImportError:
             print("❌ PILがインストールされていません。pip install Pillow を実行してください。")
+            record_fallback("placeholder_title")
             # 基本的なテキストファイルを作成
-            title_image_path = self.output_dir / f"title_{style_name}.txt"
+            title_image_path = work_dir / f"title_{style_name}.txt"
             with open(title_image_path, "w", encoding="utf-8") as f:
                 f.write(f"タイトル: {title}\nスタイル: {style_name}")
             return str(title_image_path)
         except Exception as e:
             print(f"タイトル画像作成中にエラー: {e}")
-            title_image_path = self.output_dir / f"title_{style_name}.txt"
+            record_fallback("placeholder_title")
+            title_image_path = work_dir / f"title_{style_name}.txt"
             with open(title_image_path, "w", encoding="utf-8") as f:
                 f.write(f"タイトル: {title}\nスタイル: {style_name}")
             return str(title_image_path)
 
-    async def generate_title_audio(self, title: str, speaker_id: int = 1) -> str:
-        """タイトル読み上げ音声を生成"""
+    async def create_title_image_async(self, title: str, style_name: str, workspace: Optional[Path] = None) -> str:
+        """タイトル画面の作成をスレッドで実行（イベントループを止めない）
+
+        同じタイトル・スタイルの画面はタイトル画面キャッシュから再利用する（プレビュー中の先行生成分など）。
+        """
+        title_image_path = (workspace or self.output_dir) / f"title_{style_name}.png"
+        cache_key = DiskLRUCache.make_key("title_card", title, style_name)
+        if self._copy_from_cache(self.title_cache, "title_card", cache_key, title_image_path):
+            return str(title_image_path)
+        
+        async def render() -> Optional[bytes]:
+            with stage_timer("title_render"):
+                rendered_path = await asyncio.to_thread(self.create_title_image, title, style_name, workspace)
+            # 代替のテキストファイルになった場合はキャッシュしない
+            return title_image_path.read_bytes() if rendered_path == str(title_image_path) else None
+        
+        if await self._produce_asset(self.title_cache, cache_key, title_image_path, render):
+            return str(title_image_path)
+        return str(title_image_path.with_suffix(".txt"))
+
+    async def generate_title_audio(self, title: str, speaker_id: int = 1, workspace: Optional[Path] = None) -> str:
+        """タイトル読み上げ音声を生成（同じタイトル・話者ならキャッシュを利用）"""
+        # 少し間を開けるために速度を調整
+        query_overrides = {"speedScale": 0.9}  # 少しゆっくり読む
+        title_audio_path = (workspace or self.output_dir) / "title_audio.wav"
+        cache_key = DiskLRUCache.make_key("voicevox", title, speaker_id, query_overrides)
+        if self._copy_from_cache(self.audio_cache, "audio", cache_key, title_audio_path):
+            print(f"🎵 タイトル音声キャッシュ利用: {title_audio_path}")
+            return str(title_audio_path)
+        
+        async def synthesize() -> bytes:
+            session = await self.http_session()
+            async with batch_slot("tts"):
+                return await self.voicevox_pool.synthesize(session, title, speaker_id, query_overrides)
+        
         try:
-            async with aiohttp.ClientSession() as session:
-                async with session.post(
-                    f"{self.voicevox_url}/audio_query",
-                    params={"text": title, "speaker": speaker_id}
-                ) as response:
-                    if response.status != 200:
-                        print(f"タイトル音声クエリ取得失敗: {response.status}")
-                        return ""
-                    audio_query = await response.json()
-                
-                # 少し間を開けるために速度を調整
-                audio_query["speedScale"] = 0.9  # 少しゆっくり読む
+            await self._produce_asset(self.audio_cache, cache_key, title_audio_path, synthesize)
+            
+            print(f"🎵 タイトル音声生成完了: {title_audio_path}")
+            return str(title_audio_path)
                 
-                async with session.post(
-                    f"{self.voicevox_url}/synthesis",
-                    params={"speaker": speaker_id},
-                    json=audio_query
-                ) as response:
-                    if response.status != 200:
-                        print(f"タイトル音声合成失敗: {response.status}")
-                        return ""
-                    
-                    audio_data = await response.read()
-                    title_audio_path = self.output_dir / "title_audio.wav"
-                    with open(title_audio_path, "wb") as f:
-                        f.write(audio_data)
-                    
-                    print(f"🎵 タイトル音声生成完了: {title_audio_path}")
-                    return str(title_audio_path)
-                    
         except Exception as e:
             print(f"タイトル音声生成エラー: {e}")
             return ""
 
-    def create_video(self, script: Dict, image_paths: List[str], audio_paths: List[str], title_image_path: str = "", title_audio_path: str = "") -> str:
-        """タイトル付きFFmpeg動画生成"""
-        style_name = script.get('style', 'default')
-        output_path = self.output_dir / f"{script['title'].replace(' ', '_')}_{style_name}_with_title.mp4"
+    async def _post_openai(self, url: str, data: dict, limiter: AdaptiveRateLimiter) -> dict:
+        """OpenAI APIへPOSTし、応答JSONを返す
+
+        共有のレート制限（トークンバケット＋AIMDウィンドウ）の範囲内で送信し、429・5xx・通信エラーは
+        Retry-After またはジッター付き指数バックオフで再試行する。再試行し尽くした場合は最後の応答を返す。
+        JSONでない応答（プロキシのエラーページ等）は {"error": {"message": ...}} として扱う。
+        """
+        headers = {
+            "Authorization": f"Bearer {self.openai_api_key}",
+            "Content-Type": "application/json"
+        }
+        session = await self.http_session()
+        attempt = 0
+        while True:
+            status = None
+            response_headers = {}
+            try:
+                async with limiter.slot():
+                    async with session.post(url, headers=headers, json=data) as response:
+                        status = response.status
+                        response_headers = response.headers
+                        body = await response.text(errors="replace")
+            except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                if attempt >= limiter.max_retries:
+                    raise
+                print(f"⚠️ OpenAI {limiter.name} 通信エラー: {e}")
+            else:
+                try:
+                    result = json.loads(body)
+                except ValueError:
+                    result = {"error": {"message": f"HTTP {status}: {body[:200]}"}}
+                if status not in limiter.RETRYABLE_STATUSES:
+                    if status < 400:
+                        await limiter.on_success(response_headers)
+                    return result
+                if attempt >= limiter.max_retries:
+                    return result
+            
+            delay = await limiter.on_retryable_failure(status, response_headers, attempt)
+            record_retry(limiter.name, status)
+            attempt += 1
+            print(f"⏳ OpenAI {limiter.name} 再試行 {attempt}/{limiter.max_retries}（{delay:.1f}秒後, status={status}）")
+            await asyncio.sleep(delay)
+
+    async def _run_command(self, cmd: List[str], timeout: float) -> bytes:
+        """外部コマンドをイベントループを止めずに実行し、標準出力を返す
+
+        プロファイル取得中のジョブでは、引数・実行時間・終了コードを記録する。
+        """
+        started = time.perf_counter()
+        process = await asyncio.create_subprocess_exec(
+            *cmd,
+            stdout=asyncio.subprocess.PIPE,
+            stderr=asyncio.subprocess.PIPE
+        )
+        try:
+            stdout, stderr = await asyncio.wait_for(process.communicate(), timeout)
+        except asyncio.TimeoutError:
+            process.kill()
+            await process.wait()
+            raise subprocess.TimeoutExpired(cmd, timeout)
+        except asyncio.CancelledError:
+            # ジョブがキャンセルされた場合は子プロセスも確実に終了させる
+            process.kill()
+            await process.wait()
+            raise
+        finally:
+            record_process(cmd, time.perf_counter() - started, process.returncode)
         
-        temp_videos = []
+        if process.returncode != 0:
+            raise subprocess.CalledProcessError(process.returncode, cmd, stdout, stderr)
+        return stdout
+
+    async def _probe_duration(self, media_path: str) -> float:
+        """メディアの長さ（秒）を取得
+
+        WAV（VOICEVOXの出力）はRIFFヘッダーをプロセス内で読み、それ以外の形式のみffprobeを起動する。
+        """
+        wav_info = read_wav_info(media_path)
+        if wav_info is not None and wav_info.duration > 0:
+            return wav_info.duration
         
-        try:
-            # タイトルシーンの作成
-            if title_image_path and title_audio_path:
-                title_temp_video = self.output_dir / f"temp_title_{style_name}.mp4"
-                temp_videos.append(title_temp_video)
-                
-                # タイトル音声の長さを取得
-                try:
-                    duration_cmd = [
-                        "ffprobe", "-v", "quiet", "-show_entries", "format=duration",
-                        "-of", "csv=p=0", title_audio_path
-                    ]
-                    title_duration = float(subprocess.check_output(duration_cmd).decode().strip())
-                    # タイトル表示時間を少し長めに（音声＋0.5秒）
-                    title_duration += 0.5
-                except:
-                    title_duration = 3  # デフォルト3秒
-                
-                # タイトル動画作成
-                title_ffmpeg_cmd = [
-                    "ffmpeg", "-y",
-                    "-loop", "1", "-i", title_image_path,
-                    "-i", title_audio_path,
-                    "-c:v", "libx264", "-t", str(title_duration),
-                    "-pix_fmt", "yuv420p",
-                    "-vf", "scale=1080:1920:force_original_aspect_ratio=decrease,pad=1080:1920:(ow-iw)/2:(oh-ih)/2",
-                    "-c:a", "aac", "-b:a", "128k",
-                    "-preset", "medium",
-                    str(title_temp_video)
-                ]
-                
-                try:
-                    subprocess.run(title_ffmpeg_cmd, check=True, capture_output=True)
-                    print(f"📺 タイトルシーン動画作成完了")
-                except subprocess.CalledProcessError as e:
-                    print(f"❌ タイトルシーン動画作成失敗: {e}")
-                    temp_videos.remove(title_temp_video)
+        duration_cmd = [
+            "ffprobe", "-v", "quiet", "-show_entries", "format=duration",
+            "-of", "csv=p=0", media_path
+        ]
+        with stage_timer("ffprobe"):
+            output = await self._run_command(duration_cmd, self.ffprobe_timeout)
+        return float(output.decode().strip())
+
+    async def _run_ffmpeg(self, cmd: List[str], stage: str = "ffmpeg") -> bytes:
+        """ノード全体のffmpegプロセス予算の範囲内でffmpegを実行
+
+        予算の空き待ち時間（ffmpeg_wait）と実行時間（stage）を別々に記録する。
+        バッチ処理中のジョブは、ノードの予算より先にバッチの encode 枠を確保する。
+        """
+        async with batch_slot("encode"):
+            queued_at = time.perf_counter()
+            async with self.process_budget.slot():
+                observe_stage("ffmpeg_wait", time.perf_counter() - queued_at)
+                with stage_timer(stage):
+                    return await self._run_command(cmd, self.ffmpeg_timeout)
+
+    async def _produce_asset(
+        self,
+        cache: DiskLRUCache,
+        key: str,
+        path: Path,
+        produce: Callable[[], Awaitable[Optional[bytes]]]
+    ) -> bool:
+        """キャッシュになかった素材を produce() で作成して path に保存し、キャッシュにも入れる（作成時間も記録）
+
+        同じ素材を作成中の他ジョブ（別ワーカーでのプレビュー中の先行生成を含む）があれば、
+        その完了を待ってキャッシュから取り出す。produce() が None を返したら False を返す。
+        """
+        if cache.enabled:
+            produced: List[bytes] = []
             
-            # メインコンテンツシーンの作成
-            for i, (scene, img_path, audio_path) in enumerate(zip(script["scenes"], image_paths, audio_paths)):
-                if not img_path or not audio_path:
-                    print(f"シーン{i+1}をスキップ: 素材が不完全")
-                    continue
-                    
-                temp_video = self.output_dir / f"temp_improved_{style_name}_scene_{i}.mp4"
-                temp_videos.append(temp_video)
-                
-                # 音声の長さを取得
-                try:
-                    duration_cmd = [
-                        "ffprobe", "-v", "quiet", "-show_entries", "format=duration",
-                        "-of", "csv=p=0", audio_path
-                    ]
-                    duration = float(subprocess.check_output(duration_cmd).decode().strip())
-                except:
-                    duration = 5
-                
-                # より高品質な動画作成設定
-                ffmpeg_cmd = [
-                    "ffmpeg", "-y",
-                    "-loop", "1", "-i", img_path,
-                    "-i", audio_path,
-                    "-c:v", "libx264", "-t", str(duration),
-                    "-pix_fmt", "yuv420p",
-                    "-vf", "scale=1080:1920:force_original_aspect_ratio=decrease,pad=1080:1920:(ow-iw)/2:(oh-ih)/2",
-                    "-c:a", "aac", "-b:a", "128k",
-                    "-preset", "medium",  # 品質重視
-                    str(temp_video)
-                ]
-                
-                try:
-                    subprocess.run(ffmpeg_cmd, check=True, capture_output=True)
-                    print(f"✅ シーン{i+1}動画作成完了（{style_name}スタイル）")
-                except subprocess.CalledProcessError as e:
-                    print(f"❌ シーン{i+1}動画作成失敗: {e}")
-                    temp_videos.remove(temp_video)
-                    continue
+            async def fill() -> bool:
+                started_at = time.monotonic()
+                data = await produce()
+                if data is None:
+                    return False
+                produced.append(data)
+                cache.put(key, data, cost_seconds=time.monotonic() - started_at)
+                return True
             
+            if await self.asset_flight.do(key, fill, should_cache=bool):
+                if produced:
+                    path.write_bytes(produced[0])
+                    return True
+                if cache.copy_to(key, path):
+                    return True
+            # 作成側が失敗した・キャッシュに入らなかった場合は自分で作る
+        
+        data = await produce()
+        if data is None:
+            return False
+        path.write_bytes(data)
+        return True
+
+    @staticmethod
+    def _copy_from_cache(cache: DiskLRUCache, name: str, key: str, path: Path) -> bool:
+        """キャッシュにあれば path へコピー（参照結果をメトリクスに記録）"""
+        hit = cache.copy_to(key, path)
+        if cache.enabled:
+            record_cache_lookup(name, hit)
+        return hit
+
+    @staticmethod
+    async def _tracked(stage: str, scene: Optional[int], coro):
+        """coro の完了（成功・フォールバックとも）を進捗として通知"""
+        result = await coro
+        await report_progress(stage, scene)
+        return result
+
+    @staticmethod
+    def _safe_filename(text: str) -> str:
+        """ファイル名に使えない文字を置き換える"""
+        return re.sub(r'[\\/:*?"<>|\s]+', "_", text).strip("_") or "video"
+
+    def _video_output_path(self, script: Dict, work_dir: Path, profile: EncodingProfile) -> Path:
+        """最終動画の出力パス"""
+        style_name = script.get('style', 'default')
+        return work_dir / f"{self._safe_filename(script['title'])}_{style_name}_with_title{profile.filename_suffix}.mp4"
+
+    def _encoding_profile(self, render_profile: str) -> EncodingProfile:
+        if render_profile not in self.ENCODING_PROFILES:
+            raise ValueError(f"render_profile '{render_profile}' は無効です。利用可能: {list(self.ENCODING_PROFILES)}")
+        return self.ENCODING_PROFILES[render_profile]
+
+    async def create_video(self, script: Dict, image_paths: List[str], audio_paths: List[str], title_image_path: str = "", title_audio_path: str = "", workspace: Optional[Path] = None, render_profile: str = "final") -> str:
+        """タイトル付きFFmpeg動画生成（各シーンを並列エンコードしてから結合）
+
+        render_profile で画質を選ぶ（final: 公開用 / draft: 確認用の高速エンコード）。
+        """
+        style_name = script.get('style', 'default')
+        work_dir = workspace or self.output_dir
+        profile = self._encoding_profile(render_profile)
+        output_path = self._video_output_path(script, work_dir, profile)
+        
+        if self.render_mode == "single_pass":
+            return await self._create_video_single_pass(
+                script, image_paths, audio_paths, title_image_path, title_audio_path, output_path, profile
+            )
+        
+        # タイトルシーンとメインコンテンツシーンを並列に作成（順序は維持）
+        clip_tasks = []
+        if title_image_path and title_audio_path:
+            clip_tasks.append(self._tracked("encode", None, self._encode_title_clip(title_image_path, title_audio_path, work_dir, style_name, profile)))
+        else:
+            await report_progress("encode")
+        
+        for i, (scene, img_path, audio_path) in enumerate(zip(script["scenes"], image_paths, audio_paths)):
+            if not img_path or not audio_path:
+                print(f"シーン{i+1}をスキップ: 素材が不完全")
+                await report_progress("encode", i)
+                continue
+            clip_tasks.append(self._tracked("encode", i, self._encode_scene_clip(i, img_path, audio_path, work_dir, style_name, profile)))
+        
+        clips = await asyncio.gather(*clip_tasks)
+        return await self._assemble_clips(clips, output_path, work_dir, style_name)
+
+    async def _encode_title_clip(self, title_image_path: str, title_audio_path: str, work_dir: Path, style_name: str, profile: EncodingProfile) -> Optional[Path]:
+        """タイトルシーンのクリップを作成（失敗時は None）"""
+        title_temp_video = work_dir / f"temp_title_{style_name}.mp4"
+        
+        # タイトル音声の長さを取得
+        try:
+            title_duration = await self._probe_duration(title_audio_path)
+            # タイトル表示時間を少し長めに（音声＋0.5秒）
+            title_duration += 0.5
+        except (subprocess.SubprocessError, ValueError, OSError) as e:
+            print(f"⚠️ タイトル音声の長さを取得できません（3秒で作成）: {e}")
+            record_fallback("default_duration")
+            title_duration = 3  # デフォルト3秒
+        
+        # タイトル動画作成
+        title_ffmpeg_cmd = [
+            "ffmpeg", "-y",
+            "-loop", "1", "-framerate", str(profile.fps), "-i", title_image_path,
+            "-i", title_audio_path,
+            *profile.video_args(), "-t", str(title_duration),
+            "-vf", profile.scale_filter,
+            *profile.audio_args(),
+            str(title_temp_video)
+        ]
+        
+        try:
+            await self._run_ffmpeg(title_ffmpeg_cmd)
+            print(f"📺 タイトルシーン動画作成完了")
+            return title_temp_video
+        except subprocess.SubprocessError as e:
+            print(f"❌ タイトルシーン動画作成失敗: {e}")
+            title_temp_video.unlink(missing_ok=True)
+            return None
+
+    async def _encode_scene_clip(self, i: int, img_path: str, audio_path: str, work_dir: Path, style_name: str, profile: EncodingProfile) -> Optional[Path]:
+        """コンテンツシーンのクリップを作成（失敗時は None）"""
+        temp_video = work_dir / f"temp_improved_{style_name}_scene_{i}.mp4"
+        
+        # 音声の長さを取得
+        try:
+            duration = await self._probe_duration(audio_path)
+        except (subprocess.SubprocessError, ValueError, OSError) as e:
+            print(f"⚠️ シーン{i+1}音声の長さを取得できません（5秒で作成）: {e}")
+            record_fallback("default_duration")
+            duration = 5
+        
+        # 画質・速度はエンコード設定に従う
+        ffmpeg_cmd = [
+            "ffmpeg", "-y",
+            "-loop", "1", "-framerate", str(profile.fps), "-i", img_path,
+            "-i", audio_path,
+            *profile.video_args(), "-t", str(duration),
+            "-vf", profile.scale_filter,
+            *profile.audio_args(),
+            str(temp_video)
+        ]
+        
+        try:
+            await self._run_ffmpeg(ffmpeg_cmd)
+            print(f"✅ シーン{i+1}動画作成完了（{style_name}スタイル）")
+            return temp_video
+        except subprocess.SubprocessError as e:
+            print(f"❌ シーン{i+1}動画作成失敗: {e}")
+            temp_video.unlink(missing_ok=True)
+            return None
+
+    async def _assemble_clips(self, clips: List[Optional[Path]], output_path: Path, work_dir: Path, style_name: str) -> str:
+        """作成済みクリップを順番に結合（失敗したクリップは除外）し、クリップを削除"""
+        temp_videos = [clip for clip in clips if clip is not None]
+        
+        try:
             if not temp_videos:
                 return ""
+            await report_progress("concat", started=True)
             
             # 全動画結合（タイトル→コンテンツの順）
             if len(temp_videos) > 1:
-                concat_file = self.output_dir / f"concat_with_title_{style_name}.txt"
+                concat_file = work_dir / f"concat_with_title_{style_name}.txt"
                 with open(concat_file, "w", encoding='utf-8') as f:
                     for video in temp_videos:
                         video_path = str(video.absolute()).replace('\\', '/')
@@ -768,23 +986,35 @@ class ImprovedStyledVideoGenerator:
                     "ffmpeg", "-y", "-f", "concat", "-safe", "0",
                     "-i", str(concat_file),
                     "-c", "copy",
+                    # moovアトムを先頭に置き、ダウンロード完了前に再生を始められるようにする
+                    "-movflags", "+faststart",
                     str(output_path)
                 ]
                 
                 try:
-                    subprocess.run(concat_cmd, check=True, capture_output=True, text=False)
+                    await self._run_ffmpeg(concat_cmd, "concat")
                     print(f"🎬 タイトル付き動画結合成功（{style_name}スタイル）")
-                except subprocess.CalledProcessError:
+                except subprocess.SubprocessError:
                     print("代替方法で動画結合中...")
+                    record_fallback("concat_first_clip")
                     # 最初の動画のみ使用
                     temp_videos[0].rename(output_path)
                 
                 if concat_file.exists():
                     concat_file.unlink()
             else:
-                # 1つの動画のみの場合
-                temp_videos[0].rename(output_path)
+                # 1つの動画のみの場合（再エンコードせずに faststart 形式へ書き換え）
+                remux_cmd = [
+                    "ffmpeg", "-y", "-i", str(temp_videos[0]),
+                    "-c", "copy", "-movflags", "+faststart",
+                    str(output_path)
+                ]
+                try:
+                    await self._run_ffmpeg(remux_cmd, "concat")
+                except subprocess.SubprocessError:
+                    temp_videos[0].rename(output_path)
             
+            await report_progress("concat")
             return str(output_path)
             
         finally:
@@ -792,18 +1022,195 @@ class ImprovedStyledVideoGenerator:
                 if temp_video.exists():
                     temp_video.unlink()
 
-    async def generate_improved_video(self, topic: str, style_name: str, speaker_id: int = 1, enable_preview: bool = False) -> str:
-        """改良版メイン処理：タイトル画面付きスタイル統一動画"""
+    async def _create_video_single_pass(self, script: Dict, image_paths: List[str], audio_paths: List[str], title_image_path: str, title_audio_path: str, output_path: Path, profile: EncodingProfile) -> str:
+        """concatフィルタグラフで全シーンを1回のffmpeg実行でエンコード（一時クリップなし）"""
+        style_name = script.get('style', 'default')
+        
+        # (画像, 音声, 表示秒数) の並び（タイトル→コンテンツの順）
+        segments = []
+        if title_image_path and title_audio_path:
+            try:
+                # タイトル表示時間を少し長めに（音声＋0.5秒）
+                title_duration = await self._probe_duration(title_audio_path) + 0.5
+            except (subprocess.SubprocessError, ValueError, OSError) as e:
+                print(f"⚠️ タイトル音声の長さを取得できません（3秒で作成）: {e}")
+                record_fallback("default_duration")
+                title_duration = 3  # デフォルト3秒
+            segments.append((title_image_path, title_audio_path, title_duration))
+        
+        for i, (scene, img_path, audio_path) in enumerate(zip(script["scenes"], image_paths, audio_paths)):
+            if not img_path or not audio_path:
+                print(f"シーン{i+1}をスキップ: 素材が不完全")
+                continue
+            try:
+                duration = await self._probe_duration(audio_path)
+            except (subprocess.SubprocessError, ValueError, OSError) as e:
+                print(f"⚠️ シーン{i+1}音声の長さを取得できません（5秒で作成）: {e}")
+                record_fallback("default_duration")
+                duration = 5
+            segments.append((img_path, audio_path, duration))
+        
+        if not segments:
+            return ""
+        
+        inputs = []
+        filters = []
+        concat_inputs = ""
+        for n, (img_path, audio_path, duration) in enumerate(segments):
+            inputs += ["-loop", "1", "-framerate", str(profile.fps), "-t", str(duration), "-i", img_path, "-i", audio_path]
+            video_in, audio_in = 2 * n, 2 * n + 1
+            # 静止画は縦型にスケール＆パディングし、フレームレート・画素形式を揃える
+            filters.append(
+                f"[{video_in}:v]{profile.scale_filter},setsar=1,fps={profile.fps},format=yuv420p,"
+                f"trim=duration={duration},setpts=PTS-STARTPTS[v{n}]"
+            )
+            # 音声は形式を揃え、表示秒数に合わせて無音で延長/切り詰め
+            filters.append(
+                f"[{audio_in}:a]aformat=sample_rates=44100:channel_layouts=stereo,"
+                f"apad,atrim=duration={duration},asetpts=PTS-STARTPTS[a{n}]"
+            )
+            concat_inputs += f"[v{n}][a{n}]"
+        filters.append(f"{concat_inputs}concat=n={len(segments)}:v=1:a=1[v][a]")
+        
+        ffmpeg_cmd = [
+            "ffmpeg", "-y",
+            *inputs,
+            "-filter_complex", ";".join(filters),
+            "-map", "[v]", "-map", "[a]",
+            *profile.video_args(),
+            *profile.audio_args(),
+            "-movflags", "+faststart",
+            str(output_path)
+        ]
+        
+        try:
+            await report_progress("encode", started=True)
+            await self._run_ffmpeg(ffmpeg_cmd)
+            await report_progress("encode")
+            print(f"🎬 タイトル付き動画をシングルパスで作成完了（{style_name}スタイル, {len(segments)}シーン）")
+            return str(output_path)
+        except subprocess.SubprocessError as e:
+            print(f"❌ シングルパス動画作成失敗: {e}")
+            if output_path.exists():
+                output_path.unlink()
+            return ""
+
+    async def _render_streaming(self, script: Dict, style_name: str, speaker_id: int, character_ref: str, workspace: Path, profile: EncodingProfile) -> str:
+        """ストリーミング方式：各シーンの画像と音声が揃った時点でそのシーンのエンコードを開始
+
+        最も遅い画像生成を待たずにエンコードを始められるため、ネットワーク待ちとエンコードが重なる。
+        最終的な結合だけが全クリップの完成を待つ。
+        """
+        style = self.image_styles[style_name]
+        print(f"🎨 {style.name}スタイルの素材生成とエンコードを並行実行中...")
+        
+        async def title_clip() -> Optional[Path]:
+            title_image_path = await self._tracked("title_image", None, self.create_title_image_async(script['title'], style_name, workspace))
+            title_audio_path = await self._tracked("title_audio", None, self.generate_title_audio(script['title'], speaker_id, workspace))
+            if not title_image_path or not title_audio_path:
+                await report_progress("encode")
+                return None
+            return await self._tracked("encode", None, self._encode_title_clip(title_image_path, title_audio_path, workspace, style_name, profile))
+        
+        async def scene_clip(i: int, scene: Dict) -> Optional[Path]:
+            img_path, audio_path = await asyncio.gather(
+                self._tracked("image", i, self.generate_consistent_image(scene["visual_concept"], style_name, i, character_ref, workspace)),
+                self._tracked("audio", i, self.generate_audio(scene["text"], i, speaker_id, workspace))
+            )
+            if not img_path or not audio_path:
+                print(f"シーン{i+1}をスキップ: 素材が不完全")
+                await report_progress("encode", i)
+                return None
+            return await self._tracked("encode", i, self._encode_scene_clip(i, img_path, audio_path, workspace, style_name, profile))
+        
+        clips = await asyncio.gather(
+            title_clip(),
+            *(scene_clip(i, scene) for i, scene in enumerate(script["scenes"]))
+        )
+        
+        print("🎬 タイトル付き最終動画作成中...")
+        output_path = self._video_output_path(script, workspace, profile)
+        return await self._assemble_clips(clips, output_path, workspace, style_name)
+
+    async def generate_improved_video(self, topic: str, style_name: str, speaker_id: int = 1, enable_preview: bool = False, generation_id: Optional[str] = None, progress_callback: Optional[ProgressCallback] = None, render_profile: str = "final", script: Optional[Dict] = None) -> str:
+        """改良版メイン処理：タイトル画面付きスタイル統一動画
+
+        中間ファイルはジョブ専用の作業ディレクトリ（generation_id ごと）に作成し、
+        完成した動画だけを output_dir へ原子的に移動する。作業ディレクトリは成功・失敗に関わらず削除する。
+        progress_callback を渡すと、ステージ・シーンごとの進捗イベントを受け取れる。
+        render_profile="draft" なら確認用の低解像度・高速エンコードで作成する。
+        script（プレビューで確認済みの台本）を渡すと台本生成を省略する。
+        """
         if style_name not in self.image_styles:
             raise ValueError(f"スタイル '{style_name}' が見つかりません。利用可能: {list(self.image_styles.keys())}")
+        self._encoding_profile(render_profile)
         
+        generation_id = generation_id or uuid.uuid4().hex
+        workspace = self.output_dir / "jobs" / generation_id
+        workspace.mkdir(parents=True, exist_ok=True)
+        progress = JobProgress(progress_callback).activate() if progress_callback else nullcontext()
+        try:
+            with progress:
+                work_video_path = await self._generate_improved_video(
+                    topic, style_name, speaker_id, enable_preview, workspace, render_profile, script
+                )
+            if not work_video_path:
+                return ""
+            video_path = self._promote_output(Path(work_video_path), generation_id)
+            print(f"📁 ファイル: {video_path}")
+            return video_path
+        finally:
+            shutil.rmtree(workspace, ignore_errors=True)
+
+    async def prefetch_assets(self, script: Dict, style_name: str, speaker_id: int = 1) -> int:
+        """台本の確認中に、ナレーション音声とタイトル画面を先に作ってキャッシュに入れる
+
+        動画生成を始めるとキャッシュから取り出すだけになる。画像は費用がかかるため先行生成しない。
+        キャッシュが無効な素材は作っても再利用できないので作らない。作成できた素材の数を返す。
+        """
+        tasks = []
+        workspace = self.output_dir / "jobs" / f"prefetch-{uuid.uuid4().hex}"
+        if self.title_cache.enabled:
+            tasks.append(self.create_title_image_async(script["title"], style_name, workspace))
+        if self.audio_cache.enabled:
+            tasks.append(self.generate_title_audio(script["title"], speaker_id, workspace))
+            tasks.extend(
+                self.generate_audio(scene["text"], i, speaker_id, workspace)
+                for i, scene in enumerate(script["scenes"])
+            )
+        if not tasks:
+            return 0
+        workspace.mkdir(parents=True, exist_ok=True)
+        try:
+            results = await asyncio.gather(*tasks)
+            return sum(1 for result in results if result.endswith((".png", ".wav")))
+        finally:
+            shutil.rmtree(workspace, ignore_errors=True)
+
+    def _promote_output(self, work_video_path: Path, generation_id: str) -> str:
+        """作業ディレクトリの完成動画を output_dir へ原子的に移動"""
+        final_path = self.output_dir / f"{work_video_path.stem}_{generation_id}{work_video_path.suffix}"
+        os.replace(work_video_path, final_path)
+        return str(final_path)
+
+    async def _generate_improved_video(self, topic: str, style_name: str, speaker_id: int, enable_preview: bool, workspace: Path, render_profile: str = "final", script: Optional[Dict] = None) -> str:
+        """台本生成から動画作成まで（成果物はすべて workspace 内に作成）"""
         style = self.image_styles[style_name]
         print(f"🎬 お題「{topic}」を{style.name}スタイルで動画生成を開始...")
         
-        # 1. 台本生成
-        print(f"📝 改良版台本生成中（絵の説明なし）...")
-        script = await self.generate_script(topic, style_name)
-        print(f"✅ 台本生成完了: {script['title']}")
+        # 1. 台本生成（確認済みの台本があればそれを使う）
+        if script is None:
+            print(f"📝 改良版台本生成中（絵の説明なし）...")
+            await report_progress("script", started=True)
+            script = await self.generate_script(topic, style_name)
+            print(f"✅ 台本生成完了: {script['title']}")
+        else:
+            script = {**script, "style": style_name}
+            print(f"📝 確認済みの台本を使用: {script['title']}")
+        progress = current_progress()
+        if progress is not None:
+            progress.plan(len(script["scenes"]), self.render_mode)
+        await report_progress("script")
         
         # プレビュー機能（将来のWeb版用）
         if enable_preview:
@@ -821,36 +1228,41 @@ class ImprovedStyledVideoGenerator:
                 print("動画生成をキャンセルしました。")
                 return ""
         
-        # 2. タイトル画面とタイトル音声を生成
-        print(f"📺 {style.name}スタイルのタイトル画面を作成中...")
-        title_image_path = self.create_title_image(script['title'], style_name)
-        
-        print(f"🎵 タイトル音声を生成中...")
-        title_audio_path = await self.generate_title_audio(script['title'], speaker_id)
-        
-        # 3. スタイル統一画像生成
-        print(f"🎨 {style.name}スタイル統一画像生成中...")
-        
         # キャラクター一貫性のための参照情報
         character_ref = "same consistent character design throughout all scenes" if "人" in topic else ""
         
-        tasks = []
-        for i, scene in enumerate(script["scenes"]):
-            tasks.append(self.generate_consistent_image(scene["visual_concept"], style_name, i, character_ref))
-            tasks.append(self.generate_audio(scene["text"], i, speaker_id))
-        
-        results = await asyncio.gather(*tasks)
-        
-        # 結果を分離
-        image_paths = results[::2]  # 偶数インデックス（画像）
-        audio_paths = results[1::2]  # 奇数インデックス（音声）
-        
-        print("🎬 タイトル付き最終動画作成中...")
-        video_path = self.create_video(script, image_paths, audio_paths, title_image_path, title_audio_path)
+        if self.streaming_pipeline and self.render_mode == "clips":
+            # 素材が揃ったシーンから順次エンコード
+            video_path = await self._render_streaming(
+                script, style_name, speaker_id, character_ref, workspace, self._encoding_profile(render_profile)
+            )
+        else:
+            # 2. タイトル画面とタイトル音声を生成
+            print(f"📺 {style.name}スタイルのタイトル画面を作成中...")
+            title_image_path = await self._tracked("title_image", None, self.create_title_image_async(script['title'], style_name, workspace))
+            
+            print(f"🎵 タイトル音声を生成中...")
+            title_audio_path = await self._tracked("title_audio", None, self.generate_title_audio(script['title'], speaker_id, workspace))
+            
+            # 3. スタイル統一画像生成
+            print(f"🎨 {style.name}スタイル統一画像生成中...")
+            
+            tasks = []
+            for i, scene in enumerate(script["scenes"]):
+                tasks.append(self._tracked("image", i, self.generate_consistent_image(scene["visual_concept"], style_name, i, character_ref, workspace)))
+                tasks.append(self._tracked("audio", i, self.generate_audio(scene["text"], i, speaker_id, workspace)))
+            
+            results = await asyncio.gather(*tasks)
+            
+            # 結果を分離
+            image_paths = results[::2]  # 偶数インデックス（画像）
+            audio_paths = results[1::2]  # 奇数インデックス（音声）
+            
+            print("🎬 タイトル付き最終動画作成中...")
+            video_path = await self.create_video(script, image_paths, audio_paths, title_image_path, title_audio_path, workspace, render_profile)
         
         if video_path:
             print(f"🎉 {style.name}スタイル統一動画生成完了!")
-            print(f"📁 ファイル: {video_path}")
             print("✨ 追加された要素:")
             print(f"  📺 タイトル画面: {script['title']}")
             print(f"  🎵 タイトル音声読み上げ")
@@ -860,6 +1272,92 @@ class ImprovedStyledVideoGenerator:
         
         return video_path
 
+    async def generate_multi_style_videos(self, topic: str, style_names: List[str], speaker_id: int = 1, generation_id: Optional[str] = None, progress_callback: Optional[ProgressCallback] = None, render_profile: str = "final") -> Dict[str, str]:
+        """1つの台本から複数スタイルの動画を作成（スタイル名 → 動画パス。失敗したスタイルは空文字）
+
+        台本とナレーション音声（タイトル・各シーン）は1回だけ生成して全スタイルで共有し、
+        タイトル画面・画像の生成とエンコードだけをスタイルごとに並列で行う。
+        作業ディレクトリ・進捗の扱いは generate_improved_video と同じ。
+        """
+        if not style_names or len(set(style_names)) != len(style_names):
+            raise ValueError("スタイルを重複なく1つ以上指定してください")
+        unknown = [name for name in style_names if name not in self.image_styles]
+        if unknown:
+            raise ValueError(f"スタイル {unknown} が見つかりません。利用可能: {list(self.image_styles.keys())}")
+        self._encoding_profile(render_profile)
+        
+        generation_id = generation_id or uuid.uuid4().hex
+        workspace = self.output_dir / "jobs" / generation_id
+        workspace.mkdir(parents=True, exist_ok=True)
+        progress = JobProgress(progress_callback).activate() if progress_callback else nullcontext()
+        try:
+            with progress:
+                work_video_paths = await self._generate_multi_style_videos(
+                    topic, style_names, speaker_id, workspace, render_profile
+                )
+            return {
+                style_name: self._promote_output(Path(path), generation_id) if path else ""
+                for style_name, path in work_video_paths.items()
+            }
+        finally:
+            shutil.rmtree(workspace, ignore_errors=True)
+
+    async def _generate_multi_style_videos(self, topic: str, style_names: List[str], speaker_id: int, workspace: Path, render_profile: str) -> Dict[str, str]:
+        """共通の台本・音声を作り、スタイルごとの画像生成とエンコードを並列に実行"""
+        print(f"🎬 お題「{topic}」を{len(style_names)}スタイル（{', '.join(style_names)}）で動画生成を開始...")
+        
+        # 1. 台本生成（全スタイル共通。スタイル名は最初のものでプロンプトを作る）
+        await report_progress("script", started=True)
+        script = await self.generate_script(topic, style_names[0])
+        print(f"✅ 台本生成完了: {script['title']}")
+        progress = current_progress()
+        if progress is not None:
+            progress.plan(len(script["scenes"]), self.render_mode, styles=len(style_names))
+        await report_progress("script")
+        
+        character_ref = "same consistent character design throughout all scenes" if "人" in topic else ""
+        
+        # 2. ナレーション音声（全スタイル共通）は画像生成と並行して1回だけ作成
+        print(f"🎵 ナレーション音声を生成中（全スタイル共通）...")
+        narration = asyncio.ensure_future(asyncio.gather(
+            self._tracked("title_audio", None, self.generate_title_audio(script['title'], speaker_id, workspace)),
+            *(
+                self._tracked("audio", i, self.generate_audio(scene["text"], i, speaker_id, workspace))
+                for i, scene in enumerate(script["scenes"])
+            )
+        ))
+        
+        async def render_style(style_name: str) -> str:
+            style_script = {**script, "style": style_name}
+            print(f"🎨 {self.image_styles[style_name].name}スタイルの画像を生成中...")
+            title_image_path, *image_paths = await asyncio.gather(
+                self._tracked("title_image", None, self.create_title_image_async(script['title'], style_name, workspace)),
+                *(
+                    self._tracked("image", i, self.generate_consistent_image(scene["visual_concept"], style_name, i, character_ref, workspace))
+                    for i, scene in enumerate(script["scenes"])
+                )
+            )
+            title_audio_path, *audio_paths = await asyncio.shield(narration)
+            return await self.create_video(
+                style_script, image_paths, audio_paths, title_image_path, title_audio_path, workspace, render_profile
+            )
+        
+        try:
+            results = await asyncio.gather(*(render_style(name) for name in style_names), return_exceptions=True)
+        finally:
+            if not narration.done():
+                narration.cancel()
+        
+        video_paths = {}
+        for style_name, result in zip(style_names, results):
+            if isinstance(result, BaseException):
+                print(f"❌ {style_name}スタイルの動画作成中にエラー: {result}")
+                result = ""
+            video_paths[style_name] = result
+        succeeded = [name for name, path in video_paths.items() if path]
+        print(f"🎉 {len(succeeded)}/{len(style_names)}スタイルの動画生成完了: {', '.join(succeeded) or 'なし'}")
+        return video_paths
+
 # 使用例（お題選択システム統合版）
 async def main():
     OPENAI_API_KEY = "your-openai-api-key-here"  # プレースホルダーに戻す
@@ -908,6 +1406,8 @@ async def main():
     except ValueError as e:
         print(f"\n❌ エラー: {e}")
         generator.list_available_styles()
+    finally:
+        await generator.close()
 
 # 個別テスト用：お題提案機能のみテスト
 async def test_topic_suggestion():
@@ -920,7 +1420,8 @@ async def test_topic_suggestion():
     print("💡 お題提案機能テスト")
     theme = input("テーマを入力してください: ")
     
-    suggestions = await generator.suggest_topics_from_theme(theme)
+    async with generator:
+        suggestions = await generator.suggest_topics_from_theme(theme)
     generator.display_topic_suggestions(suggestions, theme)
 
 if __name__ == "__main__":
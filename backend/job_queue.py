@@ -0,0 +1,233 @@
+import json
+import random
+import time
+import uuid
+from dataclasses import dataclass, field
+from typing import Dict, List, Optional, Tuple
+
+import redis.asyncio as aioredis
+
+
+# 待機時間を過ぎた遅延ジョブをストリームに戻す（取り出しと追加を1回の操作で行い、ジョブを失わない）
+_PROMOTE_SCRIPT = """
+local due = redis.call("zrangebyscore", KEYS[1], "-inf", ARGV[1], "LIMIT", 0, tonumber(ARGV[2]))
+for _, member in ipairs(due) do
+    redis.call("zrem", KEYS[1], member)
+    local fields = cjson.decode(member)
+    local args = {}
+    for key, value in pairs(fields) do
+        table.insert(args, key)
+        table.insert(args, value)
+    end
+    redis.call("xadd", KEYS[2], "*", unpack(args))
+end
+return #due
+"""
+
+
+@dataclass
+class Job:
+    """キューから取り出したジョブ"""
+    job_id: str
+    message_id: str
+    kind: str
+    payload: dict
+    attempts: int = 1
+    enqueued_at: float = field(default_factory=time.time)
+    gave_up: Optional[str] = None  # 再試行上限のため処理せず諦める理由（呼び出し側で後始末してからデッドレターへ）
+
+
+class RedisJobQueue:
+    """Redis Streams（コンシューマーグループ）を使った永続ジョブキュー
+
+    - enqueue: ストリームにジョブを追加（Redisの永続化でAPI再起動後も残る）
+    - reserve: コンシューマーグループ経由で取り出し、ACKされるまでペンディングに残る
+    - heartbeat: 長時間ジョブのアイドル時間をリセットし、他ワーカーに奪われないようにする
+    - reclaim: visibility_timeout を超えて放置されたジョブ（ワーカー停止など）を再取得
+    - retry / dead letter: 失敗時は max_attempts まで再投入し、超えたらデッドレターへ
+    - 再投入したジョブは遅延キュー（ソート済みセット）で指数バックオフの間待ってからストリームに戻る
+    """
+
+    def __init__(
+        self,
+        redis_client: aioredis.Redis,
+        name: str = "video_jobs",
+        group: str = "video_workers",
+        visibility_timeout: int = 300,
+        max_attempts: int = 3,
+        retry_base_delay: float = 10,
+        retry_max_delay: float = 300,
+    ):
+        self.redis = redis_client
+        self.stream = f"queue:{name}"
+        self.dead_letter_stream = f"queue:{name}:dead"
+        self.delayed = f"queue:{name}:delayed"
+        self.group = group
+        self.visibility_timeout = visibility_timeout
+        self.max_attempts = max_attempts
+        self.retry_base_delay = retry_base_delay
+        self.retry_max_delay = retry_max_delay
+        self._promote = redis_client.register_script(_PROMOTE_SCRIPT)
+        self._group_ready = False
+
+    async def ensure_group(self) -> None:
+        """コンシューマーグループを作成（既に存在する場合は何もしない）"""
+        if self._group_ready:
+            return
+        try:
+            await self.redis.xgroup_create(self.stream, self.group, id="0", mkstream=True)
+        except aioredis.ResponseError as e:
+            if "BUSYGROUP" not in str(e):
+                raise
+        self._group_ready = True
+
+    @staticmethod
+    def _encode(job_id: str, kind: str, payload: dict, attempts: int) -> Dict[str, str]:
+        return {
+            "job_id": job_id,
+            "kind": kind,
+            "payload": json.dumps(payload, ensure_ascii=False),
+            "attempts": str(attempts),
+            "enqueued_at": str(time.time()),
+        }
+
+    @staticmethod
+    def _decode(message_id, fields: dict) -> Job:
+        def _s(value):
+            return value.decode() if isinstance(value, bytes) else value
+
+        data = {_s(k): _s(v) for k, v in fields.items()}
+        return Job(
+            job_id=data["job_id"],
+            message_id=_s(message_id),
+            kind=data.get("kind", "video"),
+            payload=json.loads(data["payload"]),
+            attempts=int(data.get("attempts", 1)),
+            enqueued_at=float(data.get("enqueued_at", time.time())),
+        )
+
+    async def enqueue(self, payload: dict, kind: str = "video", job_id: Optional[str] = None) -> str:
+        """ジョブを追加してジョブIDを返す"""
+        await self.ensure_group()
+        job_id = job_id or str(uuid.uuid4())
+        await self.redis.xadd(self.stream, self._encode(job_id, kind, payload, 1))
+        return job_id
+
+    async def enqueue_many(self, jobs: List[Tuple[str, dict]], kind: str = "video") -> List[str]:
+        """(ジョブID, payload) の並びを1往復のパイプラインでまとめて追加"""
+        await self.ensure_group()
+        pipe = self.redis.pipeline(transaction=False)
+        for job_id, payload in jobs:
+            pipe.xadd(self.stream, self._encode(job_id, kind, payload, 1))
+        await pipe.execute()
+        return [job_id for job_id, _ in jobs]
+
+    async def reserve(self, consumer: str, block_ms: Optional[int] = 5000) -> Optional[Job]:
+        """ジョブを1件取り出す（放置ジョブの再取得を優先）。block_ms=None なら待たない"""
+        await self.ensure_group()
+        await self._promote(keys=[self.delayed, self.stream], args=[time.time(), 100])
+
+        job = await self._reclaim_one(consumer)
+        if job:
+            return job
+
+        response = await self.redis.xreadgroup(
+            self.group, consumer, {self.stream: ">"}, count=1, block=block_ms
+        )
+        if not response:
+            return None
+        _, messages = response[0]
+        if not messages:
+            return None
+        message_id, fields = messages[0]
+        return self._decode(message_id, fields)
+
+    async def _reclaim_one(self, consumer: str) -> Optional[Job]:
+        """visibility_timeout を超えたペンディングジョブを引き取る
+
+        最終試行中にワーカーが停止したジョブは gave_up を設定して返す。処理はせず、
+        呼び出し側が後始末（動画生成を failed にする等）をしてから dead_letter() する。
+        """
+        result = await self.redis.xautoclaim(
+            self.stream, self.group, consumer,
+            min_idle_time=self.visibility_timeout * 1000,
+            start_id="0-0", count=1,
+        )
+        claimed = result[1] if len(result) > 1 else []
+        for message_id, fields in claimed:
+            if not fields:
+                # ストリームから削除済みのエントリ
+                await self.redis.xack(self.stream, self.group, message_id)
+                continue
+            job = self._decode(message_id, fields)
+            # このエントリの再配送回数を試行回数に加える（ワーカー停止によるクラッシュループ対策）。
+            # 再投入したジョブは新しいエントリになり配送回数が1から数え直されるため、記録済みの試行回数に足す
+            pending = await self.redis.xpending_range(
+                self.stream, self.group, min=message_id, max=message_id, count=1
+            )
+            if pending:
+                job.attempts += int(pending[0]["times_delivered"]) - 1
+            if job.attempts > self.max_attempts:
+                job.gave_up = "visibility timeout exceeded"
+                return job
+            print(f"♻️ 放置ジョブを再取得: {job.job_id} (試行{job.attempts}回目)")
+            return job
+        return None
+
+    async def heartbeat(self, job: Job, consumer: str) -> None:
+        """処理中ジョブのアイドル時間をリセット"""
+        await self.redis.xclaim(
+            self.stream, self.group, consumer,
+            min_idle_time=0, message_ids=[job.message_id], justid=True,
+        )
+
+    async def ack(self, job: Job) -> None:
+        """処理完了したジョブを確定"""
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.xack(self.stream, self.group, job.message_id)
+            pipe.xdel(self.stream, job.message_id)
+            await pipe.execute()
+
+    def retry_delay(self, attempts: int) -> float:
+        """attempts 回目の失敗後の待機秒数（指数バックオフ、同時に失敗したジョブが揃って戻らないようジッター付き）"""
+        delay = min(self.retry_max_delay, self.retry_base_delay * 2 ** (attempts - 1))
+        return delay * random.uniform(0.5, 1.0)
+
+    async def retry(self, job: Job, error: str) -> bool:
+        """失敗したジョブを待機後に再投入する。上限を超えた場合はデッドレターへ送り False を返す"""
+        if job.attempts >= self.max_attempts:
+            await self.dead_letter(job, error)
+            return False
+        fields = self._encode(job.job_id, job.kind, job.payload, job.attempts + 1)
+        available_at = time.time() + self.retry_delay(job.attempts)
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.zadd(self.delayed, {json.dumps(fields, ensure_ascii=False): available_at})
+            pipe.xack(self.stream, self.group, job.message_id)
+            pipe.xdel(self.stream, job.message_id)
+            await pipe.execute()
+        return True
+
+    async def dead_letter(self, job: Job, error: str) -> None:
+        fields = self._encode(job.job_id, job.kind, job.payload, job.attempts)
+        fields["error"] = error
+        async with self.redis.pipeline(transaction=True) as pipe:
+            pipe.xadd(self.dead_letter_stream, fields)
+            pipe.xack(self.stream, self.group, job.message_id)
+            pipe.xdel(self.stream, job.message_id)
+            await pipe.execute()
+        print(f"☠️ ジョブをデッドレターに移動: {job.job_id} ({error})")
+
+    async def stats(self) -> Dict[str, int]:
+        """キューの状況（待機中・処理中・再試行待ち・デッドレター件数）"""
+        await self.ensure_group()
+        summary = await self.redis.xpending(self.stream, self.group)
+        in_flight = summary["pending"] if summary else 0
+        total = await self.redis.xlen(self.stream)
+        dead = await self.redis.xlen(self.dead_letter_stream)
+        delayed = await self.redis.zcard(self.delayed)
+        return {
+            "queued": max(0, total - in_flight),
+            "in_flight": in_flight,
+            "delayed": delayed,
+            "dead_letter": dead,
+        }
@@ -1,22 +1,39 @@
-from fastapi import FastAPI, HTTPException, BackgroundTasks, Depends, File, UploadFile
+from fastapi import FastAPI, HTTPException, Depends, File, UploadFile, Request, Header
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import FileResponse
+from fastapi.responses import Response, StreamingResponse
 from pydantic import BaseModel
-from typing import List, Optional, Dict
+from typing import Any, List, Optional, Dict, Tuple
 import asyncio
 import uuid
 import os
+import random
+import secrets
 from pathlib import Path
 import json
+from contextlib import nullcontext
 from datetime import datetime
-import redis
-from sqlalchemy import create_engine, Column, String, DateTime, Integer, Text, Boolean
+import redis.asyncio as aioredis
+from redis.asyncio.client import PubSub
+from sqlalchemy import Column, String, DateTime, Integer, Float, Text, Boolean, LargeBinary, ForeignKey, insert, select, update
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncSession, async_sessionmaker, create_async_engine
 from sqlalchemy.ext.declarative import declarative_base
-from sqlalchemy.orm import sessionmaker, Session
 import aiofiles
 
 # 既存の動画生成システムをインポート
 from improved_styled_video_generator import ImprovedStyledVideoGenerator
+from job_queue import RedisJobQueue
+from process_stats import ProcessStatsPublisher, read_process_stats, sum_fields
+from media_response import RangeFileResponse
+from metrics import CONTENT_TYPE_LATEST, render_latest
+from process_budget import ProcessBudget
+from profiling import JobProfiler
+from asset_cache import DiskLRUCache
+from batch_budget import BatchBudget
+from single_flight import SingleFlight
+from progress import RedisProgressPublisher, progress_channel, progress_key, progress_timings_key
+from rate_limiter import AdaptiveRateLimiter
+from voicevox_pool import VoicevoxPool
 
 app = FastAPI(
     title="ショート動画生成API",
@@ -35,16 +52,133 @@ app.add_middleware(
 
 # 設定
 OPENAI_API_KEY = os.getenv("OPENAI_API_KEY")
+OPENAI_BASE_URL = os.getenv("OPENAI_BASE_URL", "https://api.openai.com/v1")
 VOICEVOX_URL = os.getenv("VOICEVOX_URL", "http://localhost:50021")
+# 複数エンジンに振り分ける場合はカンマ区切りで指定（未指定なら VOICEVOX_URL の1台）
+VOICEVOX_URLS = [url.strip() for url in os.getenv("VOICEVOX_URLS", VOICEVOX_URL).split(",") if url.strip()]
+VOICEVOX_HEALTH_CHECK_INTERVAL = float(os.getenv("VOICEVOX_HEALTH_CHECK_INTERVAL", "10"))  # 秒
+VOICEVOX_EJECT_SECONDS = float(os.getenv("VOICEVOX_EJECT_SECONDS", "30"))  # 連続失敗したエンジンを外す時間
 REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379")
+REDIS_MAX_CONNECTIONS = int(os.getenv("REDIS_MAX_CONNECTIONS", "100"))
+REDIS_PUBSUB_MAX_CONNECTIONS = int(os.getenv("REDIS_PUBSUB_MAX_CONNECTIONS", "1000"))  # SSEの同時購読数の上限
+REDIS_POOL_TIMEOUT = int(os.getenv("REDIS_POOL_TIMEOUT", "20"))  # 秒（接続の空き待ち）
 DATABASE_URL = os.getenv("DATABASE_URL", "sqlite:///./video_generator.db")
+DB_POOL_SIZE = int(os.getenv("DB_POOL_SIZE", "10"))
+DB_MAX_OVERFLOW = int(os.getenv("DB_MAX_OVERFLOW", "20"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "30"))  # 秒（接続の空き待ち）
+DB_POOL_RECYCLE = int(os.getenv("DB_POOL_RECYCLE", "1800"))  # 秒（接続の再作成間隔）
+JOB_QUEUE_NAME = os.getenv("JOB_QUEUE_NAME", "video_jobs")
+JOB_MAX_ATTEMPTS = int(os.getenv("JOB_MAX_ATTEMPTS", "3"))
+JOB_VISIBILITY_TIMEOUT = int(os.getenv("JOB_VISIBILITY_TIMEOUT", "300"))  # 秒
+JOB_RETRY_BASE_DELAY = float(os.getenv("JOB_RETRY_BASE_DELAY", "10"))  # 秒（失敗ごとに倍）
+JOB_RETRY_MAX_DELAY = float(os.getenv("JOB_RETRY_MAX_DELAY", "300"))  # 秒
+HTTP_TIMEOUT = float(os.getenv("HTTP_TIMEOUT", "120"))  # 秒（OpenAI/VOICEVOX呼び出し全体）
+HTTP_CONNECT_TIMEOUT = float(os.getenv("HTTP_CONNECT_TIMEOUT", "10"))  # 秒
+HTTP_POOL_SIZE = int(os.getenv("HTTP_POOL_SIZE", "100"))
+HTTP_POOL_SIZE_PER_HOST = int(os.getenv("HTTP_POOL_SIZE_PER_HOST", "20"))
+FFMPEG_TIMEOUT = float(os.getenv("FFMPEG_TIMEOUT", "600"))  # 秒
+FFPROBE_TIMEOUT = float(os.getenv("FFPROBE_TIMEOUT", "30"))  # 秒
+FFMPEG_MAX_PROCESSES = int(os.getenv("FFMPEG_MAX_PROCESSES", str(os.cpu_count() or 2)))
+FFMPEG_SLOT_DIR = os.getenv("FFMPEG_SLOT_DIR", "generated_videos/.ffmpeg_slots")  # 同一ノードの全ワーカーで共有
+RENDER_MODE = os.getenv("RENDER_MODE", "clips")  # clips / single_pass
+STREAMING_PIPELINE = os.getenv("STREAMING_PIPELINE", "false").lower() == "true"  # clipsモードのみ有効
+AUDIO_CACHE_DIR = os.getenv("AUDIO_CACHE_DIR", "generated_videos/.cache/audio")
+AUDIO_CACHE_MAX_MB = int(os.getenv("AUDIO_CACHE_MAX_MB", "512"))  # 0で無効
+IMAGE_CACHE_DIR = os.getenv("IMAGE_CACHE_DIR", "generated_videos/.cache/images")
+IMAGE_CACHE_MAX_MB = int(os.getenv("IMAGE_CACHE_MAX_MB", "2048"))  # 0で無効
+IMAGE_CACHE_TTL_HOURS = float(os.getenv("IMAGE_CACHE_TTL_HOURS", "168"))
+TITLE_CACHE_DIR = os.getenv("TITLE_CACHE_DIR", "generated_videos/.cache/titles")
+TITLE_CACHE_MAX_MB = int(os.getenv("TITLE_CACHE_MAX_MB", "256"))  # 0で無効
+OPENAI_IMAGE_RPM = float(os.getenv("OPENAI_IMAGE_RPM", "7"))  # 画像生成の1分あたり上限
+OPENAI_CHAT_RPM = float(os.getenv("OPENAI_CHAT_RPM", "500"))  # チャットの1分あたり上限
+OPENAI_MAX_RETRIES = int(os.getenv("OPENAI_MAX_RETRIES", "4"))
+LLM_RESULT_CACHE_TTL = int(os.getenv("LLM_RESULT_CACHE_TTL", "120"))  # 秒（台本・お題提案の共有期間）
+PROGRESS_TTL = int(os.getenv("PROGRESS_TTL", "300"))  # 秒（最新の進捗を保持する期間）
+STATS_PUBLISH_INTERVAL = float(os.getenv("STATS_PUBLISH_INTERVAL", "10"))  # 秒（各プロセスの統計をRedisへ書き込む間隔）
+SSE_KEEPALIVE_SECONDS = float(os.getenv("SSE_KEEPALIVE_SECONDS", "15"))
+PREVIEW_TTL = int(os.getenv("PREVIEW_TTL", "1800"))  # 秒（プレビューした台本を動画生成に使える期間）
+PREFETCH_ON_PREVIEW = os.getenv("PREFETCH_ON_PREVIEW", "true").lower() == "true"  # プレビュー中に音声・タイトル画面を先行生成
+PROFILING_SAMPLE_RATE = float(os.getenv("PROFILING_SAMPLE_RATE", "0"))  # 0-1（プロファイルを取得するジョブの割合）
+ADMIN_TOKEN = os.getenv("ADMIN_TOKEN", "")  # 管理API（/api/admin/*）用。未設定なら管理APIは無効
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "200"))
+# バッチ内の全ジョブで共有するステージ別の同時実行数（0で制限なし。リクエストで上書き可）
+BATCH_CONCURRENCY = {
+    "llm": int(os.getenv("BATCH_LLM_CONCURRENCY", "4")),
+    "image": int(os.getenv("BATCH_IMAGE_CONCURRENCY", "4")),
+    "tts": int(os.getenv("BATCH_TTS_CONCURRENCY", "8")),
+    "encode": int(os.getenv("BATCH_ENCODE_CONCURRENCY", "4")),
+}
+BATCH_BUDGET_LEASE_SECONDS = float(os.getenv("BATCH_BUDGET_LEASE_SECONDS", "60"))  # ワーカー停止時に枠が戻るまでの秒数
 
-# Redis接続
-redis_client = redis.from_url(REDIS_URL)
+# Redis接続（進捗・ステータス・ジョブキュー・LLM結果キャッシュで共有する非同期クライアント）
+redis_client = aioredis.Redis(
+    connection_pool=aioredis.BlockingConnectionPool.from_url(
+        REDIS_URL, max_connections=REDIS_MAX_CONNECTIONS, timeout=REDIS_POOL_TIMEOUT
+    )
+)
+
+# SSE購読専用のRedis接続（購読中は接続を占有するため、視聴者が増えてもリクエスト処理用の接続を使い切らないよう分ける）
+# 上限に達したら待たずにエラーにし、クライアントはポーリングに切り替える
+pubsub_redis_client = aioredis.Redis(
+    connection_pool=aioredis.ConnectionPool.from_url(REDIS_URL, max_connections=REDIS_PUBSUB_MAX_CONNECTIONS)
+)
+
+# ジョブキュー（動画生成はワーカープロセス側で実行）
+job_queue = RedisJobQueue(
+    redis_client,
+    name=JOB_QUEUE_NAME,
+    visibility_timeout=JOB_VISIBILITY_TIMEOUT,
+    max_attempts=JOB_MAX_ATTEMPTS,
+    retry_base_delay=JOB_RETRY_BASE_DELAY,
+    retry_max_delay=JOB_RETRY_MAX_DELAY
+)
+
+# プレビュー中の先行生成（投機的な処理）用の低優先度キュー。ワーカーは動画生成ジョブがない時だけ取り出す
+prefetch_queue = RedisJobQueue(
+    redis_client,
+    name=f"{JOB_QUEUE_NAME}_prefetch",
+    visibility_timeout=JOB_VISIBILITY_TIMEOUT,
+    max_attempts=1
+)
+
+# 各プロセス（API・ワーカー）の統計をRedisに集約（/api/*/stats が全プロセス分を集計して返す）
+stats_publisher = ProcessStatsPublisher(
+    redis_client,
+    {
+        "cache": lambda: {**generator.cache_stats(), "llm_single_flight": generator.single_flight.stats()},
+        "voicevox": lambda: generator.voicevox_pool.stats(),
+        "ratelimit": lambda: {
+            "images": generator.image_rate_limiter.stats(),
+            "chat": generator.chat_rate_limiter.stats()
+        },
+    },
+    interval=STATS_PUBLISH_INTERVAL
+)
 
 # データベース設定
-engine = create_engine(DATABASE_URL)
-SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+def async_database_url(url: str) -> str:
+    """DATABASE_URL を非同期ドライバ（asyncpg / aiosqlite）のURLに変換"""
+    database_url = make_url(url)
+    if database_url.get_backend_name() in ("postgresql", "postgres"):
+        database_url = database_url.set(drivername="postgresql+asyncpg")
+    elif database_url.get_backend_name() == "sqlite":
+        database_url = database_url.set(drivername="sqlite+aiosqlite")
+    return database_url.render_as_string(hide_password=False)
+
+ASYNC_DATABASE_URL = async_database_url(DATABASE_URL)
+if ASYNC_DATABASE_URL.startswith("sqlite"):
+    # SQLiteはファイル単位のロックなので接続プールの設定は使わない
+    engine = create_async_engine(ASYNC_DATABASE_URL)
+else:
+    engine = create_async_engine(
+        ASYNC_DATABASE_URL,
+        pool_size=DB_POOL_SIZE,
+        max_overflow=DB_MAX_OVERFLOW,
+        pool_timeout=DB_POOL_TIMEOUT,
+        pool_recycle=DB_POOL_RECYCLE,
+        pool_pre_ping=True
+    )
+SessionLocal = async_sessionmaker(engine, autoflush=False, expire_on_commit=False)
 Base = declarative_base()
 
 # データベースモデル
@@ -62,6 +196,26 @@ class VideoGeneration(Base):
     completed_at = Column(DateTime, nullable=True)
     error_message = Column(Text, nullable=True)
 
+class JobProfile(Base):
+    __tablename__ = "job_profiles"
+    
+    generation_id = Column(String, ForeignKey("video_generations.id"), primary_key=True)
+    reason = Column(String)  # requested（リクエストで指定）/ sampled（PROFILING_SAMPLE_RATE）
+    wall_seconds = Column(Float)
+    cpu_seconds = Column(Float)
+    profile_data = Column(Text)  # JSON（ステージ別集計・区間・子プロセス・CPUプロファイル上位）
+    cpu_profile = Column(LargeBinary, nullable=True)  # pstats 形式
+    created_at = Column(DateTime, default=datetime.utcnow)
+
+class VideoBatch(Base):
+    __tablename__ = "video_batches"
+    
+    id = Column(String, primary_key=True, index=True)
+    user_id = Column(String, index=True)
+    generation_ids = Column(Text)  # JSON（投入順の動画生成ID）
+    concurrency = Column(Text)  # JSON（ステージ別の同時実行数）
+    created_at = Column(DateTime, default=datetime.utcnow)
+
 class User(Base):
     __tablename__ = "users"
     
@@ -73,16 +227,28 @@ class User(Base):
     created_at = Column(DateTime, default=datetime.utcnow)
     is_active = Column(Boolean, default=True)
 
-# テーブル作成
-Base.metadata.create_all(bind=engine)
+# テーブル作成（API・ワーカーの起動時に呼び出す）
+async def init_db():
+    async with engine.begin() as conn:
+        await conn.run_sync(Base.metadata.create_all)
 
 # Dependency
-def get_db():
-    db = SessionLocal()
-    try:
+async def get_db():
+    async with SessionLocal() as db:
         yield db
-    finally:
-        db.close()
+
+async def get_generation(db: AsyncSession, generation_id: str) -> Optional[VideoGeneration]:
+    result = await db.execute(select(VideoGeneration).where(VideoGeneration.id == generation_id))
+    return result.scalar_one_or_none()
+
+async def update_generation(generation_id: str, **values) -> bool:
+    """動画生成レコードを短いセッションで更新（レコードがなければ False）"""
+    async with SessionLocal() as db:
+        result = await db.execute(
+            update(VideoGeneration).where(VideoGeneration.id == generation_id).values(**values)
+        )
+        await db.commit()
+        return result.rowcount > 0
 
 # Pydantic models
 class TopicSuggestionRequest(BaseModel):
@@ -99,11 +265,45 @@ class VideoGenerationRequest(BaseModel):
     speaker_id: int = 1
     enable_preview: bool = False
     user_id: Optional[str] = None
+    render_profile: str = "final"  # final: 公開用 / draft: 確認用の高速エンコード
+    enable_profiling: bool = False  # 処理のプロファイルを取得（管理APIで参照）
+    preview_id: Optional[str] = None  # /api/script/preview で確認した台本を使う
+    regenerate: bool = False  # 台本プレビューの作り直し（直前の結果キャッシュを使わない）
+
+class VideoBatchItem(BaseModel):
+    topic: str
+    style: str
+    speaker_id: int = 1
+
+class VideoBatchRequest(BaseModel):
+    items: List[VideoBatchItem]
+    user_id: Optional[str] = None
+    render_profile: str = "final"
+    concurrency: Optional[Dict[str, int]] = None  # llm / image / tts / encode（未指定は BATCH_*_CONCURRENCY）
+
+class VideoBatchResponse(BaseModel):
+    batch_id: str
+    generation_ids: List[str]
+    status: str
+    concurrency: Dict[str, int]
 
 class ScriptPreview(BaseModel):
     title: str
     style: str
-    scenes: List[Dict[str, str]]
+    scenes: List[Dict[str, Any]]
+    preview_id: Optional[str] = None  # 動画生成時に指定すると、この台本で作成する
+
+class MultiStyleVideoRequest(BaseModel):
+    topic: str
+    styles: List[str]
+    speaker_id: int = 1
+    user_id: Optional[str] = None
+    render_profile: str = "final"
+
+class MultiStyleVideoResponse(BaseModel):
+    generation_ids: Dict[str, str]  # スタイル名 → 動画生成ID
+    status: str
+    estimated_time: int  # 推定完了時間（秒）
 
 class VideoGenerationResponse(BaseModel):
     generation_id: str
@@ -117,9 +317,69 @@ class VideoStatus(BaseModel):
     current_step: str
     video_url: Optional[str] = None
     error_message: Optional[str] = None
+    elapsed_seconds: Optional[float] = None  # ジョブ開始からの経過秒数
+    stage_timings: Optional[Dict[str, float]] = None  # ステージ・シーンごとの完了時刻（秒）
+
+class VideoBatchStatus(BaseModel):
+    batch_id: str
+    status: str  # pending, processing, completed, completed_with_errors
+    total: int
+    counts: Dict[str, int]  # ステータスごとの件数
+    progress: int  # 0-100（失敗したジョブも完了として数える）
+    items: List[VideoStatus]
 
 # 動画生成システムのインスタンス
-generator = ImprovedStyledVideoGenerator(OPENAI_API_KEY, VOICEVOX_URL)
+generator = ImprovedStyledVideoGenerator(
+    OPENAI_API_KEY,
+    VOICEVOX_URL,
+    ffmpeg_timeout=FFMPEG_TIMEOUT,
+    ffprobe_timeout=FFPROBE_TIMEOUT,
+    process_budget=ProcessBudget(FFMPEG_MAX_PROCESSES, lock_dir=FFMPEG_SLOT_DIR),
+    render_mode=RENDER_MODE,
+    streaming_pipeline=STREAMING_PIPELINE,
+    http_timeout=HTTP_TIMEOUT,
+    http_connect_timeout=HTTP_CONNECT_TIMEOUT,
+    http_pool_size=HTTP_POOL_SIZE,
+    http_pool_size_per_host=HTTP_POOL_SIZE_PER_HOST,
+    audio_cache=DiskLRUCache(AUDIO_CACHE_DIR, AUDIO_CACHE_MAX_MB * 1024 * 1024, suffix=".wav"),
+    image_cache=DiskLRUCache(
+        IMAGE_CACHE_DIR,
+        IMAGE_CACHE_MAX_MB * 1024 * 1024,
+        suffix=".png",
+        ttl_seconds=IMAGE_CACHE_TTL_HOURS * 3600
+    ),
+    title_cache=DiskLRUCache(TITLE_CACHE_DIR, TITLE_CACHE_MAX_MB * 1024 * 1024, suffix=".png"),
+    single_flight=SingleFlight(redis_client, namespace="llm", result_ttl=LLM_RESULT_CACHE_TTL),
+    asset_flight=SingleFlight(redis_client, namespace="asset"),
+    image_rate_limiter=AdaptiveRateLimiter(
+        "images", OPENAI_IMAGE_RPM, max_retries=OPENAI_MAX_RETRIES, redis_client=redis_client
+    ),
+    chat_rate_limiter=AdaptiveRateLimiter(
+        "chat", OPENAI_CHAT_RPM, max_retries=OPENAI_MAX_RETRIES, redis_client=redis_client
+    ),
+    openai_base_url=OPENAI_BASE_URL,
+    voicevox_pool=VoicevoxPool(
+        VOICEVOX_URLS,
+        health_check_interval=VOICEVOX_HEALTH_CHECK_INTERVAL,
+        eject_seconds=VOICEVOX_EJECT_SECONDS
+    )
+)
+
+@app.on_event("startup")
+async def startup():
+    """テーブルを作成し、共有HTTPクライアントを起動"""
+    await init_db()
+    await generator.start()
+    stats_publisher.start()
+
+@app.on_event("shutdown")
+async def shutdown():
+    """共有HTTPクライアント・Redis接続・DB接続プールをクローズ"""
+    await stats_publisher.close()
+    await generator.close()
+    await redis_client.close(close_connection_pool=True)
+    await pubsub_redis_client.close(close_connection_pool=True)
+    await engine.dispose()
 
 @app.get("/")
 async def root():
@@ -129,18 +389,18 @@ async def root():
 async def health_check():
     """ヘルスチェック"""
     try:
-        # VOICEVOX接続確認
-        import aiohttp
-        async with aiohttp.ClientSession() as session:
-            async with session.get(f"{VOICEVOX_URL}/speakers", timeout=5) as response:
-                voicevox_status = response.status == 200
+        # VOICEVOX接続確認（1台でも稼働していればOK）
+        session = await generator.http_session()
+        voicevox_engines = await generator.voicevox_pool.check_health(session)
+        voicevox_status = any(voicevox_engines.values())
         
         # Redis接続確認
-        redis_status = redis_client.ping()
+        redis_status = await redis_client.ping()
         
         return {
             "status": "healthy",
             "voicevox": voicevox_status,
+            "voicevox_engines": voicevox_engines,
             "redis": redis_status,
             "timestamp": datetime.utcnow().isoformat()
         }
@@ -169,27 +429,87 @@ async def get_available_styles():
         })
     return {"styles": styles}
 
+def preview_key(preview_id: str) -> str:
+    """プレビューした台本を保存するRedisキー"""
+    return f"preview:{preview_id}"
+
+def preview_started_key(preview_id: str) -> str:
+    """プレビューした台本で動画生成を始めたことを示すRedisキー（以降の先行生成は不要）"""
+    return f"preview:{preview_id}:started"
+
+async def load_preview(preview_id: str) -> Optional[dict]:
+    data = await redis_client.get(preview_key(preview_id))
+    return json.loads(data) if data else None
+
 @app.post("/api/script/preview", response_model=ScriptPreview)
 async def preview_script(request: VideoGenerationRequest):
-    """台本プレビュー生成"""
+    """台本プレビュー生成
+
+    台本は preview_id で PREVIEW_TTL 秒保存し、動画生成時に preview_id を指定すると同じ台本で作成する。
+    ユーザーが台本を読んでいる間に、ワーカーがナレーション音声とタイトル画面を先行生成する。
+    """
     try:
-        script = await generator.generate_script(request.topic, request.style)
-        return ScriptPreview(
-            title=script["title"],
-            style=script["style"],
-            scenes=script["scenes"]
-        )
+        script = await generator.generate_script(request.topic, request.style, regenerate=request.regenerate)
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"台本生成に失敗しました: {str(e)}")
+    
+    preview_id = str(uuid.uuid4())
+    try:
+        await redis_client.setex(preview_key(preview_id), PREVIEW_TTL, json.dumps({
+            "topic": request.topic,
+            "style": request.style,
+            "speaker_id": request.speaker_id,
+            "script": script
+        }, ensure_ascii=False))
+        if PREFETCH_ON_PREVIEW:
+            await prefetch_queue.enqueue({"preview_id": preview_id}, kind="prefetch")
+    except aioredis.RedisError as e:
+        # 保存できなくてもプレビュー自体は返す（動画生成時は台本を作り直す）
+        print(f"⚠️ プレビューを保存できません: {e}")
+        preview_id = None
+    
+    return ScriptPreview(
+        title=script["title"],
+        style=script["style"],
+        scenes=script["scenes"],
+        preview_id=preview_id
+    )
 
 @app.post("/api/video/generate", response_model=VideoGenerationResponse)
 async def generate_video(
     request: VideoGenerationRequest, 
-    background_tasks: BackgroundTasks,
-    db: Session = Depends(get_db)
+    db: AsyncSession = Depends(get_db)
 ):
     """動画生成開始"""
+    if request.render_profile not in generator.ENCODING_PROFILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"render_profile は {list(generator.ENCODING_PROFILES)} のいずれかを指定してください"
+        )
+    if request.style not in generator.image_styles:
+        raise HTTPException(status_code=400, detail=f"未知のスタイル: {request.style}")
+    # プレビューした台本を使う場合、お題は台本を作ったときのもの（スタイルは台本と同じであること）
+    script = None
+    topic = request.topic
+    if request.preview_id:
+        try:
+            preview = await load_preview(request.preview_id)
+        except aioredis.RedisError as e:
+            raise HTTPException(status_code=500, detail=f"動画生成開始に失敗しました: {str(e)}")
+        if preview is None:
+            raise HTTPException(status_code=404, detail="プレビューの有効期限が切れています。台本をもう一度プレビューしてください")
+        if preview["style"] != request.style:
+            raise HTTPException(
+                status_code=400,
+                detail=f"プレビューした台本のスタイル（{preview['style']}）と指定したスタイルが異なります"
+            )
+        script = preview["script"]
+        topic = preview["topic"]
+    
     try:
+        if request.preview_id:
+            await redis_client.setex(preview_started_key(request.preview_id), PREVIEW_TTL, 1)
+        
         # 生成IDを作成
         generation_id = str(uuid.uuid4())
         
@@ -197,51 +517,347 @@ async def generate_video(
         db_generation = VideoGeneration(
             id=generation_id,
             user_id=request.user_id or "anonymous",
-            topic=request.topic,
+            topic=topic,
             style=request.style,
-            status="pending"
+            status="pending",
+            script_data=json.dumps(script, ensure_ascii=False) if script else None
         )
         db.add(db_generation)
-        db.commit()
+        await db.commit()
         
-        # 非同期で動画生成を開始
-        background_tasks.add_task(
-            process_video_generation,
-            generation_id,
-            request.topic,
-            request.style,
-            request.speaker_id,
-            request.enable_preview
+        # キュー待ちの状態を保存（ワーカーが処理を始めると上書きされる）
+        await RedisProgressPublisher(redis_client, generation_id, ttl=PROGRESS_TTL)(
+            {"status": "pending", "progress": 0, "current_step": "キュー待ち..."}
+        )
+        
+        # ジョブキューに投入（ワーカーが取り出して動画生成を実行）
+        await job_queue.enqueue(
+            {
+                "generation_id": generation_id,
+                "topic": topic,
+                "style": request.style,
+                "speaker_id": request.speaker_id,
+                "enable_preview": request.enable_preview,
+                "render_profile": request.render_profile,
+                "profiling": profiling_reason(request.enable_profiling),
+                "script": script
+            },
+            job_id=generation_id
         )
         
         return VideoGenerationResponse(
             generation_id=generation_id,
             status="pending",
-            estimated_time=120  # 2分程度
+            estimated_time=30 if request.render_profile == "draft" else 120  # 下書きは30秒、本番は2分程度
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"動画生成開始に失敗しました: {str(e)}")
+
+@app.post("/api/video/generate/multi-style", response_model=MultiStyleVideoResponse)
+async def generate_multi_style_video(request: MultiStyleVideoRequest, db: AsyncSession = Depends(get_db)):
+    """1つのお題を複数スタイルで動画生成
+
+    台本とナレーション音声は1回だけ生成し、画像とエンコードだけをスタイルごとに行う。
+    スタイルごとに動画生成IDを発行するので、状況確認・ダウンロードは通常の動画と同じAPIで行える。
+    """
+    if not request.styles or len(set(request.styles)) != len(request.styles):
+        raise HTTPException(status_code=400, detail="styles を重複なく1つ以上指定してください")
+    unknown_styles = [style for style in request.styles if style not in generator.image_styles]
+    if unknown_styles:
+        raise HTTPException(status_code=400, detail=f"未知のスタイル: {unknown_styles}")
+    if request.render_profile not in generator.ENCODING_PROFILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"render_profile は {list(generator.ENCODING_PROFILES)} のいずれかを指定してください"
+        )
+    
+    try:
+        generation_ids = {style: str(uuid.uuid4()) for style in request.styles}
+        created_at = datetime.utcnow()
+        await db.execute(insert(VideoGeneration), [
+            {
+                "id": generation_id,
+                "user_id": request.user_id or "anonymous",
+                "topic": request.topic,
+                "style": style,
+                "status": "pending",
+                "created_at": created_at
+            }
+            for style, generation_id in generation_ids.items()
+        ])
+        await db.commit()
+        
+        # 全スタイルを1つのジョブとして処理（台本・音声を共有するため）
+        await job_queue.enqueue(
+            {
+                "generation_ids": generation_ids,
+                "topic": request.topic,
+                "speaker_id": request.speaker_id,
+                "render_profile": request.render_profile
+            },
+            kind="multi_style"
+        )
+        
+        base_time = 30 if request.render_profile == "draft" else 120
+        return MultiStyleVideoResponse(
+            generation_ids=generation_ids,
+            status="pending",
+            estimated_time=base_time + base_time // 2 * (len(generation_ids) - 1)  # 2スタイル目以降は画像とエンコードのみ
         )
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"動画生成開始に失敗しました: {str(e)}")
 
+@app.post("/api/video/batch", response_model=VideoBatchResponse)
+async def generate_video_batch(request: VideoBatchRequest, db: AsyncSession = Depends(get_db)):
+    """複数のお題をまとめて動画生成
+
+    全件を1回のバルクINSERTで記録し、1往復でジョブキューに投入する。バッチ内のジョブは
+    ステージ別（llm / image / tts / encode）の同時実行数を共有し、一斉に外部APIへ殺到しない。
+    """
+    if not 1 <= len(request.items) <= BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=400, detail=f"items は1〜{BATCH_MAX_ITEMS}件で指定してください")
+    if request.render_profile not in generator.ENCODING_PROFILES:
+        raise HTTPException(
+            status_code=400,
+            detail=f"render_profile は {list(generator.ENCODING_PROFILES)} のいずれかを指定してください"
+        )
+    unknown_styles = sorted({item.style for item in request.items} - set(generator.image_styles))
+    if unknown_styles:
+        raise HTTPException(status_code=400, detail=f"未知のスタイル: {unknown_styles}")
+    unknown_stages = sorted(set(request.concurrency or {}) - set(BatchBudget.STAGES))
+    if unknown_stages:
+        raise HTTPException(status_code=400, detail=f"concurrency に指定できるのは {list(BatchBudget.STAGES)} です")
+    concurrency = {**BATCH_CONCURRENCY, **(request.concurrency or {})}
+    
+    try:
+        batch_id = str(uuid.uuid4())
+        user_id = request.user_id or "anonymous"
+        generation_ids = [str(uuid.uuid4()) for _ in request.items]
+        created_at = datetime.utcnow()
+        
+        # 全件を1回のINSERT（executemany）で記録
+        await db.execute(insert(VideoGeneration), [
+            {
+                "id": generation_id,
+                "user_id": user_id,
+                "topic": item.topic,
+                "style": item.style,
+                "status": "pending",
+                "created_at": created_at
+            }
+            for generation_id, item in zip(generation_ids, request.items)
+        ])
+        db.add(VideoBatch(
+            id=batch_id,
+            user_id=user_id,
+            generation_ids=json.dumps(generation_ids),
+            concurrency=json.dumps(concurrency),
+            created_at=created_at
+        ))
+        await db.commit()
+        
+        await job_queue.enqueue_many([
+            (generation_id, {
+                "generation_id": generation_id,
+                "topic": item.topic,
+                "style": item.style,
+                "speaker_id": item.speaker_id,
+                "enable_preview": False,
+                "render_profile": request.render_profile,
+                "profiling": profiling_reason(False),
+                "batch_id": batch_id,
+                "batch_concurrency": concurrency
+            })
+            for generation_id, item in zip(generation_ids, request.items)
+        ])
+        
+        return VideoBatchResponse(
+            batch_id=batch_id,
+            generation_ids=generation_ids,
+            status="pending",
+            concurrency=concurrency
+        )
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"バッチ動画生成の開始に失敗しました: {str(e)}")
+
+@app.get("/api/video/batch/{batch_id}", response_model=VideoBatchStatus)
+async def get_video_batch_status(batch_id: str, db: AsyncSession = Depends(get_db)):
+    """バッチ全体の進捗（DBを1回、Redisの最新状態を1往復で取得）"""
+    batch = await db.get(VideoBatch, batch_id)
+    if not batch:
+        raise HTTPException(status_code=404, detail="指定されたIDのバッチが見つかりません")
+    generation_ids = json.loads(batch.generation_ids)
+    
+    result = await db.execute(select(VideoGeneration).where(VideoGeneration.id.in_(generation_ids)))
+    generations = {generation.id: generation for generation in result.scalars()}
+    snapshots = await redis_client.mget([progress_key(generation_id) for generation_id in generation_ids])
+    
+    items = []
+    for generation_id, snapshot in zip(generation_ids, snapshots):
+        progress_info = json.loads(snapshot) if snapshot else None
+        if progress_info and "status" in progress_info:
+            items.append(VideoStatus(
+                generation_id=generation_id,
+                status=progress_info["status"],
+                progress=progress_info.get("progress", 0),
+                current_step=progress_info.get("current_step", "準備中..."),
+                video_url=progress_info.get("video_url"),
+                error_message=progress_info.get("error_message"),
+                elapsed_seconds=progress_info.get("elapsed_seconds")
+            ))
+        elif generation_id in generations:
+            items.append(build_video_status(generations[generation_id]))
+    
+    counts: Dict[str, int] = {}
+    for item in items:
+        counts[item.status] = counts.get(item.status, 0) + 1
+    finished = counts.get("completed", 0) + counts.get("failed", 0)
+    if finished == len(items):
+        status = "completed_with_errors" if counts.get("failed") else "completed"
+    elif counts.get("pending", 0) == len(items):
+        status = "pending"
+    else:
+        status = "processing"
+    progress = sum(100 if item.status in ("completed", "failed") else item.progress for item in items)
+    
+    return VideoBatchStatus(
+        batch_id=batch_id,
+        status=status,
+        total=len(items),
+        counts=counts,
+        progress=progress // len(items) if items else 0,
+        items=items
+    )
+
+def profiling_reason(enable_profiling: bool) -> Optional[str]:
+    """このジョブのプロファイルを取得するか（リトライでも同じ判定になるよう投入時に決める）"""
+    if enable_profiling:
+        return "requested"
+    if PROFILING_SAMPLE_RATE > 0 and random.random() < PROFILING_SAMPLE_RATE:
+        return "sampled"
+    return None
+
+@app.get("/api/queue/stats")
+async def get_queue_stats():
+    """ジョブキューの状況（prefetch はプレビュー中の先行生成用キュー）"""
+    return {**await job_queue.stats(), "prefetch": await prefetch_queue.stats()}
+
+CACHE_COUNTERS = ["hits", "misses", "evictions", "expirations", "estimated_seconds_saved"]
+
+@app.get("/api/cache/stats")
+async def get_cache_stats():
+    """素材キャッシュのヒット率・節約時間・節約額、LLM呼び出しの集約状況（全プロセスの合計とプロセス別）"""
+    processes = await read_process_stats(redis_client, "cache", STATS_PUBLISH_INTERVAL * 3)
+    snapshots = list(processes.values())
+    total = {}
+    for cache in ("audio", "image", "title"):
+        entry = sum_fields((snapshot[cache] for snapshot in snapshots), CACHE_COUNTERS)
+        lookups = entry["hits"] + entry["misses"]
+        entry["hit_rate"] = round(entry["hits"] / lookups, 4) if lookups else 0.0
+        # キャッシュディレクトリは共有なので、使用量はいずれかのプロセスが数えた値（最大）
+        entry["bytes"] = max((snapshot[cache]["bytes"] for snapshot in snapshots), default=0)
+        total[cache] = entry
+    total["image"]["estimated_cost_saved_usd"] = round(
+        sum(snapshot["image"]["estimated_cost_saved_usd"] for snapshot in snapshots), 2
+    )
+    total["llm_single_flight"] = sum_fields(
+        (snapshot["llm_single_flight"] for snapshot in snapshots), ["executed", "coalesced", "cache_hits", "in_flight"]
+    )
+    return {"total": total, "processes": processes}
+
+@app.get("/api/ratelimit/stats")
+async def get_rate_limit_stats():
+    """OpenAI呼び出しのレート制限状況（全プロセスの合計とプロセス別）
+
+    レートは全プロセスで共有する値、同時実行数のウィンドウはプロセスごとの値の合計。
+    """
+    processes = await read_process_stats(redis_client, "ratelimit", STATS_PUBLISH_INTERVAL * 3)
+    total = {}
+    for api in ("images", "chat"):
+        entries = [snapshot[api] for snapshot in processes.values()]
+        total[api] = {
+            "rate_per_minute": max((entry["rate_per_minute"] for entry in entries), default=0),
+            **sum_fields(entries, ["concurrency_window", "in_flight", "requests", "throttled", "retries"])
+        }
+    return {"total": total, "processes": processes}
+
+@app.get("/api/voicevox/stats")
+async def get_voicevox_stats():
+    """VOICEVOXエンジンごとの処理中リクエスト数・稼働状況・レイテンシ（全プロセスの合計とプロセス別）
+
+    合計のレイテンシは各プロセスの平均をリクエスト数で重み付けした平均（パーセンタイルはプロセス別のみ）。
+    """
+    processes = await read_process_stats(redis_client, "voicevox", STATS_PUBLISH_INTERVAL * 3)
+    engines: Dict[str, List[dict]] = {}
+    for snapshot in processes.values():
+        for engine_stats in snapshot["engines"]:
+            engines.setdefault(engine_stats["url"], []).append(engine_stats)
+    total = []
+    for url, entries in engines.items():
+        entry = {"url": url, **sum_fields(entries, ["outstanding", "requests", "failures", "ejections"])}
+        entry["available_in_processes"] = sum(1 for engine_stats in entries if engine_stats["available"])
+        entry["latency_avg_ms"] = round(
+            sum(engine_stats["latency_avg_ms"] * engine_stats["requests"] for engine_stats in entries) / entry["requests"], 1
+        ) if entry["requests"] else 0.0
+        total.append(entry)
+    return {"total": {"engines": total, "processes": len(processes)}, "processes": processes}
+
+@app.get("/metrics")
+async def get_metrics():
+    """Prometheus形式のメトリクス（ステージ別所要時間・代替処理・キャッシュ・再試行）"""
+    return Response(render_latest(), headers={"Content-Type": CONTENT_TYPE_LATEST})
+
 @app.get("/api/video/status/{generation_id}", response_model=VideoStatus)
-async def get_video_status(generation_id: str, db: Session = Depends(get_db)):
+async def get_video_status(generation_id: str):
     """動画生成状況確認"""
-    db_generation = db.query(VideoGeneration).filter(VideoGeneration.id == generation_id).first()
-    
-    if not db_generation:
+    video_status = await load_video_status(generation_id)
+    if video_status is None:
         raise HTTPException(status_code=404, detail="指定されたIDの動画生成が見つかりません")
+    return video_status
+
+async def read_progress(generation_id: str) -> Tuple[Optional[dict], Dict[str, float]]:
+    """Redisから最新の進捗とステージ完了時刻を1往復で取得"""
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.get(progress_key(generation_id))
+    pipe.hgetall(progress_timings_key(generation_id))
+    progress_data, timings = await pipe.execute()
+    return (
+        json.loads(progress_data) if progress_data else None,
+        {field.decode(): float(value) for field, value in timings.items()}
+    )
+
+async def load_video_status(generation_id: str) -> Optional[VideoStatus]:
+    """動画生成状況を取得（該当なしなら None）
+
+    ワーカーはステータス変更のたびにRedisにも最新の状態を書くため、Redisにあればそれを返し、
+    期限切れの場合のみDBを参照する。
+    """
+    progress_info, timings = await read_progress(generation_id)
+    if progress_info and "status" in progress_info:
+        return VideoStatus(
+            generation_id=generation_id,
+            status=progress_info["status"],
+            progress=progress_info.get("progress", 0),
+            current_step=progress_info.get("current_step", "準備中..."),
+            video_url=progress_info.get("video_url"),
+            error_message=progress_info.get("error_message"),
+            elapsed_seconds=progress_info.get("elapsed_seconds"),
+            stage_timings=timings or None
+        )
     
-    # Redisから進行状況を取得
-    progress_data = redis_client.get(f"progress:{generation_id}")
-    if progress_data:
-        progress_info = json.loads(progress_data)
-        progress = progress_info.get("progress", 0)
-        current_step = progress_info.get("current_step", "準備中...")
-    else:
-        progress = 0 if db_generation.status == "pending" else 100
-        current_step = "準備中..." if db_generation.status == "pending" else "完了"
+    async with SessionLocal() as db:
+        db_generation = await get_generation(db, generation_id)
+    if not db_generation:
+        return None
+    return build_video_status(db_generation)
+
+def build_video_status(db_generation: VideoGeneration) -> VideoStatus:
+    """DBのステータスから VideoStatus を作成"""
+    progress = 0 if db_generation.status == "pending" else 100
+    current_step = "準備中..." if db_generation.status == "pending" else "完了"
     
     return VideoStatus(
-        generation_id=generation_id,
+        generation_id=db_generation.id,
         status=db_generation.status,
         progress=progress,
         current_step=current_step,
@@ -249,29 +865,88 @@ async def get_video_status(generation_id: str, db: Session = Depends(get_db)):
         error_message=db_generation.error_message
     )
 
-@app.get("/api/video/download/{generation_id}")
-async def download_video(generation_id: str, db: Session = Depends(get_db)):
+@app.get("/api/video/events/{generation_id}")
+async def stream_video_events(generation_id: str, request: Request):
+    """動画生成の進行状況をServer-Sent Eventsで配信
+
+    ワーカーがRedis pub/subに送るステージ・シーンごとの進捗イベントをそのまま転送し、
+    完了・失敗のイベントを送ったらストリームを閉じる。
+    """
+    if await load_video_status(generation_id) is None:
+        raise HTTPException(status_code=404, detail="指定されたIDの動画生成が見つかりません")
+    
+    pubsub = pubsub_redis_client.pubsub()
+    try:
+        await pubsub.subscribe(progress_channel(generation_id))
+    except aioredis.RedisError as e:
+        await pubsub.close()
+        print(f"⚠️ 進捗イベントを購読できません: {e}")
+        raise HTTPException(status_code=503, detail="進捗の配信が混み合っています。ステータスAPIで確認してください")
+    
+    return StreamingResponse(
+        progress_event_stream(generation_id, request, pubsub),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+async def progress_event_stream(generation_id: str, request: Request, pubsub: PubSub):
+    """SSE形式の進捗イベントを生成（購読開始後に最新状態を送るので取りこぼさない）"""
+    try:
+        video_status = await load_video_status(generation_id)
+        if video_status is None:
+            return
+        yield f"data: {json.dumps(video_status.dict(exclude_none=True), ensure_ascii=False)}\n\n"
+        if video_status.status in ("completed", "failed"):
+            return
+        
+        while not await request.is_disconnected():
+            message = await pubsub.get_message(ignore_subscribe_messages=True, timeout=SSE_KEEPALIVE_SECONDS)
+            if message is None:
+                # プロキシに切断されないようにコメント行を送る
+                yield ": keepalive\n\n"
+                continue
+            data = message["data"].decode() if isinstance(message["data"], bytes) else message["data"]
+            yield f"data: {data}\n\n"
+            if json.loads(data).get("status") in ("completed", "failed"):
+                break
+    finally:
+        await pubsub.unsubscribe()
+        await pubsub.close()
+
+@app.api_route("/api/video/download/{generation_id}", methods=["GET", "HEAD"])
+async def download_video(generation_id: str, request: Request, db: AsyncSession = Depends(get_db)):
     """動画ダウンロード"""
-    db_generation = db.query(VideoGeneration).filter(VideoGeneration.id == generation_id).first()
+    db_generation = await get_generation(db, generation_id)
     
     if not db_generation or db_generation.status != "completed":
         raise HTTPException(status_code=404, detail="動画が見つからないか、まだ生成中です")
     
-    if not db_generation.video_url or not os.path.exists(db_generation.video_url):
+    try:
+        stat_result = os.stat(db_generation.video_url) if db_generation.video_url else None
+    except OSError:
+        stat_result = None
+    if stat_result is None:
         raise HTTPException(status_code=404, detail="動画ファイルが見つかりません")
     
-    return FileResponse(
-        path=db_generation.video_url,
-        filename=f"{db_generation.topic.replace(' ', '_')}.mp4",
-        media_type="video/mp4"
+    # Range（シーク・途中から再生）と ETag（再ダウンロード時は304）に対応
+    return RangeFileResponse(
+        db_generation.video_url,
+        stat_result,
+        request.headers,
+        media_type="video/mp4",
+        filename=f"{db_generation.topic.replace(' ', '_')}.mp4"
     )
 
 @app.get("/api/user/{user_id}/history")
-async def get_user_history(user_id: str, db: Session = Depends(get_db)):
+async def get_user_history(user_id: str, db: AsyncSession = Depends(get_db)):
     """ユーザーの生成履歴"""
-    generations = db.query(VideoGeneration).filter(
-        VideoGeneration.user_id == user_id
-    ).order_by(VideoGeneration.created_at.desc()).limit(20).all()
+    result = await db.execute(
+        select(VideoGeneration)
+        .where(VideoGeneration.user_id == user_id)
+        .order_by(VideoGeneration.created_at.desc())
+        .limit(20)
+    )
+    generations = result.scalars().all()
     
     return {
         "generations": [
@@ -287,59 +962,275 @@ async def get_user_history(user_id: str, db: Session = Depends(get_db)):
         ]
     }
 
+def require_admin(x_admin_token: Optional[str] = Header(None)):
+    """管理API用の認証（X-Admin-Token ヘッダーと ADMIN_TOKEN を比較）"""
+    if not ADMIN_TOKEN or not x_admin_token or not secrets.compare_digest(x_admin_token, ADMIN_TOKEN):
+        raise HTTPException(status_code=403, detail="管理者トークンが正しくありません")
+
+@app.get("/api/admin/profiles", dependencies=[Depends(require_admin)])
+async def list_job_profiles(limit: int = 50, db: AsyncSession = Depends(get_db)):
+    """取得済みプロファイルの一覧（新しい順）"""
+    result = await db.execute(
+        select(JobProfile, VideoGeneration)
+        .join(VideoGeneration, VideoGeneration.id == JobProfile.generation_id)
+        .order_by(JobProfile.created_at.desc())
+        .limit(min(max(limit, 1), 500))
+    )
+    return {
+        "profiles": [
+            {
+                "generation_id": profile.generation_id,
+                "topic": generation.topic,
+                "status": generation.status,
+                "reason": profile.reason,
+                "wall_seconds": profile.wall_seconds,
+                "cpu_seconds": profile.cpu_seconds,
+                "created_at": profile.created_at.isoformat()
+            }
+            for profile, generation in result.all()
+        ]
+    }
+
+@app.get("/api/admin/profiles/{generation_id}", dependencies=[Depends(require_admin)])
+async def get_job_profile(generation_id: str, db: AsyncSession = Depends(get_db)):
+    """ジョブのプロファイル（ステージ別集計・区間・ffmpeg等の子プロセス・CPUプロファイル上位）"""
+    profile = await db.get(JobProfile, generation_id)
+    if not profile:
+        raise HTTPException(status_code=404, detail="プロファイルが見つかりません")
+    return {
+        **json.loads(profile.profile_data),
+        "created_at": profile.created_at.isoformat(),
+        "cpu_profile_download": f"/api/admin/profiles/{generation_id}/cpu.prof" if profile.cpu_profile else None
+    }
+
+@app.get("/api/admin/profiles/{generation_id}/cpu.prof", dependencies=[Depends(require_admin)])
+async def download_cpu_profile(generation_id: str, db: AsyncSession = Depends(get_db)):
+    """CPUプロファイル（pstats 形式。snakeviz などで開く）"""
+    profile = await db.get(JobProfile, generation_id)
+    if not profile or not profile.cpu_profile:
+        raise HTTPException(status_code=404, detail="CPUプロファイルが見つかりません")
+    return Response(
+        profile.cpu_profile,
+        media_type="application/octet-stream",
+        headers={"Content-Disposition": f'attachment; filename="{generation_id}.prof"'}
+    )
+
+async def save_job_profile(profiler: JobProfiler) -> None:
+    """プロファイルを保存（リトライ時は最後の試行で上書き）。保存の失敗でジョブは失敗させない"""
+    try:
+        async with SessionLocal() as db:
+            await db.merge(JobProfile(
+                generation_id=profiler.generation_id,
+                reason=profiler.reason,
+                wall_seconds=profiler.wall_seconds,
+                cpu_seconds=profiler.cpu_seconds,
+                profile_data=json.dumps(profiler.to_dict(), ensure_ascii=False),
+                cpu_profile=profiler.cpu_profile_dump(),
+                created_at=datetime.utcnow()
+            ))
+            await db.commit()
+        print(f"🔬 プロファイル保存: {profiler.generation_id}（{profiler.wall_seconds}秒）")
+    except Exception as e:
+        print(f"⚠️ プロファイルを保存できません: {e}")
+
+async def update_generations(generation_ids: List[str], **values) -> int:
+    """複数の動画生成レコードを1回のUPDATEで更新し、更新件数を返す"""
+    async with SessionLocal() as db:
+        result = await db.execute(
+            update(VideoGeneration).where(VideoGeneration.id.in_(generation_ids)).values(**values)
+        )
+        await db.commit()
+        return result.rowcount
+
+async def unfinished_generations(generation_ids: List[str]) -> List[str]:
+    """指定した動画生成IDのうち、完了していないもの"""
+    async with SessionLocal() as db:
+        result = await db.execute(
+            select(VideoGeneration.id).where(
+                VideoGeneration.id.in_(generation_ids),
+                VideoGeneration.status != "completed"
+            )
+        )
+        return list(result.scalars())
+
+async def fail_generations(generation_ids: List[str], error_message: str) -> None:
+    """処理を諦めた動画生成を failed にして終了イベントを配信（完了済みのものはそのまま）"""
+    unfinished = await unfinished_generations(generation_ids)
+    if not unfinished:
+        return
+    await update_generations(unfinished, status="failed", error_message=error_message)
+    await asyncio.gather(*(
+        RedisProgressPublisher(redis_client, generation_id, ttl=PROGRESS_TTL)({
+            "status": "failed", "progress": 0, "current_step": "エラー", "error_message": error_message
+        })
+        for generation_id in unfinished
+    ))
+
 async def process_video_generation(
     generation_id: str,
     topic: str,
     style: str,
     speaker_id: int,
-    enable_preview: bool
+    enable_preview: bool,
+    render_profile: str = "final",
+    profiling: Optional[str] = None,
+    batch_id: Optional[str] = None,
+    batch_concurrency: Optional[Dict[str, int]] = None,
+    script: Optional[dict] = None,
+    final_attempt: bool = True
 ):
-    """バックグラウンドでの動画生成処理"""
-    db = SessionLocal()
+    """ワーカーでの動画生成処理
+
+    失敗時は例外を再送出し、リトライ判定はワーカー（ジョブキュー）に任せる。
+    最終試行でなければステータスを pending に戻して再実行を待つ。
+    DBセッションはステータス更新のたびに短く開き、レンダリング中は接続を保持しない。
+    profiling（requested / sampled）が指定されていれば、生成処理のプロファイルを保存する。
+    バッチのジョブは batch_concurrency（ステージ別の同時実行数）をバッチ内の他ジョブと共有する。
+    script（プレビューで確認済みの台本）があれば台本生成を省略する。
+    """
+    publish_progress = RedisProgressPublisher(redis_client, generation_id, ttl=PROGRESS_TTL)
+    profiler = JobProfiler(generation_id, profiling) if profiling else None
+    budget = BatchBudget(
+        redis_client, batch_id, batch_concurrency or BATCH_CONCURRENCY, BATCH_BUDGET_LEASE_SECONDS
+    ) if batch_id else None
+    record_exists = False
     try:
         # ステータスを処理中に更新
-        db_generation = db.query(VideoGeneration).filter(VideoGeneration.id == generation_id).first()
-        db_generation.status = "processing"
-        db.commit()
+        record_exists = await update_generation(generation_id, status="processing")
+        if not record_exists:
+            raise ValueError(f"動画生成レコードが見つかりません: {generation_id}")
         
-        # 進行状況をRedisに保存する関数
-        def update_progress(progress: int, step: str):
-            redis_client.setex(
-                f"progress:{generation_id}",
-                300,  # 5分で期限切れ
-                json.dumps({"progress": progress, "current_step": step})
+        # ステージ・シーンごとの進捗をRedisに保存し、pub/subで配信
+        await publish_progress({"status": "processing", "progress": 0, "current_step": "準備中..."})
+        
+        # 既存の動画生成システムを呼び出し
+        with profiler.activate() if profiler else nullcontext(), budget.activate() if budget else nullcontext():
+            video_path = await generator.generate_improved_video(
+                topic, style, speaker_id, enable_preview,
+                generation_id=generation_id, progress_callback=publish_progress,
+                render_profile=render_profile, script=script
             )
         
-        # 実際の動画生成（進行状況付き）
-        update_progress(10, "台本を生成中...")
+        if not video_path:
+            raise RuntimeError("動画生成に失敗しました")
         
-        # 既存の動画生成システムを呼び出し
-        video_path = await generator.generate_improved_video(
-            topic, style, speaker_id, enable_preview
+        # 成功
+        await update_generation(
+            generation_id,
+            status="completed",
+            video_url=video_path,
+            completed_at=datetime.utcnow(),
+            error_message=None
         )
+        await publish_progress({
+            "status": "completed", "progress": 100, "current_step": "完了", "video_url": video_path
+        })
         
-        if video_path:
-            # 成功
-            db_generation.status = "completed"
-            db_generation.video_url = video_path
-            db_generation.completed_at = datetime.utcnow()
-            update_progress(100, "完了")
+    except Exception as e:
+        # エラー処理
+        if record_exists:
+            await update_generation(
+                generation_id,
+                status="failed" if final_attempt else "pending",
+                error_message=str(e)
+            )
+        if final_attempt:
+            await publish_progress({
+                "status": "failed", "progress": 0, "current_step": "エラー", "error_message": str(e)
+            })
         else:
-            # 失敗
-            db_generation.status = "failed"
-            db_generation.error_message = "動画生成に失敗しました"
-            update_progress(0, "エラー")
+            await publish_progress({"status": "pending", "progress": 0, "current_step": "再試行待ち..."})
+        raise
+    finally:
+        if profiler is not None and record_exists:
+            await save_job_profile(profiler)
+
+async def process_asset_prefetch(preview_id: str, final_attempt: bool = True):
+    """プレビュー中の台本のナレーション音声・タイトル画面を先行生成（投機的な処理なので失敗しても再試行しない）
+
+    動画生成が既に始まっていれば省略する（同時に作成中の素材は生成側とまとめられる）。
+    """
+    if await redis_client.exists(preview_started_key(preview_id)):
+        print(f"⏭️ 動画生成が始まっているため先行生成を省略: {preview_id}")
+        return
+    preview = await load_preview(preview_id)
+    if preview is None:
+        print(f"⏭️ プレビューの有効期限切れのため先行生成を省略: {preview_id}")
+        return
+    try:
+        prefetched = await generator.prefetch_assets(preview["script"], preview["style"], preview["speaker_id"])
+        print(f"⚡ 素材を先行生成: {preview_id}（{prefetched}件）")
+    except Exception as e:
+        print(f"⚠️ 素材の先行生成に失敗: {preview_id} ({e})")
+
+async def process_multi_style_generation(
+    generation_ids: Dict[str, str],
+    topic: str,
+    speaker_id: int,
+    render_profile: str = "final",
+    final_attempt: bool = True
+):
+    """ワーカーでの複数スタイル動画生成処理（スタイル名 → 動画生成ID）
+
+    進捗イベントは全スタイルの動画生成IDへ同じものを配信する。作成できなかったスタイルは
+    その場で failed にし、全スタイルが失敗した場合のみ例外を送出してリトライに回す。
+    """
+    ids = list(generation_ids.values())
+    publishers = {
+        style: RedisProgressPublisher(redis_client, generation_id, ttl=PROGRESS_TTL)
+        for style, generation_id in generation_ids.items()
+    }
+    
+    async def publish_all(event: dict) -> None:
+        await asyncio.gather(*(publish(event) for publish in publishers.values()))
+    
+    try:
+        if await update_generations(ids, status="processing") == 0:
+            raise ValueError(f"動画生成レコードが見つかりません: {ids}")
+        await publish_all({"status": "processing", "progress": 0, "current_step": "準備中..."})
         
-        db.commit()
+        video_paths = await generator.generate_multi_style_videos(
+            topic, list(generation_ids), speaker_id,
+            generation_id=ids[0], progress_callback=publish_all, render_profile=render_profile
+        )
+        if not any(video_paths.values()):
+            raise RuntimeError("動画生成に失敗しました")
         
-    except Exception as e:
-        # エラー処理
-        db_generation.status = "failed"
-        db_generation.error_message = str(e)
-        db.commit()
+        for style, generation_id in generation_ids.items():
+            video_path = video_paths.get(style)
+            if video_path:
+                await update_generation(
+                    generation_id,
+                    status="completed",
+                    video_url=video_path,
+                    completed_at=datetime.utcnow(),
+                    error_message=None
+                )
+                await publishers[style]({
+                    "status": "completed", "progress": 100, "current_step": "完了", "video_url": video_path
+                })
+            else:
+                error_message = f"{style}スタイルの動画作成に失敗しました"
+                await update_generation(generation_id, status="failed", error_message=error_message)
+                await publishers[style]({
+                    "status": "failed", "progress": 0, "current_step": "エラー", "error_message": error_message
+                })
         
-    finally:
-        db.close()
+    except Exception as e:
+        # 途中で完了したスタイルの結果は残す
+        unfinished = await unfinished_generations(ids)
+        if unfinished:
+            await update_generations(unfinished, status="failed" if final_attempt else "pending", error_message=str(e))
+        if final_attempt:
+            event = {"status": "failed", "progress": 0, "current_step": "エラー", "error_message": str(e)}
+        else:
+            event = {"status": "pending", "progress": 0, "current_step": "再試行待ち..."}
+        await asyncio.gather(*(
+            publishers[style](event)
+            for style, generation_id in generation_ids.items()
+            if generation_id in unfinished
+        ))
+        raise
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,59 @@
+import mmap
+import os
+import struct
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional, Union
+
+
+@dataclass
+class WavInfo:
+    """WAVファイルのメタデータ"""
+    audio_format: int  # 1: PCM, 3: IEEE float
+    channels: int
+    sample_rate: int
+    byte_rate: int
+    bits_per_sample: int
+    data_bytes: int
+
+    @property
+    def duration(self) -> float:
+        """再生時間（秒）"""
+        return self.data_bytes / self.byte_rate if self.byte_rate else 0.0
+
+
+def read_wav_info(path: Union[str, Path]) -> Optional[WavInfo]:
+    """RIFFヘッダーをメモリマップで読み、WAVのメタデータを返す（WAVでなければ None）
+
+    プロセスを起動せずに長さを取得できる。VOICEVOXの出力（PCM WAV）を想定し、
+    fmt/data 以外のチャンク（LIST など）は読み飛ばす。
+    """
+    try:
+        with open(path, "rb") as f:
+            size = os.fstat(f.fileno()).st_size
+            if size < 12:
+                return None
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as m:
+                if m[0:4] != b"RIFF" or m[8:12] != b"WAVE":
+                    return None
+
+                fmt = None
+                pos = 12
+                while pos + 8 <= size:
+                    chunk_id = m[pos:pos + 4]
+                    chunk_size = struct.unpack_from("<I", m, pos + 4)[0]
+                    body = pos + 8
+                    if chunk_id == b"fmt " and body + 16 <= size:
+                        fmt = struct.unpack_from("<HHIIHH", m, body)
+                    elif chunk_id == b"data":
+                        if fmt is None:
+                            return None
+                        audio_format, channels, sample_rate, byte_rate, _, bits_per_sample = fmt
+                        # ストリーミング出力などでサイズが未確定（0xFFFFFFFF）の場合はファイル末尾まで
+                        data_bytes = min(chunk_size, size - body)
+                        return WavInfo(audio_format, channels, sample_rate, byte_rate, bits_per_sample, data_bytes)
+                    # チャンクは2バイト境界に揃えられる
+                    pos = body + chunk_size + (chunk_size & 1)
+    except (OSError, ValueError, struct.error):
+        return None
+    return None
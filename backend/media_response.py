@@ -0,0 +1,138 @@
+import os
+import re
+from email.utils import formatdate
+from typing import Mapping, Optional, Tuple
+from urllib.parse import quote
+
+import anyio
+from starlette.responses import Response
+from starlette.types import Receive, Scope, Send
+
+_RANGE_PATTERN = re.compile(r"^bytes=(\d*)-(\d*)$")
+
+
+def make_etag(stat_result: os.stat_result) -> str:
+    """更新時刻とサイズから作るETag（ファイルを読まずに計算できる）"""
+    return f'"{stat_result.st_mtime_ns:x}-{stat_result.st_size:x}"'
+
+
+def parse_range(header: str, size: int) -> Optional[Tuple[int, int]]:
+    """Range ヘッダー（単一範囲のみ）を (開始, 終了) に変換
+
+    解釈できない・複数範囲の指定は None（全体を返す）。範囲外は ValueError。
+    """
+    match = _RANGE_PATTERN.match(header.strip())
+    if not match:
+        return None
+    start, end = match.groups()
+    if not start and not end:
+        return None
+    if not start:
+        # 末尾から N バイト
+        length = int(end)
+        if length == 0:
+            raise ValueError("empty suffix range")
+        return max(0, size - length), size - 1
+    first = int(start)
+    last = min(int(end), size - 1) if end else size - 1
+    if first >= size or first > last:
+        raise ValueError("range not satisfiable")
+    return first, last
+
+
+class RangeFileResponse(Response):
+    """Range・ETag（If-None-Match / If-Range）に対応したファイル応答
+
+    Starlette 0.27 の FileResponse は Range に対応していないため、動画配信用に実装する。
+    サーバーが ASGI の zerocopysend 拡張に対応していれば sendfile でカーネルから直接送り、
+    そうでなければスレッドで読み込んだチャンクを送る。
+    """
+
+    chunk_size = 256 * 1024
+
+    def __init__(
+        self,
+        path: str,
+        stat_result: os.stat_result,
+        request_headers: Mapping[str, str],
+        media_type: str = "application/octet-stream",
+        filename: Optional[str] = None,
+        cache_control: str = "private, max-age=86400"
+    ):
+        self.path = path
+        self.media_type = media_type
+        self.background = None
+        size = stat_result.st_size
+        etag = make_etag(stat_result)
+
+        headers = {
+            "accept-ranges": "bytes",
+            "etag": etag,
+            "last-modified": formatdate(stat_result.st_mtime, usegmt=True),
+            "cache-control": cache_control,
+        }
+        if filename is not None:
+            quoted = quote(filename)
+            if quoted != filename:
+                headers["content-disposition"] = f"attachment; filename*=utf-8''{quoted}"
+            else:
+                headers["content-disposition"] = f'attachment; filename="{filename}"'
+
+        self.offset, self.count = 0, size
+        status_code = 200
+        if_none_match = request_headers.get("if-none-match")
+        range_header = request_headers.get("range")
+        if_range = request_headers.get("if-range")
+        if if_none_match and (if_none_match.strip() == "*" or etag in [t.strip() for t in if_none_match.split(",")]):
+            status_code, self.count = 304, 0
+        elif range_header and (not if_range or if_range.strip() == etag):
+            try:
+                byte_range = parse_range(range_header, size)
+            except ValueError:
+                byte_range = None
+                status_code, self.count = 416, 0
+                headers["content-range"] = f"bytes */{size}"
+            if byte_range is not None:
+                first, last = byte_range
+                status_code = 206
+                self.offset, self.count = first, last - first + 1
+                headers["content-range"] = f"bytes {first}-{last}/{size}"
+
+        self.status_code = status_code
+        self.body = b""
+        self.init_headers(headers)
+        if status_code == 304:
+            self.raw_headers = [(k, v) for k, v in self.raw_headers if k not in (b"content-type", b"content-length")]
+        else:
+            self.raw_headers = [(k, v) for k, v in self.raw_headers if k != b"content-length"]
+            self.raw_headers.append((b"content-length", str(self.count).encode("latin-1")))
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send) -> None:
+        await send({"type": "http.response.start", "status": self.status_code, "headers": self.raw_headers})
+        if self.count == 0 or scope.get("method") == "HEAD":
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
+            return
+
+        if "http.response.zerocopysend" in scope.get("extensions", {}):
+            with open(self.path, "rb") as f:
+                await send({
+                    "type": "http.response.zerocopysend",
+                    "file": f.fileno(),
+                    "offset": self.offset,
+                    "count": self.count,
+                    "more_body": False,
+                })
+            return
+
+        async with await anyio.open_file(self.path, mode="rb") as f:
+            await f.seek(self.offset)
+            remaining = self.count
+            while remaining > 0:
+                chunk = await f.read(min(self.chunk_size, remaining))
+                if not chunk:
+                    break
+                remaining -= len(chunk)
+                await send({"type": "http.response.body", "body": chunk, "more_body": remaining > 0})
+        if remaining > 0:
+            # ファイルが途中で短くなった場合も応答は閉じる
+            await send({"type": "http.response.body", "body": b"", "more_body": False})
@@ -0,0 +1,132 @@
+import os
+import time
+from contextlib import contextmanager
+from typing import Optional
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    generate_latest,
+    start_http_server,
+)
+from prometheus_client import multiprocess
+
+from profiling import current_profiler
+
+# 外部API呼び出し・ffmpeg など1回あたり数十ミリ秒〜数分のばらつきを見られるバケット
+STAGE_BUCKETS = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 60, 120, 300, 600)
+JOB_BUCKETS = (5, 10, 20, 30, 45, 60, 90, 120, 180, 240, 300, 450, 600, 900, 1200)
+
+# ステージ:
+#   script / topic_suggest        … chat API（台本・お題提案）
+#   title_render / dummy_render   … Pillowによるタイトル画面・ダミー画像の描画
+#   image_request / image_download… 画像生成API・生成画像のダウンロード
+#   tts_query / tts_synthesis     … VOICEVOX（audio_query / synthesis）
+#   ffprobe / ffmpeg / concat     … 外部プロセス（concat は結合・faststart 書き換え）
+#   ffmpeg_wait                   … ffmpegプロセス予算の空き待ち
+STAGE_SECONDS = Histogram(
+    "video_stage_duration_seconds",
+    "動画生成の各ステージの所要時間",
+    ["stage", "outcome"],
+    buckets=STAGE_BUCKETS,
+)
+JOB_SECONDS = Histogram(
+    "video_job_duration_seconds",
+    "ワーカーがジョブ1件の処理にかかった時間",
+    ["kind", "outcome"],
+    buckets=JOB_BUCKETS,
+)
+JOBS_IN_PROGRESS = Gauge(
+    "video_jobs_in_progress",
+    "処理中のジョブ数",
+    ["kind"],
+    multiprocess_mode="livesum",
+)
+FALLBACKS = Counter(
+    "video_fallbacks_total",
+    "代替処理に切り替えた回数（dummy_image / placeholder_title / default_duration / concat_first_clip）",
+    ["kind"],
+)
+CACHE_LOOKUPS = Counter(
+    "video_cache_lookups_total",
+    "素材キャッシュの参照回数",
+    ["cache", "result"],
+)
+API_RETRIES = Counter(
+    "video_api_retries_total",
+    "OpenAI API呼び出しの再試行回数",
+    ["api", "reason"],
+)
+
+
+class StageSpan:
+    """stage_timer() の1区間（処理結果を outcome で上書きできる）"""
+
+    __slots__ = ("stage", "outcome")
+
+    def __init__(self, stage: str):
+        self.stage = stage
+        self.outcome = "success"
+
+    def fail(self) -> None:
+        """例外を送出せずに失敗した（エラー応答・フォールバック）ことを記録"""
+        self.outcome = "error"
+
+
+@contextmanager
+def stage_timer(stage: str):
+    """with ブロックの所要時間をステージ別ヒストグラムに記録（例外なら outcome="error"）"""
+    span = StageSpan(stage)
+    started = time.perf_counter()
+    try:
+        yield span
+    except BaseException:
+        span.outcome = "error"
+        raise
+    finally:
+        observe_stage(stage, time.perf_counter() - started, span.outcome)
+
+
+def observe_stage(stage: str, seconds: float, outcome: str = "success") -> None:
+    """ステージの所要時間を記録（プロファイル取得中のジョブなら、その内訳にも追加）"""
+    STAGE_SECONDS.labels(stage, outcome).observe(seconds)
+    profiler = current_profiler()
+    if profiler is not None:
+        profiler.record_stage(stage, seconds, outcome)
+
+
+def record_fallback(kind: str) -> None:
+    FALLBACKS.labels(kind).inc()
+
+
+def record_cache_lookup(cache: str, hit: bool) -> None:
+    CACHE_LOOKUPS.labels(cache, "hit" if hit else "miss").inc()
+
+
+def record_retry(api: str, status: Optional[int]) -> None:
+    API_RETRIES.labels(api, str(status) if status is not None else "connection").inc()
+
+
+def render_latest() -> bytes:
+    """Prometheus のテキスト形式で出力
+
+    PROMETHEUS_MULTIPROC_DIR が設定されていれば、同じディレクトリに書き込む全プロセス
+    （uvicornワーカー・動画生成ワーカー）の値を集計して返す。
+    """
+    if os.getenv("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
+
+def start_metrics_server(port: int) -> None:
+    """APIを持たないプロセス（ワーカー）用に /metrics を別ポートで公開（0なら何もしない）"""
+    if port > 0:
+        start_http_server(port)
+        print(f"📈 メトリクス公開: :{port}/metrics")
+
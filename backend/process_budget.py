@@ -0,0 +1,59 @@
+import asyncio
+import os
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Optional
+
+try:
+    import fcntl  # POSIXのみ（Windowsではプロセス内の制限のみ有効）
+except ImportError:
+    fcntl = None
+
+
+class ProcessBudget:
+    """同時に起動する重い子プロセス（ffmpeg）の数を制限するスロット
+
+    プロセス内は asyncio.Semaphore で、同じノード上の別プロセス（複数ワーカー）とは
+    lock_dir 内のスロットファイルへの flock で上限を共有する。
+    """
+
+    def __init__(self, limit: int, lock_dir: Optional[str] = None, poll_interval: float = 0.2):
+        self.limit = max(1, limit)
+        self.lock_dir = Path(lock_dir) if lock_dir and fcntl else None
+        self.poll_interval = poll_interval
+        self._semaphore = asyncio.Semaphore(self.limit)
+        self.active = 0
+        if self.lock_dir:
+            self.lock_dir.mkdir(parents=True, exist_ok=True)
+
+    def _try_lock_file_slot(self) -> Optional[int]:
+        """空いているスロットファイルをロックし、ファイルディスクリプタを返す"""
+        for i in range(self.limit):
+            fd = os.open(self.lock_dir / f"slot-{i}.lock", os.O_RDWR | os.O_CREAT, 0o644)
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | fcntl.LOCK_NB)
+                return fd
+            except OSError:
+                os.close(fd)
+        return None
+
+    async def _acquire_file_slot(self) -> int:
+        while True:
+            fd = self._try_lock_file_slot()
+            if fd is not None:
+                return fd
+            await asyncio.sleep(self.poll_interval)
+
+    @asynccontextmanager
+    async def slot(self):
+        """スロットを1つ確保している間だけ処理を実行"""
+        async with self._semaphore:
+            fd = await self._acquire_file_slot() if self.lock_dir else None
+            self.active += 1
+            try:
+                yield
+            finally:
+                self.active -= 1
+                if fd is not None:
+                    fcntl.flock(fd, fcntl.LOCK_UN)
+                    os.close(fd)
@@ -0,0 +1,87 @@
+import asyncio
+import json
+import os
+import socket
+import time
+from typing import Any, Callable, Dict, Iterable, List, Optional
+
+import redis.asyncio as aioredis
+
+
+def process_name() -> str:
+    """統計を書き込むプロセスの識別名（ホスト名-PID）"""
+    return f"{socket.gethostname()}-{os.getpid()}"
+
+
+class ProcessStatsPublisher:
+    """プロセス内の統計（キャッシュ・VOICEVOX・レート制限など）を定期的にRedisへ書き込む
+
+    動画生成はワーカープロセス側で行うため、APIプロセスの統計だけでは実態がわからない。
+    各プロセスが stats:<名前> のハッシュに自分の最新値を書き込み、APIは read_process_stats() で
+    全プロセス分を読み出して集計する。停止したプロセスの値は max_age を過ぎると除外される。
+    """
+
+    def __init__(self, redis_client: aioredis.Redis, sources: Dict[str, Callable[[], Dict[str, Any]]], interval: float = 10):
+        self.redis = redis_client
+        self.sources = sources
+        self.interval = interval
+        self.process = process_name()
+        self._task: Optional[asyncio.Task] = None
+
+    def start(self) -> None:
+        if self._task is None and self.interval > 0:
+            self._task = asyncio.create_task(self._run())
+
+    async def close(self) -> None:
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
+        await self.publish()
+
+    async def publish(self) -> None:
+        """現在の値を書き込む（Redisに書き込めなくても処理は続ける）"""
+        updated_at = time.time()
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            for name, source in self.sources.items():
+                key = f"stats:{name}"
+                pipe.hset(key, self.process, json.dumps({"updated_at": updated_at, "stats": source()}, ensure_ascii=False))
+                pipe.expire(key, int(self.interval * 6) + 1)
+            await pipe.execute()
+        except aioredis.RedisError as e:
+            print(f"⚠️ 統計をRedisに書き込めません: {e}")
+
+    async def _run(self) -> None:
+        while True:
+            await self.publish()
+            await asyncio.sleep(self.interval)
+
+
+async def read_process_stats(redis_client: aioredis.Redis, name: str, max_age: float) -> Dict[str, Dict[str, Any]]:
+    """全プロセスの最新値（プロセス名 → 統計）。max_age 秒以上更新のないプロセスは削除して除外"""
+    entries = await redis_client.hgetall(f"stats:{name}")
+    now = time.time()
+    result, stale = {}, []
+    for process, data in entries.items():
+        process = process.decode() if isinstance(process, bytes) else process
+        snapshot = json.loads(data)
+        if now - snapshot["updated_at"] > max_age:
+            stale.append(process)
+        else:
+            result[process] = snapshot["stats"]
+    if stale:
+        await redis_client.hdel(f"stats:{name}", *stale)
+    return dict(sorted(result.items()))
+
+
+def sum_fields(snapshots: Iterable[Dict[str, Any]], fields: List[str]) -> Dict[str, float]:
+    """各プロセスの統計から指定した項目（件数・秒数などの累計値）を合計"""
+    totals = {field: 0 for field in fields}
+    for snapshot in snapshots:
+        for field in fields:
+            totals[field] += snapshot.get(field, 0)
+    return {field: round(value, 3) if isinstance(value, float) else value for field, value in totals.items()}
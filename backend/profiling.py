@@ -0,0 +1,129 @@
+import cProfile
+import io
+import marshal
+import pstats
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, List, Optional, Sequence
+
+# 計測中ジョブのプロファイラ（asyncio のタスクに引き継がれるので、並列の画像・音声生成からも記録できる）
+_current_profiler: ContextVar[Optional["JobProfiler"]] = ContextVar("job_profiler", default=None)
+
+# cProfile はスレッドごとに1つしか有効にできないため、CPUプロファイルを取得中のジョブを1つに限る
+_cpu_profiler_owner: Optional["JobProfiler"] = None
+
+
+class JobProfiler:
+    """1ジョブのプロファイル（CPUプロファイル・ステージ別の所要時間・子プロセスの実行記録）
+
+    CPUプロファイルはイベントループのスレッド全体が対象なので、同じワーカーで並行して
+    処理中の他ジョブも含まれる（スレッドで実行する描画処理は含まれない）。
+    複数ジョブを同時に計測する場合、CPUプロファイルは先に始めたジョブだけが取得する。
+    """
+
+    def __init__(self, generation_id: str, reason: str = "requested", top_n: int = 40, max_records: int = 2000):
+        self.generation_id = generation_id
+        self.reason = reason
+        self.top_n = top_n
+        self.max_records = max_records
+        self.spans: List[Dict[str, Any]] = []
+        self.processes: List[Dict[str, Any]] = []
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self._profile: Optional[cProfile.Profile] = None
+        self._started_at = time.perf_counter()
+
+    def _offset(self, seconds: float = 0.0) -> float:
+        """ジョブ開始からの経過秒数（seconds 前の時点）"""
+        return round(time.perf_counter() - self._started_at - seconds, 3)
+
+    def record_stage(self, stage: str, seconds: float, outcome: str) -> None:
+        if len(self.spans) < self.max_records:
+            self.spans.append({
+                "stage": stage, "start": self._offset(seconds), "seconds": round(seconds, 4), "outcome": outcome
+            })
+
+    def record_process(self, argv: Sequence[str], seconds: float, returncode: Optional[int]) -> None:
+        if len(self.processes) < self.max_records:
+            self.processes.append({
+                "argv": list(argv), "start": self._offset(seconds), "seconds": round(seconds, 3), "returncode": returncode
+            })
+
+    @contextmanager
+    def activate(self):
+        """with ブロックの間、このジョブの計測を行う"""
+        global _cpu_profiler_owner
+        token = _current_profiler.set(self)
+        self._started_at = time.perf_counter()
+        cpu_started = time.process_time()
+        if _cpu_profiler_owner is None:
+            profile = cProfile.Profile()
+            try:
+                profile.enable()
+            except ValueError:
+                # 他のプロファイラ（デバッガ等）が有効
+                profile = None
+            if profile is not None:
+                self._profile = profile
+                _cpu_profiler_owner = self
+        try:
+            yield self
+        finally:
+            if _cpu_profiler_owner is self:
+                self._profile.disable()
+                _cpu_profiler_owner = None
+            self.wall_seconds = round(time.perf_counter() - self._started_at, 3)
+            self.cpu_seconds = round(time.process_time() - cpu_started, 3)
+            _current_profiler.reset(token)
+
+    def stage_summary(self) -> Dict[str, Dict[str, float]]:
+        """ステージごとの回数・合計・最大（合計の大きい順）"""
+        summary: Dict[str, Dict[str, float]] = {}
+        for span in self.spans:
+            entry = summary.setdefault(span["stage"], {"count": 0, "errors": 0, "total_seconds": 0.0, "max_seconds": 0.0})
+            entry["count"] += 1
+            entry["errors"] += span["outcome"] != "success"
+            entry["total_seconds"] += span["seconds"]
+            entry["max_seconds"] = max(entry["max_seconds"], span["seconds"])
+        for entry in summary.values():
+            entry["total_seconds"] = round(entry["total_seconds"], 3)
+        return dict(sorted(summary.items(), key=lambda item: item[1]["total_seconds"], reverse=True))
+
+    def cpu_profile_text(self, sort: str = "tottime") -> Optional[str]:
+        """上位 top_n 関数の pstats 出力"""
+        if self._profile is None:
+            return None
+        output = io.StringIO()
+        pstats.Stats(self._profile, stream=output).strip_dirs().sort_stats(sort).print_stats(self.top_n)
+        return output.getvalue()
+
+    def cpu_profile_dump(self) -> Optional[bytes]:
+        """pstats 形式のバイナリ（snakeviz 等でそのまま開ける）"""
+        if self._profile is None:
+            return None
+        self._profile.create_stats()
+        return marshal.dumps(self._profile.stats)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "generation_id": self.generation_id,
+            "reason": self.reason,
+            "wall_seconds": self.wall_seconds,
+            "cpu_seconds": self.cpu_seconds,
+            "stages": self.stage_summary(),
+            "spans": self.spans,
+            "processes": self.processes,
+            "cpu_profile": self.cpu_profile_text(),
+        }
+
+
+def current_profiler() -> Optional[JobProfiler]:
+    return _current_profiler.get()
+
+
+def record_process(argv: Sequence[str], seconds: float, returncode: Optional[int]) -> None:
+    """実行中ジョブのプロファイルに子プロセスの実行を記録（計測していなければ何もしない）"""
+    profiler = _current_profiler.get()
+    if profiler is not None:
+        profiler.record_process(argv, seconds, returncode)
@@ -0,0 +1,165 @@
+import json
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import redis.asyncio as aioredis
+
+ProgressCallback = Callable[[Dict[str, Any]], Awaitable[None]]
+
+# ステージ: (全体に占める重み, 表示名)
+STAGES = {
+    "script": (10, "台本生成"),
+    "title_image": (2, "タイトル画面"),
+    "title_audio": (3, "タイトル音声"),
+    "image": (35, "画像生成"),
+    "audio": (15, "音声合成"),
+    "encode": (25, "エンコード"),
+    "concat": (10, "動画結合"),
+}
+
+# 実行中ジョブの進捗（asyncio のタスクに引き継がれるので、並列の画像・音声生成からも通知できる）
+_current_progress: ContextVar[Optional["JobProgress"]] = ContextVar("job_progress", default=None)
+
+
+def progress_key(generation_id: str) -> str:
+    """最新の進捗を保存するRedisキー"""
+    return f"progress:{generation_id}"
+
+
+def progress_channel(generation_id: str) -> str:
+    """進捗イベントを配信するRedis pub/subチャンネル"""
+    return f"progress:{generation_id}:events"
+
+
+def progress_timings_key(generation_id: str) -> str:
+    """ステージ・シーンごとの完了時刻（ジョブ開始からの秒数）を保存するRedisハッシュ"""
+    return f"progress:{generation_id}:timings"
+
+
+class JobProgress:
+    """1ジョブの進捗
+
+    ステージ（台本・タイトル・各シーンの画像/音声/エンコード・結合）ごとの完了数から
+    全体の進捗率を計算し、イベントとして callback に通知する。シーン数が決まるまでは
+    各ステージ1件として扱う。完了（100%）の通知は呼び出し側で行う。
+    """
+
+    def __init__(self, callback: ProgressCallback):
+        self.callback = callback
+        self.totals = {stage: 1 for stage in STAGES}
+        self.done = {stage: 0 for stage in STAGES}
+
+    def plan(self, scene_count: int, render_mode: str = "clips", styles: int = 1) -> None:
+        """台本のシーン数と組み立て方法から各ステージの件数を設定
+
+        styles はスタイル別に作成する動画の数（台本・音声は共通で、画像以降がスタイルごと）。
+        """
+        self.totals["title_image"] = styles
+        self.totals["image"] = scene_count * styles
+        self.totals["audio"] = scene_count
+        if render_mode == "single_pass":
+            # 1回のffmpegでエンコードと結合を行う
+            self.totals["encode"] = styles
+            self.totals["concat"] = 0
+        else:
+            self.totals["encode"] = (scene_count + 1) * styles  # タイトル＋各シーン
+            self.totals["concat"] = styles
+
+    @property
+    def percent(self) -> int:
+        weights = total_weight = 0.0
+        for stage, (weight, _) in STAGES.items():
+            total = self.totals[stage]
+            if total <= 0:
+                continue
+            weights += weight * min(self.done[stage], total) / total
+            total_weight += weight
+        # 100% は完成した動画を保存してから通知する
+        return min(99, int(weights / total_weight * 100)) if total_weight else 0
+
+    async def report(self, stage: str, scene: Optional[int] = None, started: bool = False) -> None:
+        label = STAGES[stage][1]
+        if started:
+            current_step = f"{label}中..."
+        else:
+            self.done[stage] += 1
+            current_step = f"{label}（{min(self.done[stage], self.totals[stage])}/{self.totals[stage]}）"
+        event = {
+            "status": "processing",
+            "progress": self.percent,
+            "current_step": current_step,
+            "stage": stage,
+            "stage_status": "started" if started else "completed",
+            "scene": scene,
+        }
+        try:
+            await self.callback(event)
+        except Exception as e:
+            # 進捗通知の失敗で動画生成を止めない
+            print(f"⚠️ 進捗の通知に失敗: {e}")
+
+    @contextmanager
+    def activate(self):
+        """このジョブの処理中、report_progress() の通知先にする"""
+        token = _current_progress.set(self)
+        try:
+            yield self
+        finally:
+            _current_progress.reset(token)
+
+
+def current_progress() -> Optional[JobProgress]:
+    return _current_progress.get()
+
+
+async def report_progress(stage: str, scene: Optional[int] = None, started: bool = False) -> None:
+    """実行中ジョブの進捗を通知（進捗を追跡していなければ何もしない）"""
+    progress = _current_progress.get()
+    if progress is not None:
+        await progress.report(stage, scene, started)
+
+
+class RedisProgressPublisher:
+    """進捗イベントをRedisに保存（最新の状態）し、pub/subで配信する
+
+    最新の状態（ステータス・進捗率・経過秒数）の保存、イベントの配信、ステージ完了時刻の記録を
+    1往復のパイプラインで行う。APIの /api/video/events が配信を購読してクライアントへ転送し、
+    /api/video/status は保存された最新の状態を返す。
+    """
+
+    def __init__(self, redis_client: aioredis.Redis, generation_id: str, ttl: int = 300):
+        self.redis = redis_client
+        self.generation_id = generation_id
+        self.ttl = ttl
+        self.started_at = time.monotonic()
+
+    async def __call__(self, event: Dict[str, Any]) -> None:
+        elapsed = round(time.monotonic() - self.started_at, 3)
+        data = json.dumps(
+            {"generation_id": self.generation_id, **event, "elapsed_seconds": elapsed},
+            ensure_ascii=False
+        )
+        try:
+            pipe = self.redis.pipeline(transaction=False)
+            pipe.setex(progress_key(self.generation_id), self.ttl, data)
+            pipe.publish(progress_channel(self.generation_id), data)
+            timing_field = self._timing_field(event)
+            if timing_field:
+                timings_key = progress_timings_key(self.generation_id)
+                pipe.hset(timings_key, timing_field, elapsed)
+                pipe.expire(timings_key, self.ttl)
+            await pipe.execute()
+        except aioredis.RedisError as e:
+            print(f"⚠️ 進捗をRedisに書き込めません: {e}")
+
+    @staticmethod
+    def _timing_field(event: Dict[str, Any]) -> Optional[str]:
+        """完了イベントなら記録するフィールド名（image:2 のようにシーン番号付き）"""
+        if event.get("status") in ("completed", "failed"):
+            return "total"
+        if event.get("stage_status") != "completed":
+            return None
+        scene = event.get("scene")
+        return event["stage"] if scene is None else f"{event['stage']}:{scene}"
@@ -0,0 +1,261 @@
+import asyncio
+import random
+import time
+from contextlib import asynccontextmanager
+from email.utils import parsedate_to_datetime
+from typing import Dict, Mapping, Optional
+
+import redis.asyncio as aioredis
+
+# トークンを補充してから1つ取り出す。取り出せなければ次のトークンまでの待ち時間（ミリ秒）を返す
+_ACQUIRE_SCRIPT = """
+local now = redis.call("time")
+local now_ms = tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000)
+local rate_per_ms = tonumber(ARGV[1]) / 60000
+local capacity = tonumber(ARGV[2])
+local state = redis.call("hmget", KEYS[1], "tokens", "updated_at", "paused_until")
+local paused_until = tonumber(state[3]) or 0
+if now_ms < paused_until then
+    return paused_until - now_ms
+end
+local tokens = tonumber(state[1]) or capacity
+local updated_at = tonumber(state[2]) or now_ms
+tokens = math.min(capacity, tokens + math.max(0, now_ms - updated_at) * rate_per_ms)
+local wait_ms = 0
+if tokens >= 1 then
+    tokens = tokens - 1
+else
+    wait_ms = math.ceil((1 - tokens) / rate_per_ms)
+end
+redis.call("hset", KEYS[1], "tokens", tostring(tokens), "updated_at", now_ms)
+redis.call("pexpire", KEYS[1], math.ceil(capacity / rate_per_ms) + 60000)
+return wait_ms
+"""
+
+# 全プロセスの送信を一定時間止める（既により長く止めていれば延長しない）
+_PAUSE_SCRIPT = """
+local now = redis.call("time")
+local now_ms = tonumber(now[1]) * 1000 + math.floor(tonumber(now[2]) / 1000)
+local paused_until = now_ms + tonumber(ARGV[1])
+if paused_until > (tonumber(redis.call("hget", KEYS[1], "paused_until")) or 0) then
+    redis.call("hset", KEYS[1], "paused_until", paused_until)
+end
+if redis.call("pttl", KEYS[1]) < tonumber(ARGV[1]) + 60000 then
+    redis.call("pexpire", KEYS[1], tonumber(ARGV[1]) + 60000)
+end
+return 1
+"""
+
+
+class TokenBucket:
+    """1分あたりのリクエスト数上限に合わせて送信間隔を調整するトークンバケット"""
+
+    def __init__(self, rate_per_minute: float, burst: Optional[float] = None):
+        self.rate_per_minute = rate_per_minute
+        self.capacity = burst if burst is not None else max(1.0, rate_per_minute / 6)
+        self._tokens = self.capacity
+        self._updated_at = time.monotonic()
+        self._paused_until = 0.0
+        self._lock = asyncio.Lock()
+
+    def set_rate(self, rate_per_minute: float) -> None:
+        """APIが返す上限値に合わせてレートを更新"""
+        if rate_per_minute > 0 and rate_per_minute != self.rate_per_minute:
+            self._refill()
+            self.rate_per_minute = rate_per_minute
+            self.capacity = max(1.0, rate_per_minute / 6)
+            self._tokens = min(self._tokens, self.capacity)
+
+    async def pause(self, seconds: float) -> None:
+        """Retry-After 等を受けて、全呼び出しを一定時間止める"""
+        self._paused_until = max(self._paused_until, time.monotonic() + seconds)
+
+    def _refill(self) -> None:
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated_at) * self.rate_per_minute / 60)
+        self._updated_at = now
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                if now < self._paused_until:
+                    await asyncio.sleep(self._paused_until - now)
+                    continue
+                self._refill()
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) * 60 / self.rate_per_minute)
+
+
+class RedisTokenBucket(TokenBucket):
+    """APIプロセス・全ワーカーで共有するトークンバケット（状態をRedisのハッシュに置く）
+
+    OPENAI_*_RPM やAPIが返す上限はアカウント全体の値なので、プロセスごとに数えると
+    プロセス数倍の送信になる。トークンの残量と停止期限はLuaスクリプトで原子的に更新する。
+    Redisに接続できない間は、このプロセス内のバケットで代用する。
+    """
+
+    def __init__(self, redis_client: aioredis.Redis, key: str, rate_per_minute: float, burst: Optional[float] = None):
+        super().__init__(rate_per_minute, burst)
+        self.key = key
+        self._acquire_script = redis_client.register_script(_ACQUIRE_SCRIPT)
+        self._pause_script = redis_client.register_script(_PAUSE_SCRIPT)
+
+    async def pause(self, seconds: float) -> None:
+        await super().pause(seconds)
+        try:
+            await self._pause_script(keys=[self.key], args=[int(seconds * 1000)])
+        except aioredis.RedisError as e:
+            print(f"⚠️ レート制限の停止をRedisに書き込めません: {self.key} ({e})")
+
+    async def acquire(self) -> None:
+        async with self._lock:
+            while True:
+                try:
+                    wait_ms = await self._acquire_script(keys=[self.key], args=[self.rate_per_minute, self.capacity])
+                except aioredis.RedisError as e:
+                    print(f"⚠️ 共有レート制限を使えないため、プロセス内で制限します: {self.key} ({e})")
+                    break
+                if wait_ms <= 0:
+                    return
+                await asyncio.sleep(wait_ms / 1000)
+        await super().acquire()
+
+
+class AIMDWindow:
+    """加算増加・乗算減少（AIMD）で同時実行数を調整するウィンドウ"""
+
+    def __init__(self, initial: int = 4, minimum: int = 1, maximum: int = 32):
+        self.minimum = minimum
+        self.maximum = maximum
+        self.size = float(max(minimum, min(initial, maximum)))
+        self.in_flight = 0
+        self._condition = asyncio.Condition()
+
+    @asynccontextmanager
+    async def slot(self):
+        async with self._condition:
+            await self._condition.wait_for(lambda: self.in_flight < int(self.size))
+            self.in_flight += 1
+        try:
+            yield
+        finally:
+            async with self._condition:
+                self.in_flight -= 1
+                self._condition.notify_all()
+
+    async def on_success(self) -> None:
+        """成功するたびに 1/size ずつ広げる（ウィンドウ1周で+1）"""
+        async with self._condition:
+            self.size = min(self.maximum, self.size + 1 / self.size)
+            self._condition.notify_all()
+
+    async def on_throttle(self) -> None:
+        """レート制限を受けたら半分に縮める"""
+        async with self._condition:
+            self.size = max(self.minimum, self.size / 2)
+
+
+class AdaptiveRateLimiter:
+    """トークンバケット＋AIMDウィンドウ＋ジッター付き指数バックオフ
+
+    OpenAIの画像生成・チャットなど、エンドポイントごとに1つ作成して全ジョブで共有する。
+    redis_client を渡すとトークンバケット（レート）を全プロセスで共有する。同時実行数の
+    ウィンドウはプロセスごとで、429を受けたプロセスがそれぞれ縮める。
+    """
+
+    RETRYABLE_STATUSES = {408, 409, 429, 500, 502, 503, 504}
+
+    def __init__(
+        self,
+        name: str,
+        rate_per_minute: float,
+        initial_concurrency: int = 4,
+        max_concurrency: int = 32,
+        max_retries: int = 4,
+        base_delay: float = 1.0,
+        max_delay: float = 60.0,
+        redis_client: Optional[aioredis.Redis] = None
+    ):
+        self.name = name
+        self.bucket = (
+            RedisTokenBucket(redis_client, f"ratelimit:{name}", rate_per_minute)
+            if redis_client is not None else TokenBucket(rate_per_minute)
+        )
+        self.window = AIMDWindow(initial_concurrency, 1, max_concurrency)
+        self.max_retries = max_retries
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.requests = 0
+        self.throttled = 0
+        self.retries = 0
+
+    @asynccontextmanager
+    async def slot(self):
+        """レートとウィンドウの両方に空きができるまで待ってから実行"""
+        async with self.window.slot():
+            await self.bucket.acquire()
+            self.requests += 1
+            yield
+
+    @staticmethod
+    def parse_retry_after(headers: Mapping[str, str]) -> Optional[float]:
+        """Retry-After（秒またはHTTP日付）/ retry-after-ms を秒で返す"""
+        retry_after_ms = headers.get("retry-after-ms")
+        if retry_after_ms:
+            try:
+                return float(retry_after_ms) / 1000
+            except ValueError:
+                pass
+        retry_after = headers.get("Retry-After")
+        if not retry_after:
+            return None
+        try:
+            return max(0.0, float(retry_after))
+        except ValueError:
+            try:
+                return max(0.0, parsedate_to_datetime(retry_after).timestamp() - time.time())
+            except (TypeError, ValueError):
+                return None
+
+    def observe_limits(self, headers: Mapping[str, str]) -> None:
+        """x-ratelimit-limit-requests からアカウントの上限を反映"""
+        limit = headers.get("x-ratelimit-limit-requests")
+        if limit:
+            try:
+                self.bucket.set_rate(float(limit))
+            except ValueError:
+                pass
+
+    def backoff_delay(self, attempt: int) -> float:
+        """フルジッター付き指数バックオフ"""
+        return random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+
+    async def on_success(self, headers: Mapping[str, str]) -> None:
+        self.observe_limits(headers)
+        await self.window.on_success()
+
+    async def on_retryable_failure(self, status: Optional[int], headers: Mapping[str, str], attempt: int) -> float:
+        """リトライ前の待ち時間を返す（429 ならウィンドウを縮め、Retry-After の間は全体を止める）"""
+        self.retries += 1
+        delay = self.backoff_delay(attempt)
+        if status == 429:
+            self.throttled += 1
+            await self.window.on_throttle()
+            retry_after = self.parse_retry_after(headers)
+            if retry_after is not None:
+                await self.bucket.pause(retry_after)
+                delay = retry_after + random.uniform(0, self.base_delay)
+        return delay
+
+    def stats(self) -> Dict[str, float]:
+        return {
+            "rate_per_minute": self.bucket.rate_per_minute,
+            "concurrency_window": round(self.window.size, 2),
+            "in_flight": self.window.in_flight,
+            "requests": self.requests,
+            "throttled": self.throttled,
+            "retries": self.retries,
+        }
@@ -0,0 +1,156 @@
+import asyncio
+import copy
+import json
+import time
+import uuid
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+import redis.asyncio as aioredis
+
+# ロック所有者のみがロックを解放する
+_RELEASE_LOCK_SCRIPT = """
+if redis.call("get", KEYS[1]) == ARGV[1] then
+    return redis.call("del", KEYS[1])
+end
+return 0
+"""
+
+
+class SingleFlight:
+    """同一キーの同時リクエストを1回の上流呼び出しにまとめる
+
+    プロセス内では実行中のFutureを共有し、Redisを渡した場合は短いTTLの結果キャッシュと
+    ロックで複数のAPIワーカー間でも1回の呼び出しにまとめる。
+    結果はJSONにシリアライズできる値であること。
+    """
+
+    def __init__(
+        self,
+        redis_client: Optional[aioredis.Redis] = None,
+        namespace: str = "singleflight",
+        result_ttl: int = 60,
+        lock_ttl: int = 120,
+        poll_interval: float = 0.2
+    ):
+        self.redis = redis_client
+        self.namespace = namespace
+        self.result_ttl = result_ttl
+        self.lock_ttl = lock_ttl
+        self.poll_interval = poll_interval
+        self._inflight: Dict[str, asyncio.Future] = {}
+        self.executed = 0
+        self.coalesced = 0
+        self.cache_hits = 0
+
+    async def do(
+        self,
+        key: str,
+        fn: Callable[[], Awaitable[Any]],
+        should_cache: Callable[[Any], bool] = lambda result: True,
+        use_cache: bool = True
+    ) -> Any:
+        """key が同じ呼び出しが実行中ならその結果を待ち、なければ fn を実行
+
+        use_cache=False（明示的な作り直し）はキャッシュ済みの結果を使わず、同じく作り直し中の
+        呼び出しとだけまとめる。新しい結果はキャッシュに保存する。
+
+        実行していた呼び出し元がキャンセルされた場合、待っていた側は自分で実行し直す
+        （待っていた側まで CancelledError にはしない）。
+        """
+        inflight_key = key if use_cache else f"{key}:fresh"
+        inflight = self._inflight.get(inflight_key)
+        if inflight is not None:
+            self.coalesced += 1
+            # 自分がキャンセルされた場合だけ CancelledError になり、共有中の呼び出しは止めない
+            await asyncio.wait([inflight])
+            if inflight.cancelled():
+                return await self.do(key, fn, should_cache, use_cache)
+            return copy.deepcopy(inflight.result())
+
+        future = asyncio.get_running_loop().create_future()
+        self._inflight[inflight_key] = future
+        try:
+            result = await self._do_shared(key, fn, should_cache, use_cache)
+        except asyncio.CancelledError:
+            future.cancel()
+            raise
+        except Exception as e:
+            future.set_exception(e)
+            future.exception()  # 待機者がいない場合の警告を抑止
+            raise
+        else:
+            future.set_result(result)
+            return result
+        finally:
+            self._inflight.pop(inflight_key, None)
+
+    async def _do_shared(self, key: str, fn, should_cache, use_cache: bool = True) -> Any:
+        """Redis上の結果キャッシュとロックで他プロセスと実行をまとめる"""
+        if self.redis is None:
+            self.executed += 1
+            return await fn()
+
+        result_key = f"{self.namespace}:result:{key}"
+        if not use_cache:
+            self.executed += 1
+            result = await fn()
+            if should_cache(result):
+                await self._store(result_key, result)
+            return result
+
+        lock_key = f"{self.namespace}:lock:{key}"
+        try:
+            cached = await self.redis.get(result_key)
+            if cached is not None:
+                self.cache_hits += 1
+                return json.loads(cached)
+            token = uuid.uuid4().hex
+            acquired = await self.redis.set(lock_key, token, nx=True, ex=self.lock_ttl)
+        except aioredis.RedisError as e:
+            print(f"⚠️ single-flight用Redisに接続できません: {e}")
+            self.executed += 1
+            return await fn()
+
+        if acquired:
+            try:
+                self.executed += 1
+                result = await fn()
+                if should_cache(result):
+                    await self._store(result_key, result)
+                return result
+            finally:
+                try:
+                    await self.redis.eval(_RELEASE_LOCK_SCRIPT, 1, lock_key, token)
+                except aioredis.RedisError:
+                    pass
+
+        # 他プロセスが実行中：結果が書き込まれるか、ロックが消えるまで待つ
+        deadline = time.monotonic() + self.lock_ttl
+        try:
+            while time.monotonic() < deadline:
+                await asyncio.sleep(self.poll_interval)
+                cached = await self.redis.get(result_key)
+                if cached is not None:
+                    self.coalesced += 1
+                    return json.loads(cached)
+                if not await self.redis.exists(lock_key):
+                    break  # 実行側が失敗した（またはキャッシュ対象外の結果だった）
+        except aioredis.RedisError:
+            pass
+
+        self.executed += 1
+        return await fn()
+
+    async def _store(self, result_key: str, result: Any) -> None:
+        try:
+            await self.redis.set(result_key, json.dumps(result, ensure_ascii=False), ex=self.result_ttl)
+        except (aioredis.RedisError, TypeError, ValueError) as e:
+            print(f"⚠️ single-flight結果の保存に失敗: {e}")
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "cache_hits": self.cache_hits,
+            "in_flight": len(self._inflight),
+        }
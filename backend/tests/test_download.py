@@ -0,0 +1,91 @@
+"""動画ダウンロードAPIの HEAD / Range 応答（fakeredis・SQLiteで実行）
+
+    pip install pytest fakeredis lupa httpx aiosqlite
+    python -m pytest backend/tests
+"""
+import asyncio
+import os
+import sys
+from pathlib import Path
+
+import pytest
+
+fakeredis = pytest.importorskip("fakeredis")
+fakeredis_aioredis = pytest.importorskip("fakeredis.aioredis")
+pytest.importorskip("lupa")  # main が登録するLuaスクリプト用
+httpx = pytest.importorskip("httpx")
+pytest.importorskip("aiosqlite")
+
+BACKEND_DIR = Path(__file__).resolve().parents[1]
+sys.path.insert(0, str(BACKEND_DIR))
+
+
+@pytest.fixture(scope="module")
+def main(tmp_path_factory):
+    """Redis を fakeredis に差し替えて main を読み込む（Luaスクリプトは読み込み時にクライアントへ登録される）"""
+    import redis.asyncio as aioredis
+
+    workdir = tmp_path_factory.mktemp("download")
+    cwd = os.getcwd()
+    os.chdir(workdir)
+    os.environ.setdefault("OPENAI_API_KEY", "sk-test")
+    os.environ["DATABASE_URL"] = f"sqlite:///{workdir / 'test.db'}"
+    server = fakeredis.FakeServer()
+    pool = staticmethod(lambda *args, **kwargs: fakeredis_aioredis.FakeRedis(server=server).connection_pool)
+    originals = aioredis.BlockingConnectionPool.from_url, aioredis.ConnectionPool.from_url
+    aioredis.BlockingConnectionPool.from_url = aioredis.ConnectionPool.from_url = pool
+    try:
+        import main
+        asyncio.run(main.init_db())
+        yield main
+    finally:
+        aioredis.BlockingConnectionPool.from_url, aioredis.ConnectionPool.from_url = originals
+        os.chdir(cwd)
+
+
+def request(main, method: str, generation_id: str, headers=None) -> "httpx.Response":
+    async def send():
+        transport = httpx.ASGITransport(app=main.app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://test") as client:
+            return await client.request(method, f"/api/video/download/{generation_id}", headers=headers)
+
+    return asyncio.run(send())
+
+
+def add_video(main, generation_id: str, data: bytes) -> None:
+    video_path = Path(f"{generation_id}.mp4").resolve()
+    video_path.write_bytes(data)
+
+    async def insert():
+        async with main.SessionLocal() as db:
+            db.add(main.VideoGeneration(
+                id=generation_id, user_id="test", topic="猫 の話", style="anime",
+                status="completed", video_url=str(video_path)
+            ))
+            await db.commit()
+
+    asyncio.run(insert())
+
+
+def test_head_returns_headers_without_body(main):
+    add_video(main, "head", b"0123456789")
+    get = request(main, "GET", "head")
+    head = request(main, "HEAD", "head")
+    assert head.status_code == 200
+    assert head.content == b""
+    for header in ("content-length", "etag", "accept-ranges", "content-type", "content-disposition"):
+        assert head.headers[header] == get.headers[header]
+    assert head.headers["content-length"] == "10"
+
+
+def test_head_with_range(main):
+    add_video(main, "range", b"0123456789")
+    head = request(main, "HEAD", "range", headers={"Range": "bytes=2-5"})
+    assert head.status_code == 206
+    assert head.content == b""
+    assert head.headers["content-range"] == "bytes 2-5/10"
+    assert head.headers["content-length"] == "4"
+
+
+def test_head_for_unknown_generation_is_404(main):
+    assert request(main, "HEAD", "missing").status_code == 404
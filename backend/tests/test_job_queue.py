@@ -0,0 +1,54 @@
+"""ジョブキューの試行回数の数え方（fakeredis で実行）
+
+    pip install pytest fakeredis lupa
+    python -m pytest backend/tests
+"""
+import asyncio
+import sys
+from pathlib import Path
+
+import pytest
+
+fakeredis_aioredis = pytest.importorskip("fakeredis.aioredis")
+pytest.importorskip("lupa")  # 遅延キューのLuaスクリプト用
+
+sys.path.insert(0, str(Path(__file__).resolve().parents[1]))
+from job_queue import RedisJobQueue  # noqa: E402
+
+
+def make_queue(max_attempts: int = 3) -> RedisJobQueue:
+    return RedisJobQueue(
+        fakeredis_aioredis.FakeRedis(), name="test", visibility_timeout=0,
+        max_attempts=max_attempts, retry_base_delay=0, retry_max_delay=0
+    )
+
+
+def test_crash_on_first_attempt_is_counted_on_reclaim():
+    async def scenario():
+        queue = make_queue(max_attempts=2)
+        await queue.enqueue({"n": 1})
+        job = await queue.reserve("worker-1", block_ms=None)
+        assert job.attempts == 1
+        # worker-1 が停止（ACKしない）→ 別ワーカーが再取得
+        job = await queue.reserve("worker-2", block_ms=None)
+        assert job.attempts == 2 and job.gave_up is None
+        job = await queue.reserve("worker-3", block_ms=None)
+        assert job.attempts == 3 and job.gave_up == "visibility timeout exceeded"
+
+    asyncio.run(scenario())
+
+
+def test_retry_then_crash_on_reclaim_counts_both_attempts():
+    async def scenario():
+        queue = make_queue(max_attempts=2)
+        await queue.enqueue({"n": 1})
+        job = await queue.reserve("worker-1", block_ms=None)
+        assert await queue.retry(job, "boom")
+        # 再投入したジョブ（試行2回目）を取り出した後にワーカーが停止
+        job = await queue.reserve("worker-1", block_ms=None)
+        assert job.attempts == 2
+        job = await queue.reserve("worker-2", block_ms=None)
+        assert job.attempts == 3
+        assert job.gave_up == "visibility timeout exceeded"
+
+    asyncio.run(scenario())
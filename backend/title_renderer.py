@@ -0,0 +1,202 @@
+import threading
+from functools import lru_cache
+from pathlib import Path
+from typing import Dict, Tuple, Union
+
+try:
+    from PIL import Image, ImageDraw, ImageFont
+except ImportError:  # PIL未インストール時は呼び出し側でテキストファイルにフォールバック
+    Image = ImageDraw = ImageFont = None
+
+WIDTH, HEIGHT = 1080, 1920
+
+# タイトル画面のスタイル別デザイン設定
+TITLE_DESIGNS = {
+    "ghibli": {
+        "bg_color": "#2E4F3D",
+        "text_color": "#F0F8F0",
+        "accent_color": "#7FB069",
+        "gradient": True
+    },
+    "anime": {
+        "bg_color": "#1A1A2E",
+        "text_color": "#FFFFFF",
+        "accent_color": "#FF6B9D",
+        "gradient": True
+    },
+    "realistic": {
+        "bg_color": "#000000",
+        "text_color": "#FFFFFF",
+        "accent_color": "#4A90A4",
+        "gradient": False
+    },
+    "watercolor": {
+        "bg_color": "#2C3E50",
+        "text_color": "#ECF0F1",
+        "accent_color": "#3498DB",
+        "gradient": True
+    }
+}
+
+# ダミー画像のスタイル別カラーパレット
+DUMMY_COLOR_SCHEMES = {
+    "ghibli": {"bg": "#E8F4FD", "text": "#2E4F3D", "accent": "#7FB069"},
+    "anime": {"bg": "#FFF0F8", "text": "#2D3748", "accent": "#FF6B9D"},
+    "realistic": {"bg": "#F7FAFC", "text": "#1A202C", "accent": "#4A5568"},
+    "watercolor": {"bg": "#F0F8F8", "text": "#2C5F5F", "accent": "#4A90A4"}
+}
+DEFAULT_DUMMY_COLORS = {"bg": "#F5F5F5", "text": "#333333", "accent": "#666666"}
+
+# 日本語フォント→英語フォント→デフォルトの順に試す
+TITLE_FONT_CANDIDATES = ("msgothic.ttc", "arial.ttf")
+DUMMY_FONT_CANDIDATES = ("msgothic.ttc",)
+
+
+def _require_pil() -> None:
+    if Image is None:
+        raise ImportError("Pillow is not installed")
+
+
+@lru_cache(maxsize=None)
+def load_font(candidates: Tuple[str, ...], size: int):
+    """フォントを読み込む（見つからなければデフォルト）。結果はプロセス内でキャッシュ"""
+    _require_pil()
+    for name in candidates:
+        try:
+            return ImageFont.truetype(name, size)
+        except OSError:
+            continue
+    return ImageFont.load_default()
+
+
+def _hex_to_rgb(color: str) -> Tuple[int, int, int]:
+    return int(color[1:3], 16), int(color[3:5], 16), int(color[5:7], 16)
+
+
+def _vertical_gradient(bg_color: str) -> "Image.Image":
+    """上から下に向かって少し明るくなるグラデーション
+
+    1列分の色をまとめて計算して1x1920の画像を作り、横方向に引き伸ばす（行ごとの描画はしない）。
+    """
+    base = _hex_to_rgb(bg_color)
+    column = bytes(
+        min(255, int(channel * (1 + (y / HEIGHT) * 0.2)))
+        for y in range(HEIGHT)
+        for channel in base
+    )
+    return Image.frombytes("RGB", (1, HEIGHT), column).resize((WIDTH, HEIGHT), Image.NEAREST)
+
+
+def _draw_centered(draw, y: int, text: str, font, fill: str) -> None:
+    bbox = draw.textbbox((0, 0), text, font=font)
+    x = (WIDTH - (bbox[2] - bbox[0])) // 2
+    draw.text((x, y), text, fill=fill, font=font)
+
+
+class TitleCardRenderer:
+    """タイトル画面・ダミー画像のレンダラー
+
+    背景（グラデーション）と静的な装飾・スタイル表示はスタイルごとに1回だけ作成してキャッシュし、
+    ジョブごとにはタイトル等のテキストだけを合成する。スレッドから呼び出してよい。
+    """
+
+    def __init__(self):
+        self._title_layers: Dict[Tuple[str, str], "Image.Image"] = {}
+        self._dummy_layers: Dict[Tuple[str, str], "Image.Image"] = {}
+        self._lock = threading.Lock()
+
+    def _title_layer(self, style_name: str, style_display_name: str) -> "Image.Image":
+        key = (style_name, style_display_name)
+        with self._lock:
+            layer = self._title_layers.get(key)
+            if layer is None:
+                layer = self._build_title_layer(style_name, style_display_name)
+                self._title_layers[key] = layer
+            return layer
+
+    def _build_title_layer(self, style_name: str, style_display_name: str) -> "Image.Image":
+        design = TITLE_DESIGNS.get(style_name, TITLE_DESIGNS["realistic"])
+        accent = design["accent_color"]
+
+        # 1080x1920の縦型画像を作成
+        if design["gradient"]:
+            img = _vertical_gradient(design["bg_color"])
+        else:
+            img = Image.new('RGB', (WIDTH, HEIGHT), color=design["bg_color"])
+        draw = ImageDraw.Draw(img)
+
+        # アクセントライン
+        accent_y = 800
+        draw.rectangle([(200, accent_y), (880, accent_y + 8)], fill=accent)
+
+        # スタイル表示
+        subtitle_font = load_font(TITLE_FONT_CANDIDATES, 48)
+        _draw_centered(draw, 1200, f"Style: {style_display_name}", subtitle_font, accent)
+
+        # 上部・下部の装飾線
+        draw.rectangle([(340, 600), (740, 608)], fill=accent)
+        draw.rectangle([(340, 1400), (740, 1408)], fill=accent)
+
+        # 角の装飾
+        corner_size = 50
+        # 左上
+        draw.rectangle([(100, 100), (100 + corner_size, 108)], fill=accent)
+        draw.rectangle([(100, 100), (108, 100 + corner_size)], fill=accent)
+        # 右上
+        draw.rectangle([(980 - corner_size, 100), (980, 108)], fill=accent)
+        draw.rectangle([(972, 100), (980, 100 + corner_size)], fill=accent)
+        # 左下
+        draw.rectangle([(100, 1812), (100 + corner_size, 1820)], fill=accent)
+        draw.rectangle([(100, 1820 - corner_size), (108, 1820)], fill=accent)
+        # 右下
+        draw.rectangle([(980 - corner_size, 1812), (980, 1820)], fill=accent)
+        draw.rectangle([(972, 1820 - corner_size), (980, 1820)], fill=accent)
+        return img
+
+    def render_title(self, title: str, style_name: str, style_display_name: str, path: Union[str, Path]) -> None:
+        """タイトル画面を描画して保存"""
+        _require_pil()
+        design = TITLE_DESIGNS.get(style_name, TITLE_DESIGNS["realistic"])
+        img = self._title_layer(style_name, style_display_name).copy()
+        draw = ImageDraw.Draw(img)
+        title_font = load_font(TITLE_FONT_CANDIDATES, 72)
+        text_color = design["text_color"]
+
+        title_bbox = draw.textbbox((0, 0), title, font=title_font)
+        title_width = title_bbox[2] - title_bbox[0]
+
+        # 長いタイトルの場合は改行（単語が1つならそのまま）
+        words = title.split()
+        if title_width > 900 and len(words) > 1:
+            mid = len(words) // 2
+            _draw_centered(draw, 900, " ".join(words[:mid]), title_font, text_color)
+            _draw_centered(draw, 1000, " ".join(words[mid:]), title_font, text_color)
+        else:
+            _draw_centered(draw, 950, title, title_font, text_color)
+
+        img.save(path)
+
+    def _dummy_layer(self, style_name: str, style_display_name: str) -> "Image.Image":
+        key = (style_name, style_display_name)
+        with self._lock:
+            layer = self._dummy_layers.get(key)
+            if layer is None:
+                colors = DUMMY_COLOR_SCHEMES.get(style_name, DEFAULT_DUMMY_COLORS)
+                layer = Image.new('RGB', (WIDTH, HEIGHT), color=colors["bg"])
+                draw = ImageDraw.Draw(layer)
+                _draw_centered(draw, 300, f"【{style_display_name}】", load_font(DUMMY_FONT_CANDIDATES, 64), colors["accent"])
+                self._dummy_layers[key] = layer
+            return layer
+
+    def render_dummy(self, scene_num: int, concept: str, style_name: str, style_display_name: str, path: Union[str, Path]) -> None:
+        """ダミー画像（シーン番号とコンセプト）を描画して保存"""
+        _require_pil()
+        colors = DUMMY_COLOR_SCHEMES.get(style_name, DEFAULT_DUMMY_COLORS)
+        img = self._dummy_layer(style_name, style_display_name).copy()
+        draw = ImageDraw.Draw(img)
+
+        concept_text = concept[:100] + "..." if len(concept) > 100 else concept
+        _draw_centered(draw, 500, f"シーン {scene_num + 1}", load_font(DUMMY_FONT_CANDIDATES, 48), colors["text"])
+        _draw_centered(draw, 700, concept_text, load_font(DUMMY_FONT_CANDIDATES, 36), colors["text"])
+
+        img.save(path)
@@ -0,0 +1,230 @@
+import asyncio
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Awaitable, Callable, Dict, List, Optional, Sequence
+
+import aiohttp
+
+from metrics import stage_timer
+
+
+class VoicevoxError(Exception):
+    """VOICEVOXエンジンの呼び出し失敗"""
+
+    def __init__(self, message: str, retryable: bool = False):
+        super().__init__(message)
+        self.retryable = retryable
+
+
+class VoicevoxEngine:
+    """1台のVOICEVOXエンジンの状態（処理中リクエスト数・稼働状況・レイテンシ）"""
+
+    def __init__(self, url: str, latency_window: int = 200):
+        self.url = url.rstrip("/")
+        self.outstanding = 0
+        self.healthy = True
+        self.ejected_until = 0.0
+        self.consecutive_failures = 0
+        self.requests = 0
+        self.failures = 0
+        self.ejections = 0
+        self._latencies = deque(maxlen=latency_window)
+
+    @property
+    def available(self) -> bool:
+        return self.healthy and time.monotonic() >= self.ejected_until
+
+    def record_success(self, seconds: float) -> None:
+        self.consecutive_failures = 0
+        self._latencies.append(seconds)
+
+    def record_failure(self, failure_threshold: int, eject_seconds: float) -> None:
+        """連続失敗が閾値に達したら一定時間振り分け対象から外す"""
+        self.failures += 1
+        self.consecutive_failures += 1
+        if self.consecutive_failures >= failure_threshold and self.available:
+            self.ejected_until = time.monotonic() + eject_seconds
+            self.ejections += 1
+            print(f"⚠️ VOICEVOXエンジンを一時的に除外: {self.url}（{eject_seconds:.0f}秒）")
+
+    def _percentile(self, ratio: float) -> float:
+        latencies = sorted(self._latencies)
+        if not latencies:
+            return 0.0
+        return latencies[min(len(latencies) - 1, int(len(latencies) * ratio))]
+
+    def stats(self) -> Dict[str, object]:
+        latencies = self._latencies
+        return {
+            "url": self.url,
+            "available": self.available,
+            "healthy": self.healthy,
+            "outstanding": self.outstanding,
+            "requests": self.requests,
+            "failures": self.failures,
+            "ejections": self.ejections,
+            "latency_avg_ms": round(sum(latencies) / len(latencies) * 1000, 1) if latencies else 0.0,
+            "latency_p50_ms": round(self._percentile(0.5) * 1000, 1),
+            "latency_p95_ms": round(self._percentile(0.95) * 1000, 1),
+        }
+
+
+class VoicevoxPool:
+    """複数のVOICEVOXエンジンへの負荷分散
+
+    処理中リクエスト数が最も少ないエンジンに振り分け（同数なら直近の平均レイテンシが小さい方）、
+    通信エラー・5xxが続いたエンジンは eject_seconds の間除外する。start() で起動する
+    ヘルスチェックが /version を定期的に確認し、応答しないエンジンを外し、復帰したら戻す。
+    全エンジンが除外されている場合も、止めるよりはましなので全エンジンを対象に振り分ける。
+    """
+
+    def __init__(
+        self,
+        urls: Sequence[str],
+        health_check_interval: float = 10,
+        health_check_timeout: float = 3,
+        failure_threshold: int = 3,
+        eject_seconds: float = 30
+    ):
+        if not urls:
+            raise ValueError("VOICEVOXのURLを1つ以上指定してください")
+        self.engines: List[VoicevoxEngine] = [VoicevoxEngine(url) for url in urls]
+        self.health_check_interval = health_check_interval
+        self.health_check_timeout = health_check_timeout
+        self.failure_threshold = failure_threshold
+        self.eject_seconds = eject_seconds
+        self._health_task: Optional[asyncio.Task] = None
+
+    @property
+    def urls(self) -> List[str]:
+        return [engine.url for engine in self.engines]
+
+    def _choose(self, exclude: Sequence[VoicevoxEngine] = ()) -> VoicevoxEngine:
+        candidates = [e for e in self.engines if e not in exclude] or self.engines
+        available = [e for e in candidates if e.available] or candidates
+        return min(available, key=lambda e: (e.outstanding, e._percentile(0.5)))
+
+    @asynccontextmanager
+    async def _engine(self, exclude: Sequence[VoicevoxEngine] = ()):
+        engine = self._choose(exclude)
+        engine.outstanding += 1
+        engine.requests += 1
+        try:
+            yield engine
+        finally:
+            engine.outstanding -= 1
+
+    async def synthesize(
+        self,
+        session: aiohttp.ClientSession,
+        text: str,
+        speaker_id: int,
+        query_overrides: Optional[dict] = None
+    ) -> bytes:
+        """audio_query → synthesis を同じエンジンで実行してWAVを返す
+
+        通信エラー・5xxの場合は別のエンジンで1台ずつ再試行する（4xxはテキスト側の問題なので再試行しない）。
+        """
+        tried: List[VoicevoxEngine] = []
+        last_error: Optional[VoicevoxError] = None
+        for _ in range(len(self.engines)):
+            async with self._engine(tried) as engine:
+                tried.append(engine)
+                started = time.monotonic()
+                try:
+                    audio_data = await self._synthesize_on(session, engine, text, speaker_id, query_overrides)
+                except (aiohttp.ClientError, asyncio.TimeoutError) as e:
+                    last_error = VoicevoxError(f"{engine.url} に接続できません: {e!r}", retryable=True)
+                except VoicevoxError as e:
+                    if not e.retryable:
+                        raise
+                    last_error = e
+                else:
+                    engine.record_success(time.monotonic() - started)
+                    return audio_data
+                engine.record_failure(self.failure_threshold, self.eject_seconds)
+                print(f"⚠️ VOICEVOX呼び出し失敗、別のエンジンで再試行: {last_error}")
+        raise last_error
+
+    @staticmethod
+    async def _synthesize_on(
+        session: aiohttp.ClientSession,
+        engine: VoicevoxEngine,
+        text: str,
+        speaker_id: int,
+        query_overrides: Optional[dict]
+    ) -> bytes:
+        with stage_timer("tts_query"):
+            async with session.post(
+                f"{engine.url}/audio_query",
+                params={"text": text, "speaker": speaker_id}
+            ) as response:
+                if response.status != 200:
+                    raise VoicevoxError(f"音声クエリ取得失敗: {response.status}", retryable=response.status >= 500)
+                audio_query = await response.json()
+
+        if query_overrides:
+            audio_query.update(query_overrides)
+
+        with stage_timer("tts_synthesis"):
+            async with session.post(
+                f"{engine.url}/synthesis",
+                params={"speaker": speaker_id},
+                json=audio_query
+            ) as response:
+                if response.status != 200:
+                    raise VoicevoxError(f"音声合成失敗: {response.status}", retryable=response.status >= 500)
+                return await response.read()
+
+    async def check_health(self, session: aiohttp.ClientSession) -> Dict[str, bool]:
+        """全エンジンの /version を確認して稼働状況を更新"""
+        timeout = aiohttp.ClientTimeout(total=self.health_check_timeout)
+
+        async def check(engine: VoicevoxEngine) -> bool:
+            try:
+                async with session.get(f"{engine.url}/version", timeout=timeout) as response:
+                    healthy = response.status == 200
+            except (aiohttp.ClientError, asyncio.TimeoutError):
+                healthy = False
+            if healthy and not engine.healthy:
+                print(f"✅ VOICEVOXエンジンが復帰: {engine.url}")
+                engine.consecutive_failures = 0
+                engine.ejected_until = 0.0
+            elif not healthy and engine.healthy:
+                print(f"⚠️ VOICEVOXエンジンが応答しません: {engine.url}")
+            engine.healthy = healthy
+            return healthy
+
+        results = await asyncio.gather(*(check(engine) for engine in self.engines))
+        return dict(zip(self.urls, results))
+
+    def start(self, session_factory: Callable[[], Awaitable[aiohttp.ClientSession]]) -> None:
+        """定期ヘルスチェックを開始（エンジンが1台だけなら振り分け先がないので何もしない）"""
+        if len(self.engines) < 2 or self.health_check_interval <= 0:
+            return
+        if self._health_task is None or self._health_task.done():
+            self._health_task = asyncio.create_task(self._health_loop(session_factory))
+
+    async def _health_loop(self, session_factory) -> None:
+        while True:
+            try:
+                await self.check_health(await session_factory())
+            except Exception as e:
+                print(f"⚠️ VOICEVOXヘルスチェックエラー: {e}")
+            await asyncio.sleep(self.health_check_interval)
+
+    async def close(self) -> None:
+        if self._health_task is not None:
+            self._health_task.cancel()
+            try:
+                await self._health_task
+            except asyncio.CancelledError:
+                pass
+            self._health_task = None
+
+    def stats(self) -> Dict[str, object]:
+        return {
+            "engines": [engine.stats() for engine in self.engines],
+            "available": sum(1 for engine in self.engines if engine.available),
+        }
@@ -0,0 +1,196 @@
+"""動画生成ワーカー
+
+APIプロセスとは別に起動し、Redisのジョブキューから動画生成ジョブを取り出して処理する。
+ワーカー数はコンテナ（プロセス）の数で、1ワーカー内の同時実行数は WORKER_CONCURRENCY で調整する。
+
+    python worker.py --concurrency 2
+"""
+import argparse
+import asyncio
+import os
+import signal
+import socket
+import time
+from typing import Awaitable, List, Optional, Tuple
+
+from job_queue import Job, RedisJobQueue
+from main import (
+    engine,
+    fail_generations,
+    generator,
+    init_db,
+    job_queue,
+    prefetch_queue,
+    process_asset_prefetch,
+    process_multi_style_generation,
+    process_video_generation,
+    stats_publisher,
+)
+from metrics import JOB_SECONDS, JOBS_IN_PROGRESS, start_metrics_server
+
+WORKER_CONCURRENCY = int(os.getenv("WORKER_CONCURRENCY", "2"))
+WORKER_POLL_BLOCK_MS = int(os.getenv("WORKER_POLL_BLOCK_MS", "5000"))
+WORKER_METRICS_PORT = int(os.getenv("WORKER_METRICS_PORT", "9101"))  # 0で無効
+# 待機中に先行生成キューを確認する間隔（動画生成ジョブの取り出しはこの間も待たずに行う）
+PREFETCH_POLL_MS = min(WORKER_POLL_BLOCK_MS, 1000)
+
+# 再試行しても結果が変わらない失敗（存在しないスタイル・レコード、ジョブ内容の不備）。すぐにデッドレターへ送る
+NON_RETRYABLE_ERRORS = (ValueError, TypeError)
+
+# ジョブ種別ごとの処理関数
+JOB_HANDLERS = {
+    "video": process_video_generation,
+    "multi_style": process_multi_style_generation,
+    "prefetch": process_asset_prefetch,
+}
+
+
+async def _heartbeat(job: Job, consumer: str, queue: RedisJobQueue) -> None:
+    """処理中ジョブが他ワーカーに再取得されないよう定期的にアイドル時間をリセット"""
+    interval = max(1, queue.visibility_timeout // 3)
+    while True:
+        await asyncio.sleep(interval)
+        try:
+            await queue.heartbeat(job, consumer)
+        except Exception as e:
+            print(f"⚠️ ハートビート送信失敗: {job.job_id} ({e})")
+
+
+def job_generation_ids(job: Job) -> List[str]:
+    """ジョブが作成する動画生成IDの一覧（動画生成以外のジョブは空）"""
+    if "generation_id" in job.payload:
+        return [job.payload["generation_id"]]
+    return list(job.payload.get("generation_ids", {}).values())
+
+
+async def give_up_job(job: Job, queue: RedisJobQueue) -> None:
+    """最終試行中にワーカーが停止したジョブを failed にしてデッドレターへ
+
+    後始末に失敗した場合はペンディングのまま残し、次の再取得で再度試みる。
+    """
+    generation_ids = job_generation_ids(job)
+    if generation_ids:
+        await fail_generations(generation_ids, "処理中にワーカーが停止したため中断しました（再試行上限）")
+    await queue.dead_letter(job, job.gave_up)
+
+
+async def settle_job(job: Job, operation: Awaitable, cleanup: Optional[Awaitable] = None):
+    """ジョブの確定（ACK・再投入・デッドレター）を行い、その結果を返す
+
+    cleanup（動画生成を failed にする等）があれば先に実行する。失敗してもワーカーは止めずに None を返し、
+    ジョブはペンディングのまま残って visibility_timeout 後に再取得される。
+    """
+    try:
+        if cleanup is not None:
+            await cleanup
+        return await operation
+    except Exception as e:
+        operation.close()
+        print(f"⚠️ ジョブの確定に失敗（後で再取得されます）: {job.job_id} ({e})")
+        return None
+
+
+async def handle_job(job: Job, consumer: str, queue: RedisJobQueue) -> None:
+    """ジョブを1件処理し、成功ならACK、失敗ならリトライ/デッドレター"""
+    if job.gave_up:
+        try:
+            await give_up_job(job, queue)
+        except Exception as e:
+            print(f"⚠️ 中断したジョブの後始末に失敗: {job.job_id} ({e})")
+        return
+
+    handler = JOB_HANDLERS.get(job.kind)
+    if handler is None:
+        print(f"❌ 未知のジョブ種別: {job.kind}")
+        try:
+            await queue.dead_letter(job, f"unknown job kind: {job.kind}")
+        except Exception as e:
+            print(f"⚠️ ジョブをデッドレターに移動できません: {job.job_id} ({e})")
+        return
+
+    final_attempt = job.attempts >= queue.max_attempts
+    print(f"🛠️ ジョブ開始: {job.job_id} ({job.kind}, 試行{job.attempts}/{queue.max_attempts})")
+    heartbeat = asyncio.create_task(_heartbeat(job, consumer, queue))
+    in_progress = JOBS_IN_PROGRESS.labels(job.kind)
+    in_progress.inc()
+    started = time.perf_counter()
+    outcome = "success"
+    try:
+        await handler(**job.payload, final_attempt=final_attempt)
+    except NON_RETRYABLE_ERRORS as e:
+        outcome = "failed"
+        print(f"❌ ジョブ失敗（再試行しません）: {job.job_id} ({e})")
+        await settle_job(job, queue.dead_letter(job, str(e)), fail_generations(job_generation_ids(job), str(e)))
+    except Exception as e:
+        requeued = await settle_job(job, queue.retry(job, str(e)))
+        if requeued:
+            outcome = "retry"
+            print(f"🔁 ジョブ失敗、再投入しました: {job.job_id} ({e})")
+        elif requeued is False:
+            outcome = "failed"
+            print(f"❌ ジョブ失敗（リトライ上限）: {job.job_id} ({e})")
+    else:
+        print(f"✅ ジョブ完了: {job.job_id}")
+        await settle_job(job, queue.ack(job))
+    finally:
+        heartbeat.cancel()
+        in_progress.dec()
+        JOB_SECONDS.labels(job.kind, outcome).observe(time.perf_counter() - started)
+
+
+async def reserve_next(consumer: str) -> Tuple[RedisJobQueue, Optional[Job]]:
+    """動画生成ジョブを優先して1件取り出す（なければ先行生成ジョブ、どちらもなければ少し待つ）"""
+    job = await job_queue.reserve(consumer, block_ms=None)
+    if job:
+        return job_queue, job
+    job = await prefetch_queue.reserve(consumer, block_ms=None)
+    if job:
+        return prefetch_queue, job
+    return job_queue, await job_queue.reserve(consumer, block_ms=PREFETCH_POLL_MS)
+
+
+async def consume(slot: int, stop: asyncio.Event) -> None:
+    """1スロット分の取り出しループ"""
+    consumer = f"{socket.gethostname()}-{os.getpid()}-{slot}"
+    while not stop.is_set():
+        try:
+            queue, job = await reserve_next(consumer)
+        except Exception as e:
+            print(f"⚠️ ジョブ取得失敗: {e}")
+            await asyncio.sleep(1)
+            continue
+        if job:
+            await handle_job(job, consumer, queue)
+
+
+async def run_worker(concurrency: int) -> None:
+    """同時実行数分の取り出しループを起動し、SIGTERM/SIGINTで処理中ジョブの完了を待って終了"""
+    stop = asyncio.Event()
+    loop = asyncio.get_running_loop()
+    for sig in (signal.SIGTERM, signal.SIGINT):
+        try:
+            loop.add_signal_handler(sig, stop.set)
+        except NotImplementedError:
+            pass
+
+    print(f"👷 ワーカー起動: 同時実行数 {concurrency}, キュー {job_queue.stream}")
+    start_metrics_server(WORKER_METRICS_PORT)
+    await job_queue.ensure_group()
+    await prefetch_queue.ensure_group()
+    await init_db()
+    await generator.start()
+    stats_publisher.start()
+    try:
+        await asyncio.gather(*(consume(i, stop) for i in range(concurrency)))
+    finally:
+        await stats_publisher.close()
+        await generator.close()
+        await engine.dispose()
+    print("👋 ワーカー停止")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="動画生成ワーカー")
+    parser.add_argument("--concurrency", type=int, default=WORKER_CONCURRENCY, help="同時に処理するジョブ数")
+    args = parser.parse_args()
+    asyncio.run(run_worker(args.concurrency))
@@ -23,6 +23,8 @@ interface VideoGenerationRequest {
   speaker_id: number;
   enable_preview: boolean;
   user_id?: string;
+  render_profile?: 'final' | 'draft';
+  preview_id?: string;
 }
 
 interface VideoStatus {
@@ -42,6 +44,7 @@ interface ScriptPreview {
     visual_concept: string;
     duration: number;
   }>;
+  preview_id?: string;
 }
 
 const API_BASE_URL = process.env.REACT_APP_API_URL || 'http://localhost:8000';
@@ -58,6 +61,7 @@ const App: React.FC = () => {
   const [selectedStyle, setSelectedStyle] = useState<string>('');
   const [speakerId, setSpeakerId] = useState<number>(1);
   const [enablePreview, setEnablePreview] = useState<boolean>(false);
+  const [draftRender, setDraftRender] = useState<boolean>(false);
   const [scriptPreview, setScriptPreview] = useState<ScriptPreview | null>(null);
   const [generationId, setGenerationId] = useState<string>('');
   const [videoStatus, setVideoStatus] = useState<VideoStatus | null>(null);
@@ -102,7 +106,7 @@ const App: React.FC = () => {
     }
   };
 
-  const previewScript = async () => {
+  const previewScript = async (regenerate: boolean = false) => {
     const topic = topicMethod === 'theme' ? selectedTopic : directTopic;
     
     if (!topic || !selectedStyle) {
@@ -118,7 +122,8 @@ const App: React.FC = () => {
         topic,
         style: selectedStyle,
         speaker_id: speakerId,
-        enable_preview: true
+        enable_preview: true,
+        regenerate // 再生成ボタンでは直前と同じ台本を返さない
       });
       setScriptPreview(response.data);
       setCurrentStep(4); // プレビューステップに移動
@@ -149,12 +154,15 @@ const App: React.FC = () => {
         style: selectedStyle,
         speaker_id: speakerId,
         enable_preview: false,
-        user_id: 'demo_user' // 実際はユーザー認証から取得
+        user_id: 'demo_user', // 実際はユーザー認証から取得
+        render_profile: draftRender ? 'draft' : 'final',
+        // プレビューした台本をそのまま使う（先行生成した音声も再利用される）
+        preview_id: usePreviewedScript && scriptPreview ? scriptPreview.preview_id : undefined
       });
       
       setGenerationId(response.data.generation_id);
       setCurrentStep(5); // 進行状況ステップに移動
-      pollVideoStatus(response.data.generation_id);
+      watchVideoStatus(response.data.generation_id);
     } catch (error) {
       console.error('動画生成エラー:', error);
       setError('動画生成の開始に失敗しました');
@@ -163,6 +171,39 @@ const App: React.FC = () => {
     }
   };
 
+  // 進行状況をServer-Sent Eventsで受信（未対応・接続失敗時はポーリングに切り替え）
+  const watchVideoStatus = (id: string) => {
+    if (typeof EventSource === 'undefined') {
+      pollVideoStatus(id);
+      return;
+    }
+    
+    const source = new EventSource(`${API_BASE_URL}/api/video/events/${id}`);
+    let finished = false;
+    
+    source.onmessage = (event) => {
+      const status: VideoStatus = JSON.parse(event.data);
+      setVideoStatus(status);
+      
+      if (status.status === 'completed') {
+        finished = true;
+        source.close();
+        setCurrentStep(6); // 完了ステップに移動
+      } else if (status.status === 'failed') {
+        finished = true;
+        source.close();
+        setError(status.error_message || '動画生成に失敗しました');
+      }
+    };
+    
+    source.onerror = () => {
+      source.close();
+      if (!finished) {
+        pollVideoStatus(id);
+      }
+    };
+  };
+
   const pollVideoStatus = async (id: string) => {
     const poll = async () => {
       try {
@@ -367,6 +408,17 @@ const App: React.FC = () => {
         </label>
       </div>
 
+      <div className="input-group">
+        <label>
+          <input
+            type="checkbox"
+            checked={draftRender}
+            onChange={(e) => setDraftRender(e.target.checked)}
+          />
+          下書き（低画質・高速）で作成する
+        </label>
+      </div>
+
       <div className="step-actions">
         <button className="btn secondary" onClick={() => setCurrentStep(2)}>
           ← 戻る
@@ -375,7 +427,7 @@ const App: React.FC = () => {
         {enablePreview ? (
           <button 
             className="btn primary"
-            onClick={previewScript}
+            onClick={() => previewScript()}
             disabled={loading}
           >
             {loading ? '生成中...' : '📋 台本をプレビュー →'}
@@ -417,7 +469,7 @@ const App: React.FC = () => {
         </button>
         <button 
           className="btn secondary"
-          onClick={previewScript}
+          onClick={() => previewScript(true)}
           disabled={loading}
         >
           🔄 台本を再生成